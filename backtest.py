@@ -0,0 +1,184 @@
+"""Vectorized backtests of indicator rules over parameter grids.
+
+Prices come in as a dates x tickers matrix. Each strategy computes its
+indicators once per distinct parameter value across every ticker. It then
+broadcasts them against the grid into a (dates, combos, tickers) position
+array, so a whole grid x universe is a handful of array operations with no
+Python loop over combinations.
+
+Positions are decided on the close and earn the next bar's return, so a
+signal never trades on the bar that produced it. Every change of position
+pays ``cost_bps`` per unit traded. Performance comes from
+``risk.compute_risk_metrics`` applied to the equity curves, so Sharpe,
+drawdown and friends mean the same thing here as on the risk page.
+"""
+import itertools
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from indicators import bollinger, rsi, sma
+from risk import TRADING_DAYS, compute_risk_metrics
+
+# Default parameter grids per strategy
+GRIDS: Dict[str, Dict[str, list]] = {
+    'SMA Crossover': {'fast': [5, 10, 20, 50], 'slow': [50, 100, 150, 200]},
+    'RSI': {'period': [7, 14, 21], 'lower': [20, 25, 30, 35], 'upper': [65, 70, 75, 80]},
+    'Bollinger': {'window': [10, 20, 30, 50], 'num_std': [1.5, 2.0, 2.5, 3.0]},
+}
+
+
+def param_grid(strategy: str, grid: Optional[Dict[str, list]] = None) -> List[dict]:
+    """Every combination of a grid, dropping crossovers whose fast leg isn't faster"""
+    grid = grid or GRIDS[strategy]
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if strategy == 'SMA Crossover':
+        combos = [c for c in combos if c['fast'] < c['slow']]
+    elif strategy == 'RSI':
+        combos = [c for c in combos if c['lower'] < c['upper']]
+    return combos
+
+
+def _hold(signal: np.ndarray) -> np.ndarray:
+    """Forward-fill a target position (NaN = keep the previous one) along axis 0"""
+    steps = np.arange(signal.shape[0]).reshape((-1,) + (1,) * (signal.ndim - 1))
+    last = np.maximum.accumulate(np.where(np.isnan(signal), 0, steps), axis=0)
+    filled = np.take_along_axis(signal, last, axis=0)
+    return np.nan_to_num(filled, nan=0.0)
+
+
+def _stack(func: Callable, close: np.ndarray, values: list) -> Dict:
+    """One indicator array per distinct parameter value"""
+    return {value: func(close, value) for value in sorted(set(values))}
+
+
+def sma_crossover_positions(close: np.ndarray, combos: List[dict],
+                            allow_short: bool = False) -> np.ndarray:
+    """Long while the fast SMA is above the slow one (short below it if allowed)"""
+    means = _stack(lambda c, w: sma(c, w)[0], close, [c['fast'] for c in combos] + [c['slow'] for c in combos])
+    fast = np.stack([means[c['fast']] for c in combos], axis=1)
+    slow = np.stack([means[c['slow']] for c in combos], axis=1)
+    with np.errstate(invalid='ignore'):
+        positions = (fast > slow).astype(np.float64)
+        if allow_short:
+            positions -= fast < slow
+    return positions
+
+
+def rsi_positions(close: np.ndarray, combos: List[dict], allow_short: bool = False) -> np.ndarray:
+    """Buy when RSI drops below ``lower`` and hold until it rises above ``upper``
+
+    With ``allow_short`` crossing ``upper`` flips the position short instead of flat.
+    """
+    levels = _stack(lambda c, p: rsi(c, p)[0], close, [c['period'] for c in combos])
+    values = np.stack([levels[c['period']] for c in combos], axis=1)
+    lower = np.array([c['lower'] for c in combos], dtype=np.float64)[None, :, None]
+    upper = np.array([c['upper'] for c in combos], dtype=np.float64)[None, :, None]
+    with np.errstate(invalid='ignore'):
+        signal = np.where(values < lower, 1.0,
+                          np.where(values > upper, -1.0 if allow_short else 0.0, np.nan))
+    return _hold(signal)
+
+
+def bollinger_positions(close: np.ndarray, combos: List[dict], allow_short: bool = False) -> np.ndarray:
+    """Buy a close below the lower band, exit when price crosses back over the middle
+
+    With ``allow_short`` a close above the upper band opens a short with the same exit.
+    """
+    bands = {}
+    for c in combos:
+        key = (c['window'], c['num_std'])
+        if key not in bands:
+            bands[key] = bollinger(close, c['window'], c['num_std'])
+    middle, upper, lower = (np.stack([bands[(c['window'], c['num_std'])][i] for c in combos], axis=1)
+                            for i in range(3))
+    price = close[:, None, :]
+    with np.errstate(invalid='ignore'):
+        side = np.sign(price - middle)
+        crossed = np.zeros_like(side, dtype=bool)
+        crossed[1:] = (side[1:] != side[:-1]) & (side[1:] != 0) & ~np.isnan(side[:-1])
+        signal = np.where(price < lower, 1.0,
+                          np.where(allow_short & (price > upper), -1.0,
+                                   np.where(crossed, 0.0, np.nan)))
+    return _hold(signal)
+
+
+STRATEGIES: Dict[str, Callable] = {
+    'SMA Crossover': sma_crossover_positions,
+    'RSI': rsi_positions,
+    'Bollinger': bollinger_positions,
+}
+
+
+def strategy_returns(close: np.ndarray, positions: np.ndarray, cost_bps: float = 10.0) -> np.ndarray:
+    """Net simple returns per bar: yesterday's position times today's return, less costs"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asset = np.full(close.shape, np.nan)
+        asset[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros_like(positions)
+    held[1:] = positions[:-1]
+    traded = np.abs(np.diff(positions, axis=0, prepend=0.0))
+    # A bar without a return (the first one, or a missing price) still pays for what it trades
+    return held * np.nan_to_num(asset)[:, None, :] - traded * cost_bps / 10_000
+
+
+def equity_curves(close: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """Growth of 1 per (combo, ticker); NaN where the ticker has no price"""
+    equity = np.cumprod(1 + np.nan_to_num(returns), axis=0)
+    equity[np.broadcast_to(np.isnan(close)[:, None, :], equity.shape)] = np.nan
+    return equity
+
+
+def _matrix(prices) -> pd.DataFrame:
+    if isinstance(prices, pd.Series):
+        return prices.to_frame(prices.name or 'Close')
+    return prices
+
+
+def run_backtest(prices, strategy: str, grid: Optional[Dict[str, list]] = None,
+                 cost_bps: float = 10.0, allow_short: bool = False,
+                 risk_free_rate: float = 0.0, periods_per_year: int = TRADING_DAYS) -> pd.DataFrame:
+    """Backtest every grid combination on every ticker of a price matrix.
+
+    Returns one row per (parameters..., ticker) with the RISK_METRICS
+    columns of the equity curve plus totalReturn, trades (position changes)
+    and exposure (share of bars holding a position).
+    """
+    prices = _matrix(prices)
+    combos = param_grid(strategy, grid)
+    if not combos:
+        raise ValueError(f"Empty parameter grid for {strategy}")
+    close = prices.to_numpy(dtype=np.float64)
+    positions = STRATEGIES[strategy](close, combos, allow_short)
+    positions[np.broadcast_to(np.isnan(close)[:, None, :], positions.shape)] = 0.0
+    equity = equity_curves(close, strategy_returns(close, positions, cost_bps))
+
+    n_bars, n_combos, n_tickers = equity.shape
+    metrics = compute_risk_metrics(equity.reshape(n_bars, n_combos * n_tickers),
+                                   risk_free_rate=risk_free_rate,
+                                   periods_per_year=periods_per_year)
+    with np.errstate(invalid='ignore'):
+        last = pd.DataFrame(equity.reshape(n_bars, -1)).ffill().to_numpy()[-1]
+    metrics['totalReturn'] = last - 1
+    # Counted like the costs: entering from flat on the first bar is a trade too
+    metrics['trades'] = (np.diff(positions, axis=0, prepend=0.0) != 0).sum(axis=0).reshape(-1)
+    listed = (~np.isnan(close)).sum(axis=0)
+    metrics['exposure'] = ((positions != 0).sum(axis=0) / np.maximum(listed, 1)).reshape(-1)
+
+    names = list(combos[0])
+    metrics.index = pd.MultiIndex.from_tuples(
+        [tuple(c.values()) + (ticker,) for c in combos for ticker in prices.columns],
+        names=names + ['Ticker'])
+    return metrics
+
+
+def backtest_equity(close: pd.Series, strategy: str, params: dict,
+                    cost_bps: float = 10.0, allow_short: bool = False) -> pd.DataFrame:
+    """Equity curve of one parameter set next to buy-and-hold, for charting"""
+    values = close.to_numpy(dtype=np.float64)[:, None]
+    positions = STRATEGIES[strategy](values, [params], allow_short)
+    equity = equity_curves(values, strategy_returns(values, positions, cost_bps))[:, 0, 0]
+    return pd.DataFrame({'Strategy': equity, 'Buy & Hold': values[:, 0] / values[0, 0],
+                         'Position': positions[:, 0, 0]}, index=close.index)
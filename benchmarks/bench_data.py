@@ -0,0 +1,69 @@
+"""get_stock_data cache paths with the Yahoo fetch replaced by synthetic data
+
+With DATA_MODE=replay the cold path also runs against recorded responses,
+through the provider pool and replay latency, for BENCH_TICKERS.
+"""
+import os
+
+import pytest
+
+from conftest import PERIOD_DAYS, PERIODS, make_ohlcv
+
+REPLAYING = os.environ.get("DATA_MODE") == "replay"
+REPLAY_TICKERS = os.environ.get("BENCH_TICKERS", "AAPL").split(",")
+
+
+@pytest.fixture
+def offline_stock(stock, monkeypatch):
+    frames = {period: make_ohlcv(PERIOD_DAYS[period], seed=8) for period in PERIODS}
+    monkeypatch.setattr(stock, "fetch_stock_data_yahoo",
+                        lambda symbol, period="1y": (frames[period].copy(), None))
+    clear_all(stock)
+    yield stock
+    clear_all(stock)
+
+
+def clear_worker_caches(stock):
+    stock.fetch_stock_data_cached.cache_clear()
+    stock.MEMO.clear(shared=True)
+
+
+def clear_all(stock):
+    clear_worker_caches(stock)
+    stock.SHARED.clear("prices")
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_get_stock_data_cold(benchmark, offline_stock, period):
+    """Miss in both tiers: fetch, serialize, store and decode"""
+    df, error = benchmark.pedantic(offline_stock.get_stock_data, args=("BENCH", period),
+                                   setup=lambda: clear_all(offline_stock),
+                                   rounds=20, iterations=1)
+    assert error is None and len(df) == PERIOD_DAYS[period]
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_get_stock_data_shared(benchmark, offline_stock, period):
+    """Worker cache miss served from the shared tier (what a fresh worker sees)"""
+    offline_stock.get_stock_data("BENCH", period)
+    df, error = benchmark.pedantic(offline_stock.get_stock_data, args=("BENCH", period),
+                                   setup=lambda: clear_worker_caches(offline_stock),
+                                   rounds=20, iterations=1)
+    assert error is None and len(df) == PERIOD_DAYS[period]
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_get_stock_data_warm(benchmark, offline_stock, period):
+    """Rerun with the same inputs: the compact history is cached, the frame is rebuilt"""
+    offline_stock.get_stock_data("BENCH", period)
+    df, error = benchmark(offline_stock.get_stock_data, "BENCH", period)
+    assert error is None and len(df) == PERIOD_DAYS[period]
+
+
+@pytest.mark.skipif(not REPLAYING, reason="needs DATA_MODE=replay and a recorded DATA_ARCHIVE")
+@pytest.mark.parametrize("ticker", REPLAY_TICKERS)
+def bench_get_stock_data_replayed(benchmark, stock, ticker):
+    """Miss in both tiers, served by the real providers from the replay archive"""
+    df, error = benchmark.pedantic(stock.get_stock_data, args=(ticker, "1y"),
+                                   setup=lambda: clear_all(stock), rounds=10, iterations=1)
+    assert error is None and not df.empty
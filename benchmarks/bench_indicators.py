@@ -0,0 +1,43 @@
+"""Indicator computation, uncached and through the engine's cache"""
+import pytest
+
+from conftest import PERIOD_DAYS, PERIODS, make_ohlcv, make_universe
+from indicators import INDICATORS, IndicatorEngine
+
+NAMES = sorted(INDICATORS)
+
+
+def compute_all(engine, period, data):
+    return [engine.compute("BENCH", period, data, name) for name in NAMES]
+
+
+@pytest.mark.parametrize("name", NAMES)
+def bench_indicator(benchmark, name):
+    data = make_ohlcv(PERIOD_DAYS["5y"], seed=6)
+    engine = IndicatorEngine()
+    benchmark(lambda: (engine.clear(), engine.compute("BENCH", "5y", data, name)))
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_all_indicators_cold(benchmark, period):
+    data = make_ohlcv(PERIOD_DAYS[period], seed=7)
+    engine = IndicatorEngine()
+    benchmark(lambda: (engine.clear(), compute_all(engine, period, data)))
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_all_indicators_warm(benchmark, period):
+    data = make_ohlcv(PERIOD_DAYS[period], seed=7)
+    engine = IndicatorEngine()
+    compute_all(engine, period, data)
+    benchmark(compute_all, engine, period, data)
+    assert engine.hits > 0
+
+
+@pytest.mark.parametrize("name", ["RSI", "MACD", "Bollinger Bands"])
+def bench_indicator_universe(benchmark, name):
+    """One indicator over 50 tickers in a single vectorized call"""
+    frames = make_universe(50, PERIOD_DAYS["1y"], seed=9)
+    engine = IndicatorEngine()
+    results = benchmark(lambda: (engine.clear(), engine.compute_many("1y", frames, name))[1])
+    assert len(results) == 50
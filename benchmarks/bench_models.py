@@ -0,0 +1,31 @@
+"""Feature construction and Random Forest recursive prediction"""
+import pytest
+
+from conftest import FULL, PERIOD_DAYS, PERIODS, make_ohlcv
+
+MODEL_PERIODS = ["1y", "5y"] + (["20y"] if FULL else [])
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def bench_create_lagged_features(benchmark, stock, period):
+    data = make_ohlcv(PERIOD_DAYS[period], seed=2)
+    features = benchmark(stock.create_lagged_features, data, 34)
+    assert features.shape == (max(len(data) - 34, 0), 35)
+
+
+@pytest.fixture(scope="module")
+def trained_forests(stock):
+    """One fitted model per history length (training is not what is measured here)"""
+    models = {}
+    for period in MODEL_PERIODS:
+        data = make_ohlcv(PERIOD_DAYS[period], seed=3)
+        models[period] = (stock.train_random_forest(data), data)
+    return models
+
+
+@pytest.mark.parametrize("period", MODEL_PERIODS)
+def bench_predict_random_forest(benchmark, stock, trained_forests, period):
+    model, data = trained_forests[period]
+    predictions = benchmark.pedantic(stock.predict_random_forest, args=(model, data, 30),
+                                     rounds=5, iterations=1)
+    assert len(predictions) == 30
@@ -0,0 +1,13 @@
+"""Risk metrics with and without a benchmark series"""
+import pytest
+
+from conftest import PERIOD_DAYS, PERIODS, make_ohlcv
+
+
+@pytest.mark.parametrize("period", PERIODS)
+@pytest.mark.parametrize("with_benchmark", [False, True], ids=["standalone", "vs_benchmark"])
+def bench_calculate_risk_metrics(benchmark, stock, period, with_benchmark):
+    data = make_ohlcv(PERIOD_DAYS[period], seed=4)
+    market = make_ohlcv(PERIOD_DAYS[period], seed=5) if with_benchmark else None
+    metrics = benchmark(stock.calculate_risk_metrics, data, market)
+    assert metrics['volatility'] is not None
@@ -0,0 +1,18 @@
+"""Monte Carlo simulation across simulation counts"""
+import numpy as np
+import pytest
+
+from conftest import PERIOD_DAYS, SIMULATIONS, make_ohlcv
+
+
+@pytest.fixture(scope="module")
+def history():
+    return make_ohlcv(PERIOD_DAYS["1y"], seed=1)
+
+
+@pytest.mark.parametrize("n_simulations", SIMULATIONS)
+def bench_monte_carlo(benchmark, stock, history, n_simulations):
+    benchmark.extra_info["n_simulations"] = n_simulations
+    result = benchmark.pedantic(stock.monte_carlo_simulation, args=(history, n_simulations, 180),
+                                setup=lambda: np.random.seed(0), rounds=3, iterations=1)
+    assert result['raw'].shape == (180, n_simulations)
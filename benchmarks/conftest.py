@@ -0,0 +1,100 @@
+"""Shared fixtures for the hot-path benchmarks.
+
+Everything runs on seeded synthetic OHLCV data; nothing touches the network.
+Install the runner with ``pip install -r requirements-dev.txt``.
+
+    # run from the repo root; only reports timings
+    python -m pytest -c benchmarks/pytest.ini benchmarks
+
+    # gate: compare against the stored baseline and fail when a benchmark
+    # regresses past REGRESSION_THRESHOLDS (or pass --benchmark-compare)
+    BENCH_COMPARE=1 python -m pytest -c benchmarks/pytest.ini benchmarks
+
+    # record a new baseline after an intentional change, on the gating machine
+    python -m pytest -c benchmarks/pytest.ini benchmarks --benchmark-save=baseline
+
+To time the real fetch paths without network, replay an archive recorded
+with replay.py (see its docstring); bench_data then adds replayed cold loads:
+
+    DATA_MODE=replay DATA_ARCHIVE=data_archive.db BENCH_TICKERS=AAPL,MSFT \
+        python -m pytest -c benchmarks/pytest.ini benchmarks/bench_data.py
+
+Baselines are stored per machine id (OS, interpreter, Python version), so a
+gated run only compares numbers recorded on a comparable setup. The machine
+id can't tell a laptop from a CI runner, hence the gate is opt-in. Set BENCH_FULL=1
+to add the largest sizes (20y histories, 100k simulations) and
+BENCH_THRESHOLDS to override the thresholds, e.g. "median:10% mean:20%".
+"""
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the app's local caches out of the working tree
+_CACHE_DIR = tempfile.mkdtemp(prefix="bench-cache-")
+os.environ.setdefault("FUNDAMENTALS_DB", os.path.join(_CACHE_DIR, "fundamentals.db"))
+os.environ.setdefault("SENTIMENT_DB", os.path.join(_CACHE_DIR, "sentiment.db"))
+os.environ.setdefault("MODEL_CACHE_DIR", os.path.join(_CACHE_DIR, "models"))
+os.environ.setdefault("SHARED_CACHE_DB", os.path.join(_CACHE_DIR, "shared.db"))
+os.environ.setdefault("RESIDUALS_DB", os.path.join(_CACHE_DIR, "residuals.db"))
+os.environ.pop("REDIS_URL", None)
+
+FULL = bool(os.environ.get("BENCH_FULL"))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline")
+REGRESSION_THRESHOLDS = os.environ.get("BENCH_THRESHOLDS", "median:25% mean:40%").split()
+COMPARE = os.environ.get("BENCH_COMPARE") == "1"
+
+# Trading days per history length offered (or implied) by the period selector
+PERIOD_DAYS = {
+    "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520, "20y": 5040,
+}
+PERIODS = ["1mo", "1y", "5y"] + (["20y"] if FULL else [])
+SIMULATIONS = [1000, 10000] + ([100000] if FULL else [])
+
+
+def make_ohlcv(n_days: int, seed: int = 0, start: str = "2000-01-03") -> pd.DataFrame:
+    """Geometric random walk with consistent OHLC and lognormal volume"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.018, n_days)
+    close = 100 * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(rng.normal(0, 0.004, n_days))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.006, n_days)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.006, n_days)))
+    volume = rng.lognormal(15, 0.4, n_days).round()
+    index = pd.bdate_range(start, periods=n_days, name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close,
+                         "Volume": volume}, index=index)
+
+
+def make_universe(n_tickers: int, n_days: int, seed: int = 0) -> dict:
+    return {f"T{i:04d}": make_ohlcv(n_days, seed + i) for i in range(n_tickers)}
+
+
+@pytest.fixture(scope="session")
+def stock():
+    """The app module, imported once (Streamlit calls run in bare mode)"""
+    import stock as app
+    return app
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """With BENCH_COMPARE=1, gate on the stored baseline for this machine (if any)"""
+    option = config.option
+    if getattr(option, "benchmark_save", None) or getattr(option, "benchmark_disable", False):
+        return
+    if getattr(option, "benchmark_compare", None) or not COMPARE:
+        return
+    if not glob.glob(os.path.join(BASELINE_DIR, get_machine_id(), "*.json")):
+        return
+    option.benchmark_compare = True
+    if not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [parse_compare_fail(t) for t in REGRESSION_THRESHOLDS]
@@ -0,0 +1,154 @@
+"""Downsampling helpers for Plotly traces.
+
+Long series are reduced with LTTB (lines) or min/max bucketing (bars and
+spiky series) before they are serialized, dense series switch to WebGL
+``Scattergl``, and Monte Carlo path matrices collapse into quantile fan
+bands so the page ships a few hundred points per trace instead of every
+bar or path.
+"""
+import warnings
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Roughly one point per horizontal pixel of a wide chart
+MAX_POINTS = 800
+# Above this many raw points, draw with WebGL instead of SVG
+WEBGL_THRESHOLD = 2000
+
+
+def _numeric_x(x) -> np.ndarray:
+    if isinstance(x, pd.DatetimeIndex):
+        return x.asi8.astype(np.float64)
+    values = np.asarray(x)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points to keep"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        avg_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        # Twice the triangle area for every candidate in this bucket
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev])
+                      - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area)) if hi > lo else lo
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Keep the min and max of each bucket so spikes survive downsampling"""
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        chunk = y[lo:hi]
+        keep.extend((lo + int(np.argmin(chunk)), lo + int(np.argmax(chunk))))
+    return np.unique(keep)
+
+
+def downsample(x, y, max_points: int = MAX_POINTS, method: str = 'lttb'):
+    """Return (x, y) reduced to about max_points; NaN points are dropped first"""
+    y = np.asarray(y, dtype=np.float64)
+    mask = ~np.isnan(y)
+    if len(y) <= max_points:
+        return x, y
+    if not mask.all():
+        x = x[mask] if isinstance(x, pd.Index) else np.asarray(x)[mask]
+        y = y[mask]
+    if method == 'minmax':
+        idx = minmax_indices(y, max_points)
+    else:
+        idx = lttb_indices(_numeric_x(x), y, max_points)
+    return x[idx] if isinstance(x, pd.Index) else np.asarray(x)[idx], y[idx]
+
+
+def line_trace(x, y, max_points: int = MAX_POINTS, method: str = 'lttb', **kwargs):
+    """Scatter (or Scattergl for dense input) trace of a downsampled line"""
+    n_raw = len(y)
+    x, y = downsample(x, y, max_points, method)
+    trace = go.Scattergl if n_raw > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+def bar_trace(x, y, max_points: int = MAX_POINTS, **kwargs) -> go.Bar:
+    """Bar trace keeping each bucket's min and max bar"""
+    x, y = downsample(x, y, max_points, method='minmax')
+    return go.Bar(x=x, y=y, **kwargs)
+
+
+def band_traces(x, upper, lower, max_points: int = MAX_POINTS, name: str = 'Band',
+                line=None, fillcolor: str = 'rgba(128, 128, 128, 0.15)'):
+    """Upper/lower traces sampled at the same points so the fill stays aligned"""
+    upper = np.asarray(upper, dtype=np.float64)
+    lower = np.asarray(lower, dtype=np.float64)
+    if len(upper) > max_points:
+        mask = ~(np.isnan(upper) | np.isnan(lower))
+        x = x[mask] if isinstance(x, pd.Index) else np.asarray(x)[mask]
+        upper, lower = upper[mask], lower[mask]
+        idx = lttb_indices(_numeric_x(x), (upper + lower) / 2, max_points)
+        x = x[idx] if isinstance(x, pd.Index) else np.asarray(x)[idx]
+        upper, lower = upper[idx], lower[idx]
+    line = line or dict(width=1, color='gray')
+    return [
+        go.Scatter(x=x, y=upper, name=f'Upper {name}', line=line),
+        go.Scatter(x=x, y=lower, name=f'Lower {name}', line=line,
+                   fill='tonexty', fillcolor=fillcolor),
+    ]
+
+
+def fan_traces(paths: np.ndarray, x=None, quantiles: Sequence[float] = (5, 25, 50, 75, 95),
+               color: str = '31, 119, 180', max_points: int = MAX_POINTS):
+    """Collapse a (steps x paths) matrix into nested quantile bands plus a median line"""
+    quantiles = sorted(quantiles)
+    steps = paths.shape[0]
+    x = np.arange(steps) if x is None else np.asarray(x)
+    if steps > max_points:
+        idx = np.unique(np.linspace(0, steps - 1, max_points).astype(np.int64))
+        paths, x = paths[idx], x[idx]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN warm-up rows of smoothed paths
+        levels = np.nanpercentile(paths, quantiles, axis=1)
+
+    traces = []
+    n_bands = len(quantiles) // 2
+    for i in range(n_bands):
+        lo, hi = quantiles[i], quantiles[-1 - i]
+        opacity = 0.15 + 0.2 * i
+        traces.append(go.Scatter(x=x, y=levels[-1 - i], mode='lines', line=dict(width=0),
+                                 showlegend=False, hoverinfo='skip'))
+        traces.append(go.Scatter(x=x, y=levels[i], mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor=f'rgba({color}, {opacity:.2f})',
+                                 name=f'{lo:g}-{hi:g}th pct'))
+    if len(quantiles) % 2:
+        traces.append(go.Scatter(x=x, y=levels[n_bands], mode='lines',
+                                 line=dict(color=f'rgb({color})', width=2),
+                                 name='Median'))
+    return traces
+
+
+def histogram_trace(values: np.ndarray, bins: int = 60, name: Optional[str] = None) -> go.Bar:
+    """Pre-binned histogram: ships bin counts instead of every sample"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=bins)
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=name)
@@ -0,0 +1,264 @@
+"""Conformal prediction intervals from stored forecast residuals.
+
+Residuals are log(actual / forecast), kept per (ticker, model, horizon) in
+a local SQLite file so they survive restarts and are shared by every
+worker. They come from two places:
+
+- calibration: the model is fitted once on the history minus the last
+  ``horizon`` bars and scored on those bars (one extra fit; no bootstrap
+  refits). That refit is as costly as training, so it runs at most once
+  every CALIBRATE_EVERY bars per (ticker, model), and the app does it in
+  the background (see ``with_intervals`` in stock.py);
+- live scoring: every forecast is recorded and scored as its bars arrive.
+
+The interval for horizon h is the forecast scaled by the conformal
+quantiles of that horizon's residuals (split conformal with the (n + 1)
+finite-sample correction). Horizons with fewer than MIN_RESIDUALS stored
+residuals, or too few for the requested level (e.g. 95% needs 39), fall back to the history's own h-step log returns. Those are the
+residuals of a random-walk forecast and need no fitting at all.
+"""
+import math
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+RESIDUALS_DB = os.environ.get("RESIDUALS_DB", "residuals.db")
+MIN_RESIDUALS = 20
+MAX_RESIDUALS = 500  # per (ticker, model, horizon), newest kept
+NAIVE_LOOKBACK = 504  # bars of history behind the random-walk fallback
+PENDING_MAX_AGE_DAYS = 400
+CALIBRATE_EVERY = int(os.environ.get("CONFORMAL_CALIBRATE_EVERY", "5"))  # bars between holdout refits
+
+
+def conformal_bounds(residuals: np.ndarray, level: float = 0.9) -> Optional[Tuple[float, float]]:
+    """(lower, upper) residual order statistics covering ``level`` with the finite-sample correction.
+
+    The bounds are the floor((n + 1) a/2)-th and ceil((n + 1)(1 - a/2))-th
+    smallest residuals. None when n is too small for those to exist: only an
+    unbounded interval would keep the guarantee then.
+    """
+    n = len(residuals)
+    alpha = 1 - level
+    k_lower = math.floor((n + 1) * alpha / 2)
+    k_upper = math.ceil((n + 1) * (1 - alpha / 2))
+    if k_lower < 1 or k_upper > n:
+        return None
+    ordered = np.sort(residuals)
+    return float(ordered[k_lower - 1]), float(ordered[k_upper - 1])
+
+
+def naive_residuals(close: np.ndarray, horizon: int, lookback: int = NAIVE_LOOKBACK) -> np.ndarray:
+    """h-step log returns: the residuals of forecasting the last close"""
+    close = np.asarray(close, dtype=np.float64)[-(lookback + horizon):]
+    if len(close) <= horizon:
+        return np.array([])
+    return np.log(close[horizon:] / close[:-horizon])
+
+
+class Forecast:
+    """Point forecast with conformal bounds; reads as an array of the point values"""
+
+    def __init__(self, values, lower, upper, level: float, sources: List[str]):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.level = level
+        self.sources = sources  # 'model' or 'naive' per horizon
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def conf_int(self) -> pd.DataFrame:
+        return pd.DataFrame({'lower': self.lower, 'upper': self.upper})
+
+    def describe(self) -> str:
+        calibrated = sum(source == 'model' for source in self.sources)
+        if calibrated == len(self.sources):
+            return f"{self.level:.0%} interval from this model's stored forecast errors"
+        if not calibrated:
+            return (f"{self.level:.0%} interval from historical price moves "
+                    f"(too few scored forecasts so far)")
+        return (f"{self.level:.0%} interval from this model's forecast errors for {calibrated} "
+                f"of {len(self.sources)} days ahead, historical price moves beyond")
+
+
+class ResidualStore:
+    """SQLite-backed forecast residuals and pending forecasts"""
+
+    def __init__(self, db_path: str = RESIDUALS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS residuals (
+            ticker TEXT, model TEXT, horizon INTEGER, origin TEXT, residual REAL,
+            PRIMARY KEY (ticker, model, horizon, origin))""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS pending (
+            ticker TEXT, model TEXT, origin TEXT, horizon INTEGER, forecast REAL,
+            PRIMARY KEY (ticker, model, origin, horizon))""")
+        conn.commit()
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module creates no file
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._connect()
+        return self._db
+
+    @staticmethod
+    def _origin(timestamp) -> str:
+        return pd.Timestamp(timestamp).isoformat()
+
+    def _insert(self, ticker: str, model: str, rows: list) -> None:
+        """Store (ticker, model, horizon, origin, residual) rows, keeping the newest MAX_RESIDUALS
+        per horizon; caller holds the lock and commits"""
+        self._conn.executemany("INSERT OR REPLACE INTO residuals VALUES (?, ?, ?, ?, ?)", rows)
+        self._conn.execute("""DELETE FROM residuals WHERE ticker = ? AND model = ? AND rowid IN (
+            SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER (
+                PARTITION BY horizon ORDER BY origin DESC) AS age
+                FROM residuals WHERE ticker = ? AND model = ?) WHERE age > ?)""",
+                           (ticker, model, ticker, model, MAX_RESIDUALS))
+
+    def add(self, ticker: str, model: str, origin, residuals: Sequence[float]) -> None:
+        """Residuals for horizons 1..len(residuals) of a forecast made at ``origin``"""
+        origin = self._origin(origin)
+        rows = [(ticker, model, h, origin, float(r)) for h, r in enumerate(residuals, 1) if np.isfinite(r)]
+        with self._lock:
+            self._insert(ticker, model, rows)
+            self._conn.commit()
+
+    def has_origin(self, ticker: str, model: str, origin) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM residuals WHERE ticker = ? AND model = ? AND origin = ? LIMIT 1",
+                (ticker, model, self._origin(origin))).fetchone()
+        return row is not None
+
+    def latest_origin(self, ticker: str, model: str, horizon: int):
+        """Newest origin with a stored ``horizon``-step residual, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(origin) FROM residuals WHERE ticker = ? AND model = ? AND horizon = ?",
+                (ticker, model, horizon)).fetchone()
+        return row[0]
+
+    def residuals(self, ticker: str, model: str, max_horizon: int) -> Dict[int, np.ndarray]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT horizon, residual FROM residuals WHERE ticker = ? AND model = ? AND horizon <= ?",
+                (ticker, model, max_horizon)).fetchall()
+        by_horizon: Dict[int, list] = {}
+        for horizon, residual in rows:
+            by_horizon.setdefault(horizon, []).append(residual)
+        return {h: np.array(values) for h, values in by_horizon.items()}
+
+    def record(self, ticker: str, model: str, origin, forecasts) -> None:
+        """Remember a forecast so ``score`` can turn it into residuals later"""
+        origin = self._origin(origin)
+        rows = [(ticker, model, origin, h, float(f)) for h, f in enumerate(np.asarray(forecasts), 1)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def score(self, ticker: str, model: str, close: pd.Series) -> int:
+        """Score recorded forecasts whose bars have arrived; returns residuals added"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT origin, horizon, forecast FROM pending WHERE ticker = ? AND model = ?",
+                (ticker, model)).fetchall()
+        if not rows:
+            return 0
+        positions = {self._origin(ts): i for i, ts in enumerate(close.index)}
+        values = close.to_numpy(dtype=np.float64)
+        # Forecasts this old will never be scored (a shorter period may just not reach them)
+        expired = self._origin(close.index[-1] - pd.Timedelta(days=PENDING_MAX_AGE_DAYS))
+        scored: Dict[str, Dict[int, float]] = {}
+        done, stale = [], []
+        for origin, horizon, forecast in rows:
+            position = positions.get(origin)
+            if position is None:
+                if origin < expired:
+                    stale.append((origin, horizon))
+                continue
+            if position + horizon < len(values):
+                scored.setdefault(origin, {})[horizon] = math.log(values[position + horizon] / forecast)
+                done.append((origin, horizon))
+        rows = [(ticker, model, h, origin, r)
+                for origin, by_horizon in scored.items() for h, r in by_horizon.items()]
+        with self._lock:
+            if rows:
+                self._insert(ticker, model, rows)
+            self._conn.executemany("DELETE FROM pending WHERE ticker = ? AND model = ? AND origin = ? AND horizon = ?",
+                                   [(ticker, model, o, h) for o, h in done + stale])
+            self._conn.commit()
+        return len(rows)
+
+    def needs_calibration(self, ticker: str, model: str, data: pd.DataFrame, horizon: int,
+                          every: int = CALIBRATE_EVERY) -> bool:
+        """Whether ``calibrate`` would refit: no ``horizon``-step residual from the last ``every`` origins"""
+        if len(data) <= horizon * 2 + every:
+            return len(data) > horizon * 2 and not self.has_origin(ticker, model, data.index[-horizon - 1])
+        latest = self.latest_origin(ticker, model, horizon)
+        return latest is None or latest < self._origin(data.index[-horizon - every])
+
+    def calibrate(self, ticker: str, model: str, data: pd.DataFrame,
+                  fit_predict: Callable[[pd.DataFrame, int], np.ndarray], horizon: int) -> bool:
+        """Fit on all but the last ``horizon`` bars and store the holdout residuals (rate limited,
+        see ``needs_calibration``)"""
+        if not self.needs_calibration(ticker, model, data, horizon):
+            return False
+        origin = data.index[-horizon - 1]
+        try:
+            predictions = np.asarray(fit_predict(data.iloc[:-horizon], horizon), dtype=np.float64)[:horizon]
+        except Exception:
+            return False  # Intervals are best effort; the forecast itself already succeeded
+        actual = data['Close'].to_numpy(dtype=np.float64)[-horizon:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.add(ticker, model, origin, np.log(actual[:len(predictions)] / predictions))
+        return True
+
+    def forecast(self, ticker: str, model: str, predictions, close: pd.Series,
+                 level: float = 0.9) -> Forecast:
+        """Wrap point forecasts with per-horizon conformal bounds"""
+        values = np.asarray(predictions, dtype=np.float64)
+        stored = self.residuals(ticker, model, len(values))
+        history = close.to_numpy(dtype=np.float64)
+        lower, upper, sources = [], [], []
+        for h, value in enumerate(values, 1):
+            residuals = stored.get(h, np.array([]))
+            source = 'model'
+            bounds = conformal_bounds(residuals, level) if len(residuals) >= MIN_RESIDUALS else None
+            if bounds is None:
+                residuals, source = naive_residuals(history, h), 'naive'
+                bounds = conformal_bounds(residuals, level)
+            if not len(residuals):
+                lo = hi = float('nan')
+            elif bounds is None:
+                lo, hi = -math.inf, math.inf  # Too few moves to bound this level
+            else:
+                lo, hi = bounds
+            lower.append(value * math.exp(lo))
+            upper.append(value * math.exp(hi))
+            sources.append(source)
+        return Forecast(values, lower, upper, level, sources)
+
+
+# Process-wide store; every worker opens the same file (see serve.py) when it first needs it
+RESIDUALS = ResidualStore()
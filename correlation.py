@@ -0,0 +1,266 @@
+"""Rolling covariance and correlation across a universe of tickers.
+
+``RollingCovariance`` keeps the window's pairwise sums (counts, sums and
+cross products, each N x N) and a ring buffer of the window's return rows.
+A new bar adds its outer products and subtracts those of the bar leaving
+the window, which costs O(N^2). Recomputing from scratch costs O(N^2 T).
+Missing returns are handled pairwise, the same as pandas' ``cov``/``corr``.
+The sums are rebuilt from the buffer every ``window`` updates so that
+add/subtract rounding cannot drift.
+
+Ledoit-Wolf shrinkage needs the window's fourth moments only through row
+norms, so it adds O(N T) on top of the incremental matrix. Hierarchical
+clustering orders tickers by correlation distance for heatmaps and
+peer groups.
+
+``window_correlation`` keeps one engine per (tickers, window), at most
+CORRELATION_ENGINES of them, and reads the matrix under the same lock that
+advances the engine, so concurrent sessions never see a half-updated one.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk import log_returns
+
+MAX_ENGINES = int(os.environ.get("CORRELATION_ENGINES", "32"))
+
+
+class RollingCovariance:
+    """Pairwise-complete covariance over the last ``window`` return rows"""
+
+    def __init__(self, tickers: Sequence[str], window: int = 63):
+        self.tickers = list(tickers)
+        self.window = window
+        n = len(self.tickers)
+        self.buffer = np.full((window, n), np.nan)
+        self.position = 0  # next buffer row to overwrite
+        self.size = 0
+        self.last_index = None
+        self.updates_since_rebuild = 0
+        # Stacked pairwise sums over rows where both x_i and x_j are present:
+        # [count, sum of x_i, sum of x_i ** 2, sum of x_i * x_j]
+        self.terms = np.zeros((4, n, n))
+        self._scratch = None
+
+    @staticmethod
+    def _terms(rows: np.ndarray) -> np.ndarray:
+        present = (~np.isnan(rows)).astype(np.float64)
+        values = np.nan_to_num(rows)
+        return np.stack([present.T @ present, values.T @ present,
+                         (values ** 2).T @ present, values.T @ values])
+
+    def _add_row(self, row: np.ndarray, sign: float) -> None:
+        # Same as terms += sign * _terms(row[None]), as one outer product into scratch space
+        present = (~np.isnan(row)).astype(np.float64)
+        values = np.nan_to_num(row)
+        left = np.stack([present, values, values * values, values]) * sign
+        right = np.stack([present, present, present, values])
+        if self._scratch is None:
+            self._scratch = np.empty_like(self.terms)
+        np.multiply(left[:, :, None], right[:, None, :], out=self._scratch)
+        self.terms += self._scratch
+
+    def _rebuild(self) -> None:
+        self.terms = self._terms(self.rows())
+        self.updates_since_rebuild = 0
+
+    def seed(self, returns: pd.DataFrame) -> None:
+        """Start from the last ``window`` rows of a dates x tickers return frame"""
+        rows = returns[self.tickers].to_numpy(dtype=np.float64)[-self.window:]
+        self.buffer[:] = np.nan
+        self.buffer[:len(rows)] = rows
+        self.size = len(rows)
+        self.position = self.size % self.window
+        self.last_index = returns.index[-1] if len(returns) else None
+        self._rebuild()
+
+    def update(self, row: np.ndarray) -> None:
+        """Slide the window forward by one bar of returns (NaN = no data)"""
+        row = np.asarray(row, dtype=np.float64)
+        self._add_row(row, 1.0)
+        if self.size == self.window:
+            self._add_row(self.buffer[self.position], -1.0)
+        self.buffer[self.position] = row
+        self.position = (self.position + 1) % self.window
+        self.size = min(self.size + 1, self.window)
+        self.updates_since_rebuild += 1
+        if self.updates_since_rebuild >= self.window:
+            self._rebuild()
+
+    def can_extend(self, returns: pd.DataFrame) -> bool:
+        """Whether ``returns`` only adds rows after the window this engine holds"""
+        if self.last_index is None or list(returns.columns) != self.tickers \
+                or self.last_index not in returns.index:
+            return False
+        seen = returns.loc[:self.last_index, self.tickers]
+        if self.size < self.window and len(seen) > self.size:
+            return False  # Longer history than the engine was seeded with: the window can fill
+        # Revised or back-filled bars inside the window mean the sums are stale
+        return np.array_equal(seen.to_numpy(dtype=np.float64)[len(seen) - self.size:], self.rows(),
+                              equal_nan=True)
+
+    def extend(self, returns: pd.DataFrame) -> int:
+        """Advance over rows newer than the last one seen; returns rows added"""
+        new = returns.loc[returns.index > self.last_index, self.tickers]
+        rows = new.to_numpy(dtype=np.float64)
+        if len(rows) == 1:
+            self.update(rows[0])
+        elif len(rows) >= self.window:
+            self.seed(new)
+        elif len(rows):
+            # Several bars at once: one batched product for the rows entering
+            # and one for the rows they push out of the window
+            leaving = self.rows()[:max(self.size + len(rows) - self.window, 0)]
+            self.terms += self._terms(rows) - self._terms(leaving)
+            positions = (self.position + np.arange(len(rows))) % self.window
+            self.buffer[positions] = rows
+            self.position = (self.position + len(rows)) % self.window
+            self.size = min(self.size + len(rows), self.window)
+            self.updates_since_rebuild += len(rows)
+            if self.updates_since_rebuild >= self.window:
+                self._rebuild()
+        if len(new):
+            self.last_index = new.index[-1]
+        return len(new)
+
+    def rows(self) -> np.ndarray:
+        """Window rows, oldest first"""
+        start = self.position if self.size == self.window else 0
+        order = (start + np.arange(self.size)) % self.window
+        return self.buffer[order]
+
+    def _frame(self, values: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(values, index=self.tickers, columns=self.tickers)
+
+    def covariance(self, ddof: int = 1) -> pd.DataFrame:
+        counts, sums, _, products = self.terms
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (products - sums * sums.T / counts) / (counts - ddof)
+        cov[counts <= ddof] = np.nan
+        return self._frame(cov)
+
+    def correlation(self) -> pd.DataFrame:
+        counts, sums, squares, products = self.terms
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = products - sums * sums.T / counts
+            # Each pair's variances come from the same rows as its covariance
+            var = squares - sums ** 2 / counts
+            corr = cov / np.sqrt(var * var.T)
+        corr[counts <= 1] = np.nan
+        np.fill_diagonal(corr, np.where(np.diag(counts) > 1, 1.0, np.nan))
+        return self._frame(np.clip(corr, -1.0, 1.0))
+
+    def shrunk_covariance(self) -> Tuple[pd.DataFrame, float]:
+        """Ledoit-Wolf covariance over the tickers with a full window, and the shrinkage used"""
+        rows = self.rows()
+        complete = ~np.isnan(rows).any(axis=0)
+        if complete.sum() < 2 or len(rows) < 2:
+            raise ValueError("Need at least two tickers with a complete window")
+        names = [t for t, keep in zip(self.tickers, complete) if keep]
+        idx = np.flatnonzero(complete)
+        t = len(rows)
+        _, sums, _, products = self.terms
+        mean = sums[idx, idx] / t
+        # Biased sample covariance straight from the incremental sums
+        sample = products[np.ix_(idx, idx)] / t - np.outer(mean, mean)
+        centered = rows[:, idx] - mean
+        cov, shrinkage = _ledoit_wolf(sample, (centered ** 2).sum(axis=1), t)
+        return pd.DataFrame(cov, index=names, columns=names), shrinkage
+
+
+def _ledoit_wolf(sample: np.ndarray, row_norms: np.ndarray, n_obs: int) -> Tuple[np.ndarray, float]:
+    """Shrink a biased sample covariance toward a scaled identity (Ledoit & Wolf, 2004)"""
+    n = sample.shape[0]
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+    delta = np.sum((sample - target) ** 2)
+    # sum_t ||y_t y_t' - S||^2 = sum_t ||y_t||^4 - T ||S||^2
+    beta = (np.sum(row_norms ** 2) - n_obs * np.sum(sample ** 2)) / n_obs ** 2
+    shrinkage = 0.0 if delta == 0 else float(min(max(beta, 0.0), delta) / delta)
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def ledoit_wolf(returns) -> Tuple[np.ndarray, float]:
+    """Ledoit-Wolf covariance of a complete (dates x tickers) return matrix"""
+    x = np.asarray(returns, dtype=np.float64)
+    centered = x - x.mean(axis=0)
+    sample = centered.T @ centered / len(x)
+    return _ledoit_wolf(sample, (centered ** 2).sum(axis=1), len(x))
+
+
+def covariance_to_correlation(cov: pd.DataFrame) -> pd.DataFrame:
+    std = np.sqrt(np.diag(cov.to_numpy()))
+    return cov / np.outer(std, std)
+
+
+def cluster_order(corr: pd.DataFrame, n_clusters: Optional[int] = None,
+                  method: str = 'average') -> Tuple[List[str], Dict[str, int]]:
+    """Tickers in dendrogram leaf order, and a cluster label per ticker
+
+    Distance is sqrt((1 - rho) / 2), so perfectly correlated tickers sit at 0.
+    Tickers without a correlation estimate are left out.
+    """
+    from scipy.cluster.hierarchy import fcluster, leaves_list, linkage
+    from scipy.spatial.distance import squareform
+
+    corr = corr.dropna(how='all').dropna(axis=1, how='all')
+    names = list(corr.index)
+    if len(names) < 3:
+        return names, {name: 1 for name in names}
+    rho = np.nan_to_num(corr.to_numpy(), nan=0.0)
+    distance = np.sqrt(np.clip((1 - rho) / 2, 0.0, 1.0))
+    np.fill_diagonal(distance, 0.0)
+    tree = linkage(squareform(distance, checks=False), method=method)
+    order = [names[i] for i in leaves_list(tree)]
+    k = n_clusters or max(2, int(round(np.sqrt(len(names) / 2))))
+    labels = fcluster(tree, k, criterion='maxclust')
+    return order, dict(zip(names, labels.tolist()))
+
+
+def returns_matrix(prices: pd.DataFrame) -> pd.DataFrame:
+    """Log returns of a dates x tickers price matrix, first row dropped"""
+    values = log_returns(prices.to_numpy(dtype=np.float64))
+    return pd.DataFrame(values, index=prices.index[1:], columns=prices.columns)
+
+
+_engines: "OrderedDict[tuple, RollingCovariance]" = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def _engine(returns: pd.DataFrame, window: int) -> RollingCovariance:
+    """Process-wide engine per (tickers, window), advanced only over new bars; hold _engines_lock"""
+    key = (tuple(returns.columns), window)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines[key] = RollingCovariance(returns.columns, window)
+        engine.seed(returns)
+        while len(_engines) > MAX_ENGINES:
+            _engines.popitem(last=False)
+    elif engine.can_extend(returns):
+        engine.extend(returns)
+    else:
+        engine.seed(returns)
+    _engines.move_to_end(key)
+    return engine
+
+
+def window_correlation(prices: pd.DataFrame, window: int = 63,
+                       shrink: bool = False) -> Tuple[pd.DataFrame, Optional[float]]:
+    """Correlation over the last ``window`` returns of a price matrix, and the shrinkage used.
+
+    With ``shrink`` the matrix comes from the Ledoit-Wolf covariance of the
+    tickers with a complete window; otherwise it is pairwise-complete and
+    the shrinkage is None.
+    """
+    returns = returns_matrix(prices)
+    with _engines_lock:
+        engine = _engine(returns, window)
+        if shrink:
+            cov, shrinkage = engine.shrunk_covariance()
+            return covariance_to_correlation(cov), shrinkage
+        return engine.correlation(), None
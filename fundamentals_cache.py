@@ -0,0 +1,188 @@
+"""Persistent cache for Yahoo ``Ticker.info`` snapshots.
+
+Reads are served from memory, then from a local SQLite file, and only a
+ticker never seen before blocks on the network. Entries older than
+``max_age`` are still served immediately but queue a background refresh.
+Every entry carries a content hash, so a refresh that returns the same
+fundamentals only bumps the timestamp and the entry's version stays put.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import yfinance as yf
+
+from replay import recorded
+
+FUNDAMENTALS_DB = os.environ.get("FUNDAMENTALS_DB", "fundamentals_cache.db")
+FUNDAMENTALS_MAX_AGE = float(os.environ.get("FUNDAMENTALS_MAX_AGE_HOURS", "24")) * 3600
+
+# Quote fields that change on every request; left out of the content hash
+VOLATILE_KEYS = {
+    'currentPrice', 'bid', 'ask', 'bidSize', 'askSize', 'volume', 'dayLow', 'dayHigh',
+    'open', 'previousClose', 'regularMarketPrice', 'regularMarketOpen', 'regularMarketDayLow',
+    'regularMarketDayHigh', 'regularMarketVolume', 'regularMarketPreviousClose',
+    'regularMarketChange', 'regularMarketChangePercent', 'regularMarketTime',
+    'preMarketPrice', 'postMarketPrice', 'postMarketTime', 'preMarketTime',
+}
+
+Entry = namedtuple('Entry', ['info', 'fetched_at', 'digest'])
+
+
+def content_digest(info: Dict[str, Any]) -> str:
+    stable = {k: v for k, v in info.items() if k not in VOLATILE_KEYS}
+    payload = json.dumps(stable, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+@recorded("yahoo.info")
+def fetch_info(ticker: str) -> Dict[str, Any]:
+    return yf.Ticker(ticker).info
+
+
+class FundamentalsCache:
+    """Memory + disk cache of info dicts with background refresh of stale entries"""
+
+    def __init__(self, db_path: str = FUNDAMENTALS_DB, max_age: float = FUNDAMENTALS_MAX_AGE,
+                 fetch: Callable[[str], Dict[str, Any]] = fetch_info, max_workers: int = 2):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.fetch = fetch
+        self._memory: Dict[str, Entry] = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fundamentals")
+        self._db: Optional[sqlite3.Connection] = None
+        self._open_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.changes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # WAL lets every worker process read and refresh the same file concurrently
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS info_cache (
+            ticker TEXT PRIMARY KEY, fetched_at REAL, digest TEXT, info TEXT)""")
+        conn.commit()
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module creates no file
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._connect()
+        return self._db
+
+    # -- storage -----------------------------------------------------------
+
+    def _read_disk(self, ticker: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, fetched_at, digest FROM info_cache WHERE ticker = ?", (ticker,)).fetchone()
+        if row is None:
+            return None
+        return Entry(json.loads(row[0]), row[1], row[2])
+
+    def _write(self, ticker: str, entry: Entry, info_changed: bool) -> None:
+        with self._lock:
+            self._memory[ticker] = entry
+            if info_changed:
+                self._conn.execute("INSERT OR REPLACE INTO info_cache VALUES (?, ?, ?, ?)",
+                                   (ticker, entry.fetched_at, entry.digest,
+                                    json.dumps(entry.info, default=str)))
+            else:
+                self._conn.execute("UPDATE info_cache SET fetched_at = ? WHERE ticker = ?",
+                                   (entry.fetched_at, ticker))
+            self._conn.commit()
+
+    # -- public API --------------------------------------------------------
+
+    def entry(self, ticker: str) -> Optional[Entry]:
+        """Cached entry without triggering any fetch"""
+        ticker = ticker.upper()
+        entry = self._memory.get(ticker)
+        if entry is None:
+            entry = self._read_disk(ticker)
+            if entry is not None:
+                with self._lock:
+                    self._memory[ticker] = entry
+        return entry
+
+    def get(self, ticker: str) -> Dict[str, Any]:
+        """Info dict for a ticker; stale entries are returned and refreshed in the background"""
+        ticker = ticker.upper()
+        entry = self.entry(ticker)
+        if entry is None:
+            self.misses += 1
+            self.refresh(ticker)
+            entry = self._memory.get(ticker)
+            return entry.info if entry else {}
+        self.hits += 1
+        if time.time() - entry.fetched_at > self.max_age:
+            # Another worker may already have refreshed the shared file
+            latest = self._read_disk(ticker)
+            if latest is not None and latest.fetched_at > entry.fetched_at:
+                with self._lock:
+                    self._memory[ticker] = latest
+                entry = latest
+            if time.time() - entry.fetched_at > self.max_age:
+                self.refresh_async(ticker)
+        return entry.info
+
+    def refresh(self, ticker: str) -> bool:
+        """Fetch now; returns True if the fundamentals changed"""
+        ticker = ticker.upper()
+        info = self.fetch(ticker)
+        self.refreshes += 1
+        if not info:
+            return False  # Keep serving the previous snapshot
+        digest = content_digest(info)
+        previous = self._memory.get(ticker) or self._read_disk(ticker)
+        changed = previous is None or previous.digest != digest
+        # Unchanged content keeps the stored snapshot (and its version) as is
+        stored_info = info if changed else previous.info
+        self._write(ticker, Entry(stored_info, time.time(), digest), changed)
+        if changed:
+            self.changes += 1
+        return changed
+
+    def refresh_async(self, ticker: str) -> None:
+        """Queue a background refresh unless one is already pending"""
+        ticker = ticker.upper()
+        with self._lock:
+            if ticker in self._pending:
+                return
+            self._pending.add(ticker)
+        self._executor.submit(self._refresh_task, ticker)
+
+    def _refresh_task(self, ticker: str) -> None:
+        try:
+            self.refresh(ticker)
+        except Exception:
+            pass  # A failed refresh leaves the stale snapshot in place
+        finally:
+            with self._lock:
+                self._pending.discard(ticker)
+
+    def version(self, ticker: str) -> Optional[str]:
+        """Content hash of the cached snapshot, for keying derived caches"""
+        entry = self.entry(ticker)
+        return entry.digest if entry else None
+
+    def is_stale(self, ticker: str) -> bool:
+        entry = self.entry(ticker)
+        return entry is None or time.time() - entry.fetched_at > self.max_age
+
+
+# Process-wide cache shared by every session
+FUNDAMENTALS = FundamentalsCache()
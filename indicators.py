@@ -0,0 +1,245 @@
+"""Technical indicator engine.
+
+Every indicator works on 2-D (dates x tickers) float arrays, so a whole
+universe is computed in one call. ``IndicatorEngine`` memoizes results per
+(ticker, period, indicator, params) and stores them as compact float32
+blocks that the charts read directly. The engine is shared by every
+session thread, so its LRU is guarded by a lock.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from rolling import _pad_front, ewm_mean, rolling_mean, rolling_std, rsi as wilder_rsi, wilder_smooth
+
+
+def _rolling_extreme(x: np.ndarray, window: int, func) -> np.ndarray:
+    if x.shape[0] < window:
+        return np.full(x.shape, np.nan)
+    view = sliding_window_view(x, window, axis=0)
+    return _pad_front(func(view, axis=-1), window - 1)
+
+
+def sma(close: np.ndarray, window: int = 20) -> Tuple[np.ndarray]:
+    return (rolling_mean(close, window),)
+
+
+def ema(close: np.ndarray, span: int = 20) -> Tuple[np.ndarray]:
+    """Same as ``ewm(span=span, adjust=False).mean()``"""
+    return (ewm_mean(close, 2.0 / (span + 1)),)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> Tuple[np.ndarray]:
+    return (wilder_rsi(close, period),)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    line = ema(close, fast)[0] - ema(close, slow)[0]
+    signal_line = ewm_mean(line, 2.0 / (signal + 1))
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close: np.ndarray, window: int = 20,
+              num_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    middle = rolling_mean(close, window)
+    width = rolling_std(close, window) * num_std
+    return middle, middle + width, middle - width
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+        period: int = 14) -> Tuple[np.ndarray]:
+    prev_close = _pad_front(close[:-1], 1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return (wilder_smooth(true_range, period),)
+
+
+def obv(close: np.ndarray, volume: np.ndarray) -> Tuple[np.ndarray]:
+    direction = np.sign(np.diff(close, axis=0))
+    flow = np.nan_to_num(direction * volume[1:])
+    return (np.concatenate([np.zeros((1,) + close.shape[1:]), np.cumsum(flow, axis=0)], axis=0),)
+
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+         window: Optional[int] = None) -> Tuple[np.ndarray]:
+    """Volume-weighted typical price, anchored at the first bar or over a rolling window"""
+    typical = (high + low + close) / 3
+    if window:
+        weighted = rolling_mean(typical * volume, window)
+        total = rolling_mean(volume, window)
+    else:
+        weighted = np.nancumsum(typical * volume, axis=0)
+        total = np.nancumsum(volume, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (weighted / total,)
+
+
+def stochastic(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+               k_period: int = 14, d_period: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    highest = _rolling_extreme(high, k_period, np.max)
+    lowest = _rolling_extreme(low, k_period, np.min)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_k = 100 * (close - lowest) / (highest - lowest)
+    return percent_k, rolling_mean(percent_k, d_period)
+
+
+Indicator = namedtuple('Indicator', ['func', 'inputs', 'defaults', 'outputs'])
+
+INDICATORS: Dict[str, Indicator] = {
+    'SMA': Indicator(sma, ('Close',), {'window': 20}, ('SMA',)),
+    'EMA': Indicator(ema, ('Close',), {'span': 20}, ('EMA',)),
+    'RSI': Indicator(rsi, ('Close',), {'period': 14}, ('RSI',)),
+    'MACD': Indicator(macd, ('Close',), {'fast': 12, 'slow': 26, 'signal': 9},
+                      ('MACD', 'Signal', 'Histogram')),
+    'Bollinger Bands': Indicator(bollinger, ('Close',), {'window': 20, 'num_std': 2.0},
+                                 ('Middle', 'Upper', 'Lower')),
+    'ATR': Indicator(atr, ('High', 'Low', 'Close'), {'period': 14}, ('ATR',)),
+    'OBV': Indicator(obv, ('Close', 'Volume'), {}, ('OBV',)),
+    'VWAP': Indicator(vwap, ('High', 'Low', 'Close', 'Volume'), {'window': None}, ('VWAP',)),
+    'Stochastic': Indicator(stochastic, ('High', 'Low', 'Close'), {'k_period': 14, 'd_period': 3},
+                            ('%K', '%D')),
+}
+
+
+class IndicatorResult:
+    """One indicator for one ticker: a float32 (dates x outputs) block"""
+
+    __slots__ = ('index', 'columns', 'values')
+
+    def __init__(self, index: pd.Index, columns: Tuple[str, ...], values: np.ndarray):
+        self.index = index
+        self.columns = columns
+        self.values = values
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.values[:, self.columns.index(column)]
+
+    def series(self, column: str) -> pd.Series:
+        return pd.Series(self[column], index=self.index, name=column)
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=self.index, columns=list(self.columns))
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+FINGERPRINT_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def data_fingerprint(data: pd.DataFrame) -> tuple:
+    """Content identity for a price frame: its dates and every OHLCV value.
+
+    Revisions anywhere in the history (e.g. closes re-adjusted for a
+    dividend) change it, not just a new last bar.
+    """
+    if data.empty:
+        return (0,)
+    digest = hashlib.sha1(np.asarray(pd.DatetimeIndex(data.index).asi8).tobytes())
+    for column in FINGERPRINT_COLUMNS:
+        if column in data:
+            digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).tobytes())
+    return (len(data), digest.hexdigest())
+
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+
+class IndicatorEngine:
+    """Memoizing front end over INDICATORS with a bounded LRU"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[tuple, Tuple[tuple, IndicatorResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: tuple, fingerprint: tuple) -> Optional[IndicatorResult]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def _store(self, key: tuple, fingerprint: tuple, result: IndicatorResult) -> None:
+        with self._lock:
+            self._cache[key] = (fingerprint, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def compute(self, ticker: str, period: str, data: pd.DataFrame,
+                name: str, **params) -> IndicatorResult:
+        """Compute (or reuse) one indicator for one ticker"""
+        return self.compute_many(period, {ticker: data}, name, **params)[ticker]
+
+    def compute_many(self, period: str, frames: Dict[str, pd.DataFrame],
+                     name: str, **params) -> Dict[str, IndicatorResult]:
+        """Compute one indicator for many tickers in a single vectorized call"""
+        spec = INDICATORS[name]
+        params = {**spec.defaults, **params}
+        params_key = _params_key(params)
+
+        results, pending = {}, {}
+        for ticker, data in frames.items():
+            fingerprint = data_fingerprint(data)
+            cached = self._lookup((ticker, period, name, params_key), fingerprint)
+            if cached is not None:
+                results[ticker] = cached
+            else:
+                pending[ticker] = (data, fingerprint)
+        if not pending:
+            return results
+
+        # One vectorized call per calendar: aligning different calendars onto a
+        # union index would leave NaN gaps that depend on the batch's makeup
+        groups: List[Tuple[pd.Index, List[str]]] = []
+        for ticker, (data, _) in pending.items():
+            for index, members in groups:
+                if data.index.equals(index):
+                    members.append(ticker)
+                    break
+            else:
+                groups.append((data.index, [ticker]))
+
+        for index, tickers in groups:
+            inputs = [
+                np.column_stack([pending[t][0][field].to_numpy(dtype=np.float64) for t in tickers])
+                for field in spec.inputs
+            ]
+            outputs = spec.func(*inputs, **params)
+            for col, ticker in enumerate(tickers):
+                data, fingerprint = pending[ticker]
+                block = np.column_stack([out[:, col] for out in outputs]).astype(np.float32)
+                result = IndicatorResult(data.index, spec.outputs, block)
+                self._store((ticker, period, name, params_key), fingerprint, result)
+                results[ticker] = result
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(result.nbytes for _, result in self._cache.values())
+
+
+# Process-wide engine shared by every session
+ENGINE = IndicatorEngine()
+
+
+def available_indicators() -> List[str]:
+    return list(INDICATORS)
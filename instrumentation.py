@@ -0,0 +1,295 @@
+"""Lightweight timing, cache and memory instrumentation.
+
+``span`` / ``timed`` record wall time per named code path, ``count`` bumps
+counters and ``register_cache`` exposes hit/miss numbers of any cache.
+Everything lives in one process-wide registry that the hidden debug panel
+reads, and that can be exported as Prometheus text over a local HTTP
+endpoint (METRICS_PORT) or appended to a JSONL file (METRICS_JSONL).
+
+Each process has its own registry. Under serve.py, worker i serves
+METRICS_PORT + i. Alternatively, all workers can append to one
+METRICS_JSONL file, since every snapshot carries its pid.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RECENT_SAMPLES = 256
+RSS_SAMPLE_SECONDS = 1.0  # spans are far more frequent than RSS moves
+
+
+class SpanStats:
+    __slots__ = ('count', 'total', 'max', 'recent', 'errors', 'rss_high_water')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.errors = 0
+        self.rss_high_water = 0
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+_lock = threading.Lock()
+_spans: Dict[str, SpanStats] = {}
+_counters: Dict[str, float] = {}
+_cache_sources: Dict[str, Callable[[], Tuple[int, int]]] = {}
+_exporters: Dict[str, object] = {}
+_rss_sample = (float('-inf'), 0)  # (monotonic time read, bytes)
+
+
+def current_rss() -> int:
+    """Resident set size in bytes (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss() -> int:
+    """Process memory high-water mark in bytes"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def sampled_rss() -> int:
+    """``current_rss``, re-read at most every RSS_SAMPLE_SECONDS"""
+    global _rss_sample
+    read_at, rss = _rss_sample
+    now = time.monotonic()
+    if now - read_at >= RSS_SAMPLE_SECONDS:
+        rss = current_rss()
+        _rss_sample = (now, rss)
+    return rss
+
+
+def record_span(name: str, seconds: float, error: bool = False) -> None:
+    rss = sampled_rss()
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = SpanStats()
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        stats.recent.append(seconds)
+        stats.errors += int(error)
+        stats.rss_high_water = max(stats.rss_high_water, rss)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block: ``with span("data.fetch"): ...``"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start, error)
+
+
+def timed(name: str):
+    """Decorator form of ``span``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    count(f"cache.{cache}.{'hits' if hit else 'misses'}")
+
+
+def register_cache(cache: str, source: Callable[[], Tuple[int, int]]) -> None:
+    """Expose a cache's (hits, misses) through a callable read at snapshot time"""
+    with _lock:
+        _cache_sources[cache] = source
+
+
+def lru_source(func) -> Callable[[], Tuple[int, int]]:
+    """(hits, misses) reader for a functools.lru_cache-wrapped function"""
+    def read():
+        info = func.cache_info()
+        return info.hits, info.misses
+    return read
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        sources = dict(_cache_sources)
+        counters = dict(_counters)
+    stats = {}
+    for cache, source in sources.items():
+        try:
+            hits, misses = source()
+        except Exception:
+            continue
+        stats[cache] = {'hits': hits, 'misses': misses}
+    for key, value in counters.items():
+        if key.startswith('cache.'):
+            _, cache, kind = key.split('.', 2)
+            entry = stats.setdefault(cache, {'hits': 0, 'misses': 0})
+            entry[kind] = entry.get(kind, 0) + value
+    for entry in stats.values():
+        total = entry['hits'] + entry['misses']
+        entry['hit_ratio'] = entry['hits'] / total if total else 0.0
+    return stats
+
+
+def snapshot() -> Dict[str, object]:
+    """Point-in-time copy of every metric"""
+    with _lock:
+        spans = {
+            name: {
+                'count': s.count,
+                'total_s': s.total,
+                'mean_ms': s.total / s.count * 1000 if s.count else 0.0,
+                'p50_ms': s.percentile(50) * 1000,
+                'p95_ms': s.percentile(95) * 1000,
+                'max_ms': s.max * 1000,
+                'errors': s.errors,
+                'rss_high_water_mb': s.rss_high_water / 2**20,
+            }
+            for name, s in _spans.items()
+        }
+        counters = {k: v for k, v in _counters.items() if not k.startswith('cache.')}
+    return {
+        'timestamp': time.time(),
+        'pid': os.getpid(),
+        'spans': spans,
+        'caches': cache_stats(),
+        'counters': counters,
+        'memory': {'rss_mb': current_rss() / 2**20, 'peak_rss_mb': peak_rss() / 2**20},
+    }
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """Metrics in the Prometheus text exposition format"""
+    snap = snapshot()
+    lines = [
+        '# TYPE app_span_seconds_total counter',
+        '# TYPE app_span_count counter',
+        '# TYPE app_span_seconds gauge',
+    ]
+    for name, s in snap['spans'].items():
+        label = f'span="{_label(name)}"'
+        lines.append(f'app_span_seconds_total{{{label}}} {s["total_s"]:.6f}')
+        lines.append(f'app_span_count{{{label}}} {s["count"]}')
+        lines.append(f'app_span_errors{{{label}}} {s["errors"]}')
+        for q in ('p50', 'p95', 'max'):
+            lines.append(f'app_span_seconds{{{label},quantile="{q}"}} {s[q + "_ms"] / 1000:.6f}')
+    lines.append('# TYPE app_cache_requests counter')
+    for cache, c in snap['caches'].items():
+        for kind in ('hits', 'misses'):
+            lines.append(f'app_cache_requests{{cache="{_label(cache)}",result="{kind}"}} {c[kind]}')
+    for name, value in snap['counters'].items():
+        lines.append(f'app_counter{{name="{_label(name)}"}} {value}')
+    lines.append('# TYPE app_memory_bytes gauge')
+    lines.append(f'app_memory_bytes{{kind="rss"}} {snap["memory"]["rss_mb"] * 2**20:.0f}')
+    lines.append(f'app_memory_bytes{{kind="peak_rss"}} {snap["memory"]["peak_rss_mb"] * 2**20:.0f}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_exporter(port: int, host: str = '127.0.0.1') -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on a daemon thread (once per process)"""
+    with _lock:
+        if 'http' in _exporters:
+            return _exporters['http']
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            return None  # Port taken; serve.py gives each worker its own
+        _exporters['http'] = server
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def export_jsonl(path: str) -> None:
+    with open(path, 'a') as f:
+        f.write(json.dumps(snapshot()) + "\n")
+
+
+def start_jsonl_exporter(path: str, interval: float = 60.0) -> None:
+    """Append a snapshot to ``path`` every ``interval`` seconds (once per process)"""
+    with _lock:
+        if 'jsonl' in _exporters:
+            return
+        _exporters['jsonl'] = path
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                export_jsonl(path)
+            except OSError:
+                pass
+
+    threading.Thread(target=loop, name="metrics-jsonl", daemon=True).start()
+
+
+def configure_from_env() -> None:
+    """Start the exporters requested by METRICS_PORT / METRICS_JSONL"""
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        start_http_exporter(int(port))
+    path = os.environ.get("METRICS_JSONL")
+    if path:
+        start_jsonl_exporter(path, float(os.environ.get("METRICS_JSONL_INTERVAL", "60")))
+
+
+def reset() -> None:
+    with _lock:
+        _spans.clear()
+        _counters.clear()
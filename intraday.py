@@ -0,0 +1,245 @@
+"""Intraday bar ingestion.
+
+Each (ticker, interval) gets an append-only ring buffer of OHLCV bars and a
+source that is polled for bars newer than the last one held: Yahoo
+Finance for live data, or a replay of recorded bars for testing. New bars
+advance the rolling-stat kernels in O(1) per bar, so a refresh costs only
+the bars that arrived since the previous one. Only closed bars are
+ingested; the still-forming bar is picked up on the next poll.
+
+Recordings for the replay feed are CSV files named
+``<INTRADAY_REPLAY_DIR>/<TICKER>_<interval>.csv`` with a timestamp index
+and Open/High/Low/Close/Volume columns (see ``record_bars``).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from risk import TRADING_DAYS
+from rolling import RollingStats
+
+INTRADAY_REPLAY_DIR = os.environ.get("INTRADAY_REPLAY_DIR", "replay")
+MAX_FEEDS = int(os.environ.get("INTRADAY_FEEDS", "32"))  # (ticker, interval) feeds kept per process
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# history: how far back the first load goes (Yahoo's limit per interval)
+# poll: the window re-requested on later polls, only bars past the last one are kept
+Interval = namedtuple('Interval', ['minutes', 'history', 'poll', 'min_poll_seconds'])
+# Bars and every derived series taken under one lock, so they always line up
+LiveSnapshot = namedtuple('LiveSnapshot', ['bars', 'series', 'last_added'])
+INTERVALS = {
+    '1m': Interval(1, '7d', '1d', 20),
+    '5m': Interval(5, '60d', '1d', 60),
+    '15m': Interval(15, '60d', '5d', 120),
+}
+BARS_PER_DAY = 390  # regular US session minutes
+
+
+def periods_per_year(interval: str) -> int:
+    return TRADING_DAYS * BARS_PER_DAY // INTERVALS[interval].minutes
+
+
+class BarBuffer:
+    """Fixed-capacity ring buffer of OHLCV bars in timestamp order"""
+
+    def __init__(self, capacity: int = 5000):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, len(FIELDS)), dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        self.total = 0  # bars ever appended, usable as a version number
+        self.tz = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def last_time(self) -> Optional[pd.Timestamp]:
+        if not self.size:
+            return None
+        position = (self.start + self.size - 1) % self.capacity
+        return pd.Timestamp(self.times[position], tz='UTC').tz_convert(self.tz) if self.tz \
+            else pd.Timestamp(self.times[position])
+
+    def append(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """Append bars newer than the last one held and return them (only the newest
+        ``capacity`` stay buffered, but callers tracking every bar need all of them)"""
+        if bars.empty:
+            return bars
+        bars = bars.sort_index()
+        index = pd.DatetimeIndex(bars.index)
+        if not self.size:
+            self.tz = index.tz
+        elif (index.tz is None) != (self.tz is None):
+            raise ValueError("Bars mix tz-aware and tz-naive timestamps")
+        last = self.last_time()
+        if last is not None:
+            bars = bars[index > last]
+            index = pd.DatetimeIndex(bars.index)
+        kept = bars.iloc[-self.capacity:]
+        index = index[-self.capacity:]
+        n = len(kept)
+        if not n:
+            return bars
+        positions = (self.start + self.size + np.arange(n)) % self.capacity
+        self.times[positions] = (index.tz_convert('UTC') if index.tz is not None else index).asi8
+        self.values[positions] = kept[FIELDS].to_numpy(dtype=np.float64)
+        overflow = max(self.size + n - self.capacity, 0)
+        self.size = min(self.size + n, self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.total += len(bars)
+        return bars
+
+    def frame(self) -> pd.DataFrame:
+        """Buffered bars, oldest first"""
+        order = (self.start + np.arange(self.size)) % self.capacity
+        index = pd.DatetimeIndex(self.times[order])
+        if self.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(self.tz)
+        index.name = 'Date'
+        return pd.DataFrame(self.values[order], index=index, columns=FIELDS)
+
+
+class YahooSource:
+    """Polls Yahoo Finance, returning only closed bars newer than ``since``"""
+
+    def __init__(self, ticker: str, interval: str):
+        self.ticker = ticker
+        self.interval = interval
+        self.spec = INTERVALS[interval]
+
+    def poll(self, since: Optional[pd.Timestamp]) -> pd.DataFrame:
+        period = self.spec.history if since is None else self.spec.poll
+        df = yf.Ticker(self.ticker).history(period=period, interval=self.interval)
+        if df.empty:
+            return pd.DataFrame(columns=FIELDS)
+        df = df[FIELDS]
+        df.index.name = 'Date'
+        if since is not None:
+            df = df[df.index > since]
+        # The newest bar is still forming until its interval has elapsed
+        now = pd.Timestamp.now(tz=df.index.tz)
+        closed = df.index + pd.Timedelta(minutes=self.spec.minutes) <= now
+        return df[closed]
+
+
+class ReplaySource:
+    """Serves recorded bars as if they were arriving live.
+
+    The first poll returns ``warmup`` bars of history; every later poll
+    releases the next ``batch`` bars until the recording is exhausted.
+    """
+
+    def __init__(self, bars: pd.DataFrame, warmup: int = 300, batch: int = 1):
+        self.bars = bars.sort_index()[FIELDS]
+        self.warmup = warmup
+        self.batch = batch
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplaySource":
+        bars = pd.read_csv(path, index_col=0)
+        bars.index = pd.to_datetime(bars.index, utc=True)
+        return cls(bars, **kwargs)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.position >= len(self.bars)
+
+    def poll(self, since: Optional[pd.Timestamp]) -> pd.DataFrame:
+        step = self.warmup if self.position == 0 else self.batch
+        chunk = self.bars.iloc[self.position:self.position + step]
+        self.position += len(chunk)
+        if since is not None:
+            chunk = chunk[chunk.index > since]
+        return chunk
+
+
+def record_bars(bars: pd.DataFrame, path: str) -> None:
+    """Save bars in the layout ReplaySource.from_file reads"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    bars[FIELDS].to_csv(path, index_label='Date')
+
+
+def replay_path(ticker: str, interval: str, replay_dir: str = INTRADAY_REPLAY_DIR) -> Optional[str]:
+    path = os.path.join(replay_dir, f"{ticker.upper()}_{interval}.csv")
+    return path if os.path.isfile(path) else None
+
+
+class LiveBars:
+    """Ring buffer, source and incremental rolling stats for one ticker/interval"""
+
+    def __init__(self, ticker: str, interval: str, source=None, capacity: int = 5000,
+                 min_poll_seconds: Optional[float] = None):
+        self.ticker = ticker
+        self.interval = interval
+        self.source = source or YahooSource(ticker, interval)
+        self.buffer = BarBuffer(capacity)
+        self.stats = RollingStats(periods_per_year=periods_per_year(interval))
+        self.min_poll_seconds = INTERVALS[interval].min_poll_seconds \
+            if min_poll_seconds is None else min_poll_seconds
+        self.last_poll = 0.0
+        self.last_added = 0
+        self._lock = threading.Lock()
+
+    def update(self, force: bool = False) -> int:
+        """Poll the source for new bars (rate limited); returns bars added"""
+        with self._lock:
+            if not force and time.time() - self.last_poll < self.min_poll_seconds:
+                return 0
+            self.last_poll = time.time()
+            added = self.buffer.append(self.source.poll(self.buffer.last_time()))
+            if added.empty:
+                self.last_added = 0
+                return 0
+            if not len(self.stats.index):
+                self.stats.seed(self.buffer.frame()['Close'])
+            else:
+                self.stats.append(added['Close'])
+                self.stats.trim(self.buffer.capacity)
+            self.last_added = len(added)
+            return self.last_added
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            return self.buffer.frame()
+
+    def series(self, name: str) -> pd.Series:
+        with self._lock:
+            return self.stats.series(name)
+
+    def snapshot(self) -> LiveSnapshot:
+        """Buffered bars, all rolling series and the last batch size, consistent with each other"""
+        with self._lock:
+            return LiveSnapshot(self.buffer.frame(),
+                                {name: self.stats.series(name) for name in self.stats.columns},
+                                self.last_added)
+
+
+_live: "OrderedDict[tuple, LiveBars]" = OrderedDict()
+_live_lock = threading.Lock()
+
+
+def get_live(ticker: str, interval: str, replay_dir: str = INTRADAY_REPLAY_DIR) -> LiveBars:
+    """Process-wide LiveBars per (ticker, interval), at most MAX_FEEDS of them, least recently
+    used evicted first; replays a recording when one exists"""
+    key = (ticker.upper(), interval)
+    with _live_lock:
+        live = _live.get(key)
+        if live is None:
+            path = replay_path(ticker, interval, replay_dir)
+            if path:
+                live = LiveBars(ticker, interval, ReplaySource.from_file(path), min_poll_seconds=0)
+            else:
+                live = LiveBars(ticker, interval)
+            _live[key] = live
+            while len(_live) > MAX_FEEDS:
+                _live.popitem(last=False)
+        _live.move_to_end(key)
+    return live
@@ -0,0 +1,193 @@
+"""Memoization across Streamlit reruns.
+
+Every widget interaction reruns the script from the top. ``MEMO.call``
+keys a function call on its name and a fingerprint of each argument
+(content hashes for frames and arrays), and keeps the result at two
+levels:
+
+- session: ``st.session_state``, private to one browser session;
+- shared: a process-wide LRU that every session of this worker hits.
+
+So a rerun that only changes one widget recomputes only the calls whose
+inputs changed. Values are returned as is, so callers treat them as
+read-only. Each tier is bounded by entry count and by the approximate
+bytes of its values (MEMO_SESSION_MB / MEMO_SHARED_MB); a value larger than
+a tier's byte budget isn't kept there at all.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import runtime
+
+SESSION_KEY = "_memo"
+MEMO_SESSION_MB = float(os.environ.get("MEMO_SESSION_MB", "256"))
+MEMO_SHARED_MB = float(os.environ.get("MEMO_SHARED_MB", "512"))
+_MISSING = object()
+
+
+def value_nbytes(value: Any) -> int:
+    """Approximate memory held by a memoized value (arrays, frames and containers of them)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def fingerprint(value: Any):
+    """Hashable identity of an argument; frames and arrays are hashed by content"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha1()
+        labels = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr((value.shape, labels)).encode())
+        if isinstance(value.index, pd.DatetimeIndex):
+            digest.update(value.index.asi8.tobytes())
+        else:
+            digest.update(pd.util.hash_pandas_object(value.index).to_numpy().tobytes())
+        try:
+            digest.update(np.ascontiguousarray(value.to_numpy(dtype=np.float64)).tobytes())
+        except (TypeError, ValueError):
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        return ('frame', digest.hexdigest())
+    if isinstance(value, np.ndarray):
+        return ('array', value.shape, str(value.dtype),
+                hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, fingerprint(v)) for k, v in value.items()))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class Memo:
+    """Two-level (session, then process-wide) memo of function calls"""
+
+    def __init__(self, max_session_entries: int = 64, max_shared_entries: int = 256,
+                 max_session_bytes: int = int(MEMO_SESSION_MB * 2**20),
+                 max_shared_bytes: int = int(MEMO_SHARED_MB * 2**20)):
+        self.max_session_entries = max_session_entries
+        self.max_shared_entries = max_shared_entries
+        self.max_session_bytes = max_session_bytes
+        self.max_shared_bytes = max_shared_bytes
+        self._shared: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._fallback: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.session_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _session(self) -> "OrderedDict[tuple, tuple]":
+        if not runtime.exists():
+            return self._fallback  # Outside a Streamlit server (scripts, benchmarks)
+        try:
+            store = st.session_state.get(SESSION_KEY)
+            if store is None:
+                store = st.session_state[SESSION_KEY] = OrderedDict()
+            return store
+        except Exception:
+            return self._fallback
+
+    @staticmethod
+    def key(name: str, args: tuple, kwargs: dict) -> tuple:
+        return (name, fingerprint(args), fingerprint(kwargs))
+
+    @staticmethod
+    def _fresh(entry: tuple) -> bool:
+        expires_at = entry[1]
+        return expires_at is None or expires_at > time.time()
+
+    @staticmethod
+    def _put(store: OrderedDict, key: tuple, entry: tuple, limit: int, byte_limit: int) -> None:
+        # entry is (value, expires_at, nbytes)
+        if entry[2] > byte_limit:
+            store.pop(key, None)
+            return
+        store[key] = entry
+        store.move_to_end(key)
+        total = Memo.nbytes(store)
+        while len(store) > limit or total > byte_limit:
+            _, evicted = store.popitem(last=False)
+            total -= evicted[2]
+
+    @staticmethod
+    def nbytes(store: OrderedDict) -> int:
+        return sum(e[2] for e in store.values())
+
+    def _lookup(self, key: tuple, shared: bool) -> Any:
+        session = self._session()
+        entry = session.get(key)
+        if entry is not None and self._fresh(entry):
+            session.move_to_end(key)
+            self.session_hits += 1
+            return entry[0]
+        if shared:
+            with self._lock:
+                entry = self._shared.get(key)
+                if entry is not None and self._fresh(entry):
+                    self._shared.move_to_end(key)
+                    self.shared_hits += 1
+                    self._put(session, key, entry, self.max_session_entries, self.max_session_bytes)
+                    return entry[0]
+        return _MISSING
+
+    def peek(self, name: str, *args, shared: bool = True, **kwargs) -> Optional[Any]:
+        """Memoized result of an earlier call with these inputs, or None (never computes)"""
+        value = self._lookup(self.key(name, args, kwargs), shared)
+        return None if value is _MISSING else value
+
+    def call(self, name: str, func: Callable, *args, shared: bool = True,
+             ttl: Optional[float] = None, **kwargs) -> Any:
+        """``func(*args, **kwargs)``, computed only when these inputs haven't been seen"""
+        key = self.key(name, args, kwargs)
+        value = self._lookup(key, shared)
+        if value is not _MISSING:
+            return value
+        self.misses += 1
+        value = func(*args, **kwargs)
+        entry = (value, time.time() + ttl if ttl else None, value_nbytes(value))
+        self._put(self._session(), key, entry, self.max_session_entries, self.max_session_bytes)
+        if shared:
+            with self._lock:
+                self._put(self._shared, key, entry, self.max_shared_entries, self.max_shared_bytes)
+        return value
+
+    def memoize(self, name: Optional[str] = None, shared: bool = True, ttl: Optional[float] = None):
+        """Decorator form of ``call``"""
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.call(label, func, *args, shared=shared, ttl=ttl, **kwargs)
+            return wrapper
+        return decorator
+
+    def clear(self, shared: bool = False) -> None:
+        self._session().clear()
+        if shared:
+            with self._lock:
+                self._shared.clear()
+
+
+# Process-wide memo; the session tier lives in each session's state
+MEMO = Memo()
+memoize = MEMO.memoize
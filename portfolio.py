@@ -0,0 +1,296 @@
+"""Mean-variance allocation over a price matrix.
+
+Moments are annualized log-return means and covariances, the same
+conventions as calculate_risk_metrics. The covariance can optionally be
+Ledoit-Wolf shrunk. Moments are memoized on the prices, so every
+portfolio, frontier point and rerun reuses one estimate.
+
+Long-only problems (optionally with a per-asset cap) are solved as
+
+    minimize 0.5 w' S w - tau mu' w   subject to  0 <= w <= cap,  sum(w) = 1
+
+by accelerated projected gradient (FISTA). Each solve is a few hundred
+matrix-vector products, so several hundred assets stay interactive, and
+neighbouring frontier points warm-start from each other. The frontier's
+risk-aversion grid is split into contiguous chunks solved in a thread pool.
+Max-Sharpe is a golden-section search along that same path; risk parity
+uses cyclical coordinate descent. With shorts allowed, everything has a
+closed form.
+
+Headless use:
+
+    python portfolio.py AAPL MSFT GOOG AMZN --period 2y --shrink
+"""
+import argparse
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from correlation import ledoit_wolf
+from memo import memoize
+from risk import TRADING_DAYS, log_returns
+
+PORTFOLIO_WORKERS = int(os.environ.get("PORTFOLIO_WORKERS", "0")) or min(os.cpu_count() or 1, 8)
+
+Moments = namedtuple('Moments', ['tickers', 'mu', 'cov', 'lipschitz', 'observations'])
+Portfolio = namedtuple('Portfolio', ['weights', 'expected_return', 'volatility', 'sharpe'])
+
+
+@memoize("portfolio.moments")
+def estimate_moments(prices: pd.DataFrame, shrink: bool = False,
+                     periods_per_year: int = TRADING_DAYS) -> Moments:
+    """Annualized mean and covariance of log returns over the dates every ticker has"""
+    returns = log_returns(prices.to_numpy(dtype=np.float64))
+    returns = returns[~np.isnan(returns).any(axis=1)]
+    if len(returns) < 2:
+        raise ValueError("Need at least two dates with prices for every ticker")
+    mu = returns.mean(axis=0) * periods_per_year
+    if shrink:
+        cov = ledoit_wolf(returns)[0] * len(returns) / (len(returns) - 1)
+    else:
+        cov = np.cov(returns, rowvar=False, ddof=1).reshape(len(mu), len(mu))
+    cov = cov * periods_per_year
+    # Step size for the projected gradient: the largest eigenvalue of cov
+    lipschitz = float(np.linalg.eigvalsh(cov)[-1])
+    return Moments(list(prices.columns), mu, cov, lipschitz, len(returns))
+
+
+def _describe(moments: Moments, weights: np.ndarray, risk_free_rate: float) -> Portfolio:
+    expected = float(weights @ moments.mu)
+    volatility = float(np.sqrt(max(weights @ moments.cov @ weights, 0.0)))
+    sharpe = (expected - risk_free_rate) / volatility if volatility > 0 else float('nan')
+    return Portfolio(pd.Series(weights, index=moments.tickers, name='weight'),
+                     expected, volatility, sharpe)
+
+
+def project_capped_simplex(v: np.ndarray, cap: float = 1.0, iterations: int = 60) -> np.ndarray:
+    """Euclidean projection onto {0 <= w <= cap, sum(w) = 1} by bisection on the shift"""
+    lo, hi = v.min() - 1.0, v.max()
+    for _ in range(iterations):
+        theta = (lo + hi) / 2
+        if np.clip(v - theta, 0.0, cap).sum() > 1.0:
+            lo = theta
+        else:
+            hi = theta
+    w = np.clip(v - (lo + hi) / 2, 0.0, cap)
+    return w / w.sum()
+
+
+def solve_qp(moments: Moments, tau: float, cap: float = 1.0, start: Optional[np.ndarray] = None,
+             tol: float = 1e-10, max_iter: int = 5000) -> np.ndarray:
+    """Long-only weights minimizing 0.5 w'Sw - tau mu'w (FISTA, warm-started from ``start``)"""
+    n = len(moments.mu)
+    if cap * n < 1:
+        raise ValueError(f"A cap of {cap:.0%} can't fully invest {n} assets")
+    step = 1.0 / moments.lipschitz if moments.lipschitz > 0 else 1.0
+    w = project_capped_simplex(np.full(n, 1.0 / n) if start is None else start, cap)
+    y, t = w, 1.0
+    for _ in range(max_iter):
+        gradient = moments.cov @ y - tau * moments.mu
+        w_next = project_capped_simplex(y - step * gradient, cap)
+        t_next = (1 + math.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + (t - 1) / t_next * (w_next - w)
+        converged = np.abs(w_next - w).max() < tol
+        w, t = w_next, t_next
+        if converged:
+            break
+    return w
+
+
+def _tau_grid(moments: Moments, n_points: int) -> np.ndarray:
+    # tau=0 is the minimum-variance portfolio; past tau_max the return term dominates
+    spread = max(float(np.ptp(moments.mu)), 1e-12)
+    tau_max = 20 * moments.lipschitz / spread
+    return np.concatenate([[0.0], np.geomspace(tau_max * 1e-4, tau_max, n_points - 1)])
+
+
+def _solve_chunk(moments: Moments, taus: Sequence[float], cap: float) -> List[np.ndarray]:
+    weights, previous = [], None
+    for tau in taus:
+        previous = solve_qp(moments, tau, cap, start=previous)
+        weights.append(previous)
+    return weights
+
+
+def efficient_frontier(moments: Moments, n_points: int = 30, cap: float = 1.0,
+                       long_only: bool = True, risk_free_rate: float = 0.0,
+                       workers: int = PORTFOLIO_WORKERS) -> pd.DataFrame:
+    """Frontier portfolios, one row each: return, volatility, sharpe, then one weight column per ticker"""
+    if not long_only:
+        return _closed_form_frontier(moments, n_points, risk_free_rate)
+    taus = _tau_grid(moments, n_points)
+    chunks = [chunk for chunk in np.array_split(taus, max(1, min(workers, n_points))) if len(chunk)]
+    with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="frontier") as pool:
+        solved = pool.map(lambda chunk: _solve_chunk(moments, chunk, cap), chunks)
+        weights = [w for chunk in solved for w in chunk]
+    return _frontier_frame(moments, weights, risk_free_rate)
+
+
+def _frontier_frame(moments: Moments, weights: List[np.ndarray], risk_free_rate: float) -> pd.DataFrame:
+    rows = [_describe(moments, w, risk_free_rate) for w in weights]
+    frame = pd.DataFrame({'return': [p.expected_return for p in rows],
+                          'volatility': [p.volatility for p in rows],
+                          'sharpe': [p.sharpe for p in rows]})
+    frame = pd.concat([frame, pd.DataFrame(np.vstack(weights), columns=moments.tickers)], axis=1)
+    # Neighbouring grid points can land on the same corner portfolio
+    return frame.round({'return': 10, 'volatility': 10}).drop_duplicates(['return', 'volatility']) \
+        .sort_values('volatility').reset_index(drop=True)
+
+
+def min_variance(moments: Moments, cap: float = 1.0, long_only: bool = True,
+                 risk_free_rate: float = 0.0) -> Portfolio:
+    if not long_only:
+        ones = np.linalg.solve(moments.cov, np.ones(len(moments.mu)))
+        return _describe(moments, ones / ones.sum(), risk_free_rate)
+    return _describe(moments, solve_qp(moments, 0.0, cap), risk_free_rate)
+
+
+def max_sharpe(moments: Moments, cap: float = 1.0, long_only: bool = True,
+               risk_free_rate: float = 0.0, tol: float = 1e-6) -> Portfolio:
+    """Tangency portfolio; long-only it is a golden-section search over the frontier path.
+
+    With shorts allowed there is no tangency portfolio once the risk-free
+    rate reaches the minimum-variance return: scaling S^-1 (mu - rf) to sum
+    to one would then flip it onto the lower branch, the worst Sharpe ratio
+    rather than the best, so that raises ValueError.
+    """
+    if not long_only:
+        excess = np.linalg.solve(moments.cov, moments.mu - risk_free_rate)
+        total = excess.sum()
+        if total <= 1e-12 * np.abs(excess).sum():
+            raise ValueError(f"No max-Sharpe portfolio with shorts: a risk-free rate of "
+                             f"{risk_free_rate:.2%} is not below the minimum-variance return")
+        return _describe(moments, excess / total, risk_free_rate)
+
+    taus = _tau_grid(moments, 30)
+    cache = {}
+
+    def solve(log_tau, start=None):
+        if log_tau not in cache:
+            cache[log_tau] = solve_qp(moments, math.exp(log_tau), cap, start=start)
+        return cache[log_tau]
+
+    def sharpe(log_tau, start=None):
+        return _describe(moments, solve(log_tau, start), risk_free_rate).sharpe
+
+    # Bracket the best grid point, then narrow it down in log(tau)
+    grid = np.log(taus[1:])
+    scores = []
+    previous = None
+    for log_tau in grid:
+        scores.append(sharpe(log_tau, previous))
+        previous = cache[log_tau]
+    best = int(np.nanargmax(scores))
+    lo, hi = grid[max(best - 1, 0)], grid[min(best + 1, len(grid) - 1)]
+    ratio = (math.sqrt(5) - 1) / 2
+    a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    while hi - lo > tol:
+        start = cache[grid[best]]
+        if sharpe(a, start) >= sharpe(b, start):
+            hi, b = b, a
+            a = hi - ratio * (hi - lo)
+        else:
+            lo, a = a, b
+            b = lo + ratio * (hi - lo)
+    candidates = [grid[best], (lo + hi) / 2]
+    choice = max(candidates, key=lambda log_tau: sharpe(log_tau, cache[grid[best]]))
+    return _describe(moments, cache[choice], risk_free_rate)
+
+
+def risk_parity(moments: Moments, budgets: Optional[np.ndarray] = None, risk_free_rate: float = 0.0,
+                tol: float = 1e-10, max_sweeps: int = 1000) -> Portfolio:
+    """Equal (or budgeted) risk contributions by cyclical coordinate descent.
+
+    Minimizes 0.5 y'Sy - sum(b_i log y_i); each coordinate step is the positive
+    root of a quadratic, and w = y / sum(y).
+    """
+    cov = moments.cov
+    n = len(moments.mu)
+    b = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=np.float64) / np.sum(budgets)
+    diag = np.diag(cov)
+    y = 1.0 / np.sqrt(diag)
+    y *= math.sqrt(1.0 / (y @ cov @ y))
+    cov_y = cov @ y
+    for _ in range(max_sweeps):
+        largest = 0.0
+        for i in range(n):
+            others = cov_y[i] - diag[i] * y[i]
+            new = (-others + math.sqrt(others * others + 4 * diag[i] * b[i])) / (2 * diag[i])
+            delta = new - y[i]
+            if delta:
+                cov_y += delta * cov[:, i]
+                y[i] = new
+                largest = max(largest, abs(delta) / new)
+        if largest < tol:
+            break
+    return _describe(moments, y / y.sum(), risk_free_rate)
+
+
+def risk_contributions(moments: Moments, weights: pd.Series) -> pd.Series:
+    """Share of portfolio variance from each asset"""
+    w = weights.to_numpy(dtype=np.float64)
+    contributions = w * (moments.cov @ w)
+    return pd.Series(contributions / contributions.sum(), index=moments.tickers, name='risk')
+
+
+def _closed_form_frontier(moments: Moments, n_points: int, risk_free_rate: float) -> pd.DataFrame:
+    # Two-fund theorem: every frontier portfolio mixes S^-1 1 and S^-1 mu
+    inv_ones = np.linalg.solve(moments.cov, np.ones(len(moments.mu)))
+    inv_mu = np.linalg.solve(moments.cov, moments.mu)
+    a, b, c = inv_ones.sum(), inv_mu.sum(), moments.mu @ inv_mu
+    det = a * c - b * b
+    r_min = b / a
+    r_max = r_min + 3 * max(abs(moments.mu).max() - r_min, 1e-12)
+    weights = []
+    for target in np.linspace(r_min, r_max, n_points):
+        lam, gamma = (c - b * target) / det, (a * target - b) / det
+        weights.append(lam * inv_ones + gamma * inv_mu)
+    return _frontier_frame(moments, weights, risk_free_rate)
+
+
+def fetch_prices(tickers: Sequence[str], period: str = "2y") -> pd.DataFrame:
+    """Close-price matrix from Yahoo Finance, for headless runs"""
+    import yfinance as yf
+
+    from risk import build_price_matrix
+
+    frames = {ticker: yf.Ticker(ticker).history(period=period) for ticker in tickers}
+    return build_price_matrix(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mean-variance allocation for a set of tickers")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--period", default="2y")
+    parser.add_argument("--shrink", action="store_true", help="Ledoit-Wolf shrunk covariance")
+    parser.add_argument("--shorts", action="store_true", help="allow short positions (closed form)")
+    parser.add_argument("--cap", type=float, default=1.0, help="maximum weight per asset")
+    parser.add_argument("--risk-free", type=float, default=0.0, help="annual risk-free rate")
+    parser.add_argument("--points", type=int, default=30, help="frontier points")
+    parser.add_argument("--frontier", help="write the frontier to this CSV file")
+    args = parser.parse_args()
+
+    prices = fetch_prices([t.upper() for t in args.tickers], args.period)
+    moments = estimate_moments(prices, args.shrink)
+    long_only = not args.shorts
+    portfolios = {
+        'Max Sharpe': max_sharpe(moments, args.cap, long_only, args.risk_free),
+        'Min Variance': min_variance(moments, args.cap, long_only, args.risk_free),
+        'Risk Parity': risk_parity(moments, risk_free_rate=args.risk_free),
+    }
+    table = pd.DataFrame({name: p.weights for name, p in portfolios.items()})
+    summary = pd.DataFrame({name: [p.expected_return, p.volatility, p.sharpe]
+                            for name, p in portfolios.items()}, index=['return', 'volatility', 'sharpe'])
+    print(pd.concat([table, summary]).round(4).to_string())
+    if args.frontier:
+        efficient_frontier(moments, args.points, args.cap, long_only, args.risk_free).to_csv(args.frontier, index=False)
+        print(f"Frontier -> {args.frontier}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Speculative background prefetch.
+
+After a page loads, the app queues the fetches a user is likely to need
+next: the current ticker's 5y history, its peers' prices and
+fundamentals, and the sector ETFs. One daemon thread works through them
+so the next navigation is served from the caches they fill. To stay out of
+the foreground's way, the thread:
+
+- runs at a lower OS scheduling priority where the platform allows it;
+- waits while a script run is in progress (``foreground()``) and for a
+  short idle gap after it;
+- draws from a token bucket (PREFETCH_RATE requests per second), and
+  backs off entirely when a job reports the provider's rate limit;
+- holds at most PREFETCH_QUEUE jobs, keeping the most likely ones, and
+  skips keys it already fetched within PREFETCH_TTL seconds.
+
+Set PREFETCH=0 to turn it off.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+from instrumentation import count
+
+PREFETCH_ENABLED = os.environ.get("PREFETCH", "1") != "0"
+PREFETCH_RATE = float(os.environ.get("PREFETCH_RATE", "1"))  # requests per second
+PREFETCH_QUEUE = int(os.environ.get("PREFETCH_QUEUE", "32"))
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", "900"))
+PREFETCH_IDLE_SECONDS = float(os.environ.get("PREFETCH_IDLE_SECONDS", "0.5"))
+RATE_LIMIT_BACKOFF = 60.0
+
+
+class RateLimited(Exception):
+    """Raised by a job when the provider says to slow down"""
+
+
+class TokenBucket:
+    """``rate`` tokens per second, up to ``burst`` saved up"""
+
+    def __init__(self, rate: float, burst: float = 2.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available; takes it when that is now"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class Prefetcher:
+    """Bounded priority queue of idempotent warm-up jobs, run by one background thread"""
+
+    def __init__(self, rate: float = PREFETCH_RATE, max_queue: int = PREFETCH_QUEUE,
+                 ttl: float = PREFETCH_TTL, idle_seconds: float = PREFETCH_IDLE_SECONDS,
+                 enabled: bool = PREFETCH_ENABLED):
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.idle_seconds = idle_seconds
+        self.bucket = TokenBucket(rate)
+        self._heap = []  # (priority, -sequence, key, job)
+        self._queued: Dict[str, float] = {}
+        self._recent: Dict[str, float] = {}  # key -> when it last finished
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._active = 0  # script runs in progress
+        self._last_active = 0.0
+        self._paused_until = 0.0
+        self._thread = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def submit(self, key: str, job: Callable[[], None], priority: int = 0) -> bool:
+        """Queue ``job`` unless ``key`` is queued or fresh; lower priority runs first"""
+        if not self.enabled:
+            return False
+        with self._cond:
+            finished = self._recent.get(key)
+            if key in self._queued or (finished is not None and time.time() - finished < self.ttl):
+                count("prefetch.skipped")
+                return False
+            # Within a priority the newest guess runs first and the oldest is evicted first
+            entry = (priority, -next(self._sequence), key, job)
+            if len(self._heap) >= self.max_queue:
+                worst = max(self._heap)
+                if entry >= worst:
+                    count("prefetch.dropped")
+                    return False
+                # Evict the least likely job to make room
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self._queued.pop(worst[2], None)
+                count("prefetch.dropped")
+            heapq.heappush(self._heap, entry)
+            self._queued[key] = time.time()
+            self._ensure_thread()
+            self._cond.notify()
+        return True
+
+    def clear(self) -> None:
+        """Forget queued jobs (e.g. when the user moved on to another ticker)"""
+        with self._cond:
+            self._heap.clear()
+            self._queued.clear()
+
+    @contextmanager
+    def foreground(self):
+        """Mark a script run; prefetching waits until none are in progress"""
+        with self._cond:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._last_active = time.monotonic()
+                self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _wait_until_idle(self) -> None:
+        # Caller holds self._cond
+        while True:
+            now = time.monotonic()
+            if self._active:
+                self._cond.wait()
+                continue
+            delay = max(self._last_active + self.idle_seconds, self._paused_until) - now
+            if delay <= 0:
+                return
+            self._cond.wait(delay)
+
+    def _run(self) -> None:
+        _lower_thread_priority()
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                self._wait_until_idle()
+                if not self._heap:
+                    continue
+                _, _, key, job = heapq.heappop(self._heap)
+                self._queued.pop(key, None)
+            delay = self.bucket.wait_time()
+            while delay > 0:
+                time.sleep(delay)
+                delay = self.bucket.wait_time()
+            start = time.perf_counter()
+            try:
+                job()
+                count("prefetch.done")
+            except RateLimited:
+                count("prefetch.rate_limited")
+                self.pause(RATE_LIMIT_BACKOFF)
+            except Exception:
+                count("prefetch.failed")
+            count("prefetch.seconds", time.perf_counter() - start)
+            with self._cond:
+                self._recent[key] = time.time()
+                if len(self._recent) > 4 * self.max_queue:
+                    cutoff = time.time() - self.ttl
+                    self._recent = {k: t for k, t in self._recent.items() if t >= cutoff}
+
+
+def _lower_thread_priority(niceness: int = 10) -> None:
+    """Nice only the calling thread (Linux schedules threads as tasks)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+# Process-wide prefetcher; each serve.py worker warms the shared tier for all of them
+PREFETCH = Prefetcher()
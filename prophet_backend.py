@@ -0,0 +1,143 @@
+"""Prophet forecasting with cached fits.
+
+Fitted models are kept in process memory and serialized to MODEL_CACHE_DIR
+keyed by ticker and a fingerprint of the training data, so a repeat click,
+another session or a restarted worker reuses the fit instead of paying for
+Stan again. The in-memory tier keeps the MAX_MEMORY_MODELS most recently
+used fits. Cross-validation runs its cutoffs in parallel.
+"""
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "model_cache")
+MAX_MEMORY_MODELS = int(os.environ.get("PROPHET_MEMORY_MODELS", "16"))
+
+_models: "OrderedDict[str, object]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def data_fingerprint(close: pd.Series) -> str:
+    """Hash of the dates and values a model is trained on"""
+    digest = hashlib.sha1()
+    digest.update(np.asarray(pd.DatetimeIndex(close.index).asi8).tobytes())
+    digest.update(close.to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def prepare_frame(data: pd.DataFrame) -> pd.DataFrame:
+    """Prophet wants a tz-naive ``ds`` column and a ``y`` column"""
+    dates = pd.DatetimeIndex(data.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return pd.DataFrame({'ds': dates, 'y': data['Close'].to_numpy(dtype=np.float64)})
+
+
+def _cache_path(ticker: str, fingerprint: str) -> str:
+    return os.path.join(MODEL_CACHE_DIR, f"prophet_{ticker.upper()}_{fingerprint}.json")
+
+
+def _save(model, ticker: str, fingerprint: str) -> None:
+    from prophet.serialize import model_to_json
+
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    path = _cache_path(ticker, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(model_to_json(model))
+    os.replace(tmp_path, path)
+    # Older fits of the same ticker are superseded
+    for old in glob.glob(os.path.join(MODEL_CACHE_DIR, f"prophet_{ticker.upper()}_*.json")):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _load(ticker: str, fingerprint: str):
+    path = _cache_path(ticker, fingerprint)
+    if not os.path.exists(path):
+        return None
+    from prophet.serialize import model_from_json
+
+    with open(path) as f:
+        return model_from_json(f.read())
+
+
+def fit_prophet(data: pd.DataFrame, ticker: str, **params) -> Tuple[object, str]:
+    """Fitted Prophet model for this data plus where it came from ('memory', 'disk' or 'fit')"""
+    fingerprint = data_fingerprint(data['Close'])
+    if params:
+        fingerprint += hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()[:8]
+    key = f"{ticker.upper()}_{fingerprint}"
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+    if model is not None:
+        return model, 'memory'
+
+    model = _load(ticker, fingerprint)
+    source = 'disk'
+    if model is None:
+        from prophet import Prophet
+
+        model = Prophet(daily_seasonality=False, **params)
+        model.fit(prepare_frame(data))
+        source = 'fit'
+        try:
+            _save(model, ticker, fingerprint)
+        except OSError:
+            pass  # Caching is best effort
+    with _lock:
+        _models[key] = model
+        _models.move_to_end(key)
+        while len(_models) > MAX_MEMORY_MODELS:
+            _models.popitem(last=False)
+    return model, source
+
+
+def forecast(model, periods: int = 30) -> pd.DataFrame:
+    """Business-day forecast with yhat, yhat_lower and yhat_upper, indexed by date"""
+    future = model.make_future_dataframe(periods=periods, freq='B', include_history=False)
+    result = model.predict(future)
+    return result.set_index('ds')[['yhat', 'yhat_lower', 'yhat_upper']]
+
+
+def cv_initial_days(model, horizon_days: int = 30) -> Optional[int]:
+    """Training window before the first cutoff, shortened to fit the history; None if it can't"""
+    span_days = (model.history['ds'].max() - model.history['ds'].min()).days
+    # At least one horizon of training data, and one horizon left to score
+    initial_days = min(max(horizon_days * 3, span_days // 2), span_days - horizon_days)
+    return initial_days if initial_days >= horizon_days else None
+
+
+def cross_validate(model, horizon_days: int = 30, initial_days: Optional[int] = None,
+                   period_days: Optional[int] = None, parallel: str = 'threads') -> pd.DataFrame:
+    """Rolling-origin cross-validation with the cutoffs fitted in parallel.
+
+    Threads are enough here: each cutoff's fit runs in its own CmdStan
+    subprocess, so no Python process pool (and no re-import of Stan) is needed.
+    """
+    from prophet.diagnostics import cross_validation, performance_metrics
+
+    initial_days = initial_days or cv_initial_days(model, horizon_days)
+    if initial_days is None:
+        raise ValueError(f"Cross-validation needs at least {2 * horizon_days} days of history")
+    period_days = period_days or max(horizon_days // 2, 1)
+    cv = cross_validation(model, initial=f"{initial_days} days", period=f"{period_days} days",
+                          horizon=f"{horizon_days} days", parallel=parallel, disable_tqdm=True)
+    return performance_metrics(cv, rolling_window=1)
+
+
+def clear_memory_cache() -> None:
+    with _lock:
+        _models.clear()
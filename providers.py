@@ -0,0 +1,294 @@
+"""Hedged, latency-routed access to interchangeable data providers.
+
+A ``ProviderPool`` holds several providers that can answer the same
+request, e.g. daily prices from Yahoo or FMP. For each call the pool:
+
+- ranks the healthy providers by expected time to a good answer, which is
+  median latency / (1 - error rate); providers with no samples yet go
+  first so that every source gets measured;
+- sends the request to the best one, then sends a hedged copy to the
+  next one if no answer has come back by that provider's
+  HEDGE_PERCENTILE latency;
+- moves straight on to the next provider when one fails, and returns the
+  first good answer.
+
+A provider that answers but has nothing for the request (``NoData``, or
+an answer its ``accept`` check rejects) also hands over to the next one,
+but that is not a failure: it leaves the breaker and error rate alone.
+Each provider has a circuit breaker. It opens after
+BREAKER_FAILURES consecutive failures and routes around the provider for
+BREAKER_COOLDOWN seconds. After the cooldown, one trial request decides
+whether it closes again. Latencies are also recorded as
+``provider.<pool>.<name>`` spans for the debug panel.
+
+With DATA_MODE=replay (see replay.py) pools are pinned instead: providers
+are tried in declared order, one at a time, so a replayed run takes the
+same route every time whatever the synthetic latencies are.
+
+``StubProvider`` serves canned answers with configurable latency and
+failure rate, so routing can be exercised without network access.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from instrumentation import count, record_span
+from replay import DATA_MODE
+
+PROVIDER_THREADS = int(os.environ.get("PROVIDER_THREADS", "8"))
+PROVIDER_TIMEOUT = float(os.environ.get("PROVIDER_TIMEOUT", "10"))
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DELAY = 1.0  # seconds, until a provider has MIN_SAMPLES latencies
+MIN_SAMPLES = 5
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "30"))
+LATENCY_SAMPLES = 100
+ERROR_DECAY = 0.1  # weight of the newest outcome in the error-rate average
+
+# Shared by every pool; a hedged loser keeps its thread until its own timeout
+_executor = ThreadPoolExecutor(max_workers=PROVIDER_THREADS, thread_name_prefix="provider")
+
+
+class ProviderError(Exception):
+    """No provider in a pool produced an answer"""
+
+
+class NoData(ProviderError):
+    """The provider answered, but has no data for this request"""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cooldown"""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False  # a half-open trial request is in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def available(self) -> bool:
+        """Could a request go out now (without claiming the half-open trial)?"""
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial)
+
+    def acquire(self) -> bool:
+        """Claim permission to send a request"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> bool:
+        """Update on an outcome; True when this outcome opened the breaker"""
+        with self._lock:
+            self.trial = False
+            if ok:
+                self.consecutive = 0
+                self.opened_at = None
+                return False
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                # A failed trial re-opens for another cooldown
+                newly = self.opened_at is None
+                self.opened_at = time.monotonic()
+                return newly
+            return False
+
+
+class Provider:
+    """A named source; ``fetch`` returns an answer or raises"""
+
+    def __init__(self, name: str, accept: Callable[[Any], bool] = lambda result: result is not None):
+        self.name = name
+        self.accept = accept
+        self.breaker = CircuitBreaker()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.error_rate = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, *args, **kwargs) -> Any:
+        raise NotImplementedError
+
+    def latency(self, pct: float = 50) -> Optional[float]:
+        """Latency percentile of recent successes (None until MIN_SAMPLES)"""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    def expected_time(self) -> float:
+        """Median latency / success rate; 0 for untried providers so they get measured"""
+        median = self.latency(50)
+        if median is None:
+            if not self.calls:
+                return 0.0
+            median = HEDGE_DEFAULT_DELAY  # Tried, but too few successes to measure
+        return median / max(1.0 - self.error_rate, 0.05)
+
+    def _record(self, pool: str, seconds: float, ok: bool, no_data: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.latencies.append(seconds)
+            if not no_data:
+                self.error_rate += ERROR_DECAY * ((0.0 if ok else 1.0) - self.error_rate)
+        record_span(f"provider.{pool}.{self.name}", seconds, error=not (ok or no_data))
+        if no_data:
+            count(f"provider.{pool}.{self.name}.no_data")
+        # An empty answer still shows the provider is up (and ends a half-open trial)
+        if self.breaker.record(ok or no_data):
+            count(f"provider.{pool}.{self.name}.breaker_opened")
+
+    def call(self, pool: str, *args, **kwargs) -> Any:
+        """``fetch`` with stats and breaker bookkeeping; rejected answers raise NoData"""
+        start = time.perf_counter()
+        ok = no_data = False
+        try:
+            result = self.fetch(*args, **kwargs)
+            if not self.accept(result):
+                raise NoData(f"{self.name} returned no data")
+            ok = True
+            return result
+        except NoData:
+            no_data = True
+            raise
+        finally:
+            self._record(pool, time.perf_counter() - start, ok, no_data)
+
+    def describe(self) -> Dict[str, Any]:
+        p50, p90 = self.latency(50), self.latency(90)
+        return {
+            'state': self.breaker.state,
+            'calls': self.calls,
+            'error_rate': round(self.error_rate, 3),
+            'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+            'p90_ms': None if p90 is None else round(p90 * 1000, 1),
+        }
+
+
+class FunctionProvider(Provider):
+    """Provider backed by a plain function"""
+
+    def __init__(self, name: str, func: Callable[..., Any], **kwargs):
+        super().__init__(name, **kwargs)
+        self.func = func
+
+    def fetch(self, *args, **kwargs) -> Any:
+        return self.func(*args, **kwargs)
+
+
+class StubProvider(Provider):
+    """Local stand-in with a fixed answer, latency (seconds, or a sampler) and failure rate"""
+
+    def __init__(self, name: str, result: Any = True, latency=0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.result = result
+        self.delay = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def fetch(self, *args, **kwargs) -> Any:
+        self.requests += 1
+        time.sleep(self.delay(self.rng) if callable(self.delay) else self.delay)
+        if self.rng.random() < self.failure_rate:
+            raise ProviderError(f"{self.name} failed")
+        return self.result(*args, **kwargs) if callable(self.result) else self.result
+
+
+class ProviderPool:
+    """Interchangeable providers for one kind of request"""
+
+    def __init__(self, name: str, providers: Sequence[Provider], timeout: float = PROVIDER_TIMEOUT,
+                 hedge_percentile: float = HEDGE_PERCENTILE, max_hedges: int = 1,
+                 pinned: bool = DATA_MODE == "replay"):
+        self.name = name
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = 0 if pinned else max_hedges
+        self.pinned = pinned
+
+    def ranked(self) -> List[Provider]:
+        """Available providers, fastest expected first (declared order breaks ties, or decides when pinned)"""
+        available = [p for p in self.providers if p.breaker.available()]
+        if self.pinned:
+            return available
+        return sorted(available, key=lambda p: p.expected_time())
+
+    def hedge_delay(self, provider: Provider) -> float:
+        delay = provider.latency(self.hedge_percentile)
+        return HEDGE_DEFAULT_DELAY if delay is None else delay
+
+    def call(self, *args, **kwargs) -> Any:
+        """First good answer from the providers, hedging slow ones; raises ProviderError"""
+        candidates = self.ranked()
+        if not candidates:
+            raise ProviderError(f"{self.name}: every provider's circuit breaker is open")
+        errors: List[str] = []
+        answered = 0  # providers that replied NoData
+        pending: Dict[Any, Provider] = {}
+        hedges = 0
+        deadline = time.monotonic() + self.timeout
+        hedge_at = deadline
+
+        def launch() -> bool:
+            nonlocal hedge_at
+            while candidates:
+                provider = candidates.pop(0)
+                if provider.breaker.acquire():
+                    pending[_executor.submit(provider.call, self.name, *args, **kwargs)] = provider
+                    # The next hedge waits on the provider just sent, not the first one
+                    hedge_at = time.monotonic() + self.hedge_delay(provider)
+                    return True
+            return False
+
+        launch()
+        while pending:
+            can_hedge = candidates and hedges < self.max_hedges
+            until = min(hedge_at, deadline) if can_hedge else deadline
+            done, _ = wait(list(pending), timeout=max(until - time.monotonic(), 0),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    answered += isinstance(e, NoData)
+                    errors.append(f"{provider.name}: {e}")
+            if time.monotonic() >= deadline:
+                errors.append(f"timed out after {self.timeout:g}s")
+                break
+            if done and not pending:
+                launch()  # Everything in flight failed; fall through to the next source
+            elif not done and can_hedge and time.monotonic() >= hedge_at:
+                if launch():
+                    hedges += 1
+                    count(f"provider.{self.name}.hedges")
+        message = f"{self.name}: " + ("; ".join(errors) or "no provider available")
+        if errors and answered == len(errors):
+            raise NoData(message)  # Every source answered; there just is no data
+        count(f"provider.{self.name}.failures")
+        raise ProviderError(message)
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {provider.name: provider.describe() for provider in self.providers}
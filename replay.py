@@ -0,0 +1,222 @@
+"""Record/replay of external data calls for offline, deterministic runs.
+
+Functions that reach the network are wrapped with ``@recorded(source)``.
+DATA_MODE chooses what the wrapper does:
+
+- ``live`` (default): call through; the wrapper costs one comparison;
+- ``record``: call through and store the outcome, meaning the return value
+  or the exception raised, in the DATA_ARCHIVE file, together with how
+  long the call took;
+- ``replay``: never touch the network. Serve the stored outcome after a
+  synthetic delay, and raise ``ReplayMiss`` for calls that were never
+  recorded.
+
+Replays are meant to be repeatable, so in replay mode a keyed source is
+used only when the archive holds calls for it (``configured``), and
+provider pools keep their declared order and don't hedge (providers.py).
+
+REPLAY_LATENCY sets the delay: ``recorded`` (the default) replays each
+call's recorded duration scaled by REPLAY_LATENCY_SCALE, ``0`` serves
+instantly, ``50`` waits a fixed 50 ms, and ``50:0.5`` draws from a
+lognormal with a 50 ms median and sigma 0.5, seeded by REPLAY_SEED.
+
+The archive is one SQLite file of zlib-compressed pickles keyed by source
+and call arguments, safe to share between workers (see serve.py). To fill
+it from the live services:
+
+    DATA_MODE=record python replay.py record AAPL MSFT --periods 1y 5y
+    python replay.py stats
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional, Tuple
+
+DATA_MODE = os.environ.get("DATA_MODE", "live").lower()
+DATA_ARCHIVE = os.environ.get("DATA_ARCHIVE", "data_archive.db")
+REPLAY_LATENCY = os.environ.get("REPLAY_LATENCY", "recorded")
+REPLAY_LATENCY_SCALE = float(os.environ.get("REPLAY_LATENCY_SCALE", "1"))
+REPLAY_SEED = int(os.environ.get("REPLAY_SEED", "0"))
+
+if DATA_MODE not in ("live", "record", "replay"):
+    raise ValueError(f"DATA_MODE must be live, record or replay, not {DATA_MODE!r}")
+
+
+class ReplayMiss(KeyError):
+    """A replayed call that was never recorded"""
+
+
+class Archive:
+    """Recorded call outcomes in one SQLite file"""
+
+    def __init__(self, path: str = DATA_ARCHIVE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS calls (
+            key TEXT PRIMARY KEY, source TEXT, args TEXT, seconds REAL,
+            recorded_at REAL, outcome BLOB)""")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[bool, Any, float]]:
+        """(ok, value or exception, seconds), or None when not recorded"""
+        with self._lock:
+            row = self._conn.execute("SELECT outcome, seconds FROM calls WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        ok, value = pickle.loads(zlib.decompress(row[0]))
+        return ok, value, row[1]
+
+    def put(self, key: str, source: str, args: str, ok: bool, value: Any, seconds: float) -> None:
+        try:
+            blob = pickle.dumps((ok, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Some client exceptions don't pickle; keep their type name and message
+            blob = pickle.dumps((False, RuntimeError(f"{type(value).__name__}: {value}")))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, source, args, seconds, time.time(),
+                                sqlite3.Binary(zlib.compress(blob, 6))))
+            self._conn.commit()
+
+    def has_source(self, source: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM calls WHERE source = ? LIMIT 1", (source,)).fetchone()
+        return row is not None
+
+    def stats(self):
+        """(source, calls, total bytes, mean recorded seconds) per source"""
+        with self._lock:
+            return self._conn.execute("""SELECT source, COUNT(*), SUM(LENGTH(outcome)), AVG(seconds)
+                FROM calls GROUP BY source ORDER BY source""").fetchall()
+
+
+class Latency:
+    """Synthetic delay per replayed call, from a REPLAY_LATENCY spec"""
+
+    def __init__(self, spec: str = REPLAY_LATENCY, scale: float = REPLAY_LATENCY_SCALE,
+                 seed: int = REPLAY_SEED):
+        self.spec = spec
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        median, _, sigma = spec.partition(":")
+        self.median = None if spec == "recorded" else float(median) / 1000
+        self.sigma = float(sigma or 0)
+
+    def seconds(self, recorded: float) -> float:
+        if self.median is None:
+            return recorded * self.scale
+        if not self.sigma:
+            return self.median
+        with self._lock:
+            return self.median * self.rng.lognormvariate(0.0, self.sigma)
+
+
+_archive: Optional[Archive] = None
+_archive_lock = threading.Lock()
+LATENCY = Latency()
+
+
+def archive() -> Archive:
+    """The DATA_ARCHIVE file, opened on first use (live mode never creates it)"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = Archive()
+        return _archive
+
+
+def call_key(source: str, bound: inspect.BoundArguments) -> Tuple[str, str]:
+    args = repr(sorted(bound.arguments.items()))
+    return f"{source}:{hashlib.sha1(args.encode()).hexdigest()[:20]}", args
+
+
+def recorded(source: str) -> Callable:
+    """Route a network-facing function through the archive according to DATA_MODE"""
+    def decorator(func):
+        if DATA_MODE == "live":
+            return func
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()  # f(x) and f(x, period="1y") share one recording
+            key, described = call_key(source, bound)
+            if DATA_MODE == "replay":
+                entry = archive().get(key)
+                if entry is None:
+                    raise ReplayMiss(f"{source}{described} was not recorded in {DATA_ARCHIVE}")
+                ok, value, seconds = entry
+                time.sleep(LATENCY.seconds(seconds))
+                if ok:
+                    return value
+                raise value
+            start = time.perf_counter()
+            try:
+                value = func(*args, **kwargs)
+            except Exception as e:
+                archive().put(key, source, described, False, e, time.perf_counter() - start)
+                raise
+            archive().put(key, source, described, True, value, time.perf_counter() - start)
+            return value
+        return wrapper
+    return decorator
+
+
+def configured(api_key: Optional[str], source: str) -> bool:
+    """Whether a keyed source can be used: it has a key, or (replaying) the archive has its calls"""
+    if DATA_MODE == "replay":
+        return archive().has_source(source)
+    return bool(api_key)
+
+
+def record_tickers(tickers, periods) -> None:
+    """Drive the app's data functions once per ticker so every call gets recorded"""
+    # Start from empty local caches (unless paths are given), or warm entries would hide calls
+    cache_dir = tempfile.mkdtemp(prefix="replay-record-")
+    for var, name in [("FUNDAMENTALS_DB", "fundamentals.db"), ("SHARED_CACHE_DB", "shared.db"),
+                      ("SENTIMENT_DB", "sentiment.db"), ("RESIDUALS_DB", "residuals.db"),
+                      ("MODEL_CACHE_DIR", "models")]:
+        os.environ.setdefault(var, os.path.join(cache_dir, name))
+    import stock
+
+    for ticker in tickers:
+        for period in periods:
+            stock.fetch_price_history(ticker, period)
+        stock.get_yahoo_ratios(ticker)
+        sector, industry, _ = stock.get_sector_peers(ticker)
+        stock.get_sector_averages(sector, industry)
+        print(f"recorded {ticker} ({sector})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill or inspect the DATA_ARCHIVE replay file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="fetch tickers from the live services into the archive")
+    record.add_argument("tickers", nargs="+")
+    record.add_argument("--periods", nargs="+", default=["1y"])
+    commands.add_parser("stats", help="calls and bytes stored per source")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        if DATA_MODE != "record":
+            parser.error("run with DATA_MODE=record")
+        record_tickers(args.tickers, args.periods)
+    for source, calls, size, seconds in archive().stats():
+        print(f"{source:28s} {calls:6d} calls {size / 1024:9.1f} KB  {seconds * 1000:8.1f} ms avg")
+
+
+if __name__ == "__main__":
+    main()
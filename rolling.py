@@ -0,0 +1,363 @@
+"""Rolling statistics kernels.
+
+Each kernel keeps O(1) state and is advanced one bar at a time with
+``update``; ``seed`` replays history to initialize it. The batch functions
+below compute the same quantities over whole 1-D or 2-D (dates x columns)
+arrays and match the pandas expressions noted in their docstrings.
+"""
+import math
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from risk import TRADING_DAYS, drawdown_matrix
+
+NAN = float('nan')
+TAIL_CHECK = 5  # trailing closes compared before extending instead of reseeding
+
+
+class RollingMean:
+    """Simple moving average over the last ``window`` values"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.n_nan = 0
+
+    def update(self, x: float) -> float:
+        self.values.append(x)
+        if math.isnan(x):
+            self.n_nan += 1
+        else:
+            self.total += x
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.n_nan -= 1
+            else:
+                self.total -= old
+        if len(self.values) < self.window or self.n_nan:
+            return NAN
+        return self.total / self.window
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+class RollingStd:
+    """Windowed standard deviation using Welford add/remove updates"""
+
+    def __init__(self, window: int, ddof: int = 1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x: float) -> None:
+        self.count -= 1
+        if self.count == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (x - self.mean)
+
+    def update(self, x: float) -> float:
+        self.values.append(x)
+        if not math.isnan(x):
+            self._add(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if not math.isnan(old):
+                self._remove(old)
+        if self.count < self.window or self.count <= self.ddof:
+            return NAN
+        return math.sqrt(max(self.m2, 0.0) / (self.count - self.ddof))
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+class RollingVolatility:
+    """Annualized rolling volatility of log returns, fed with prices"""
+
+    def __init__(self, window: int = 30, periods_per_year: int = TRADING_DAYS):
+        self.std = RollingStd(window)
+        self.scale = math.sqrt(periods_per_year)
+        self.last_price = NAN
+
+    def update(self, price: float) -> float:
+        if math.isnan(self.last_price) or math.isnan(price) or self.last_price <= 0:
+            ret = NAN
+        else:
+            ret = math.log(price / self.last_price)
+        self.last_price = price
+        return self.std.update(ret) * self.scale
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+class RunningDrawdown:
+    """Drawdown from the running peak"""
+
+    def __init__(self):
+        self.peak = NAN
+
+    def update(self, price: float) -> float:
+        if math.isnan(price):
+            return NAN
+        if math.isnan(self.peak) or price > self.peak:
+            self.peak = price
+        return price / self.peak - 1
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+class WilderSmoother:
+    """Wilder smoothing (EWM with alpha = 1/period); leading NaNs are skipped"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.value = NAN
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        if not math.isnan(x):
+            self.count += 1
+            if math.isnan(self.value):
+                self.value = x
+            else:
+                self.value += self.alpha * (x - self.value)
+        return self.value if self.count >= self.period else NAN
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+class RSI:
+    """Relative Strength Index with Wilder-smoothed gains and losses"""
+
+    def __init__(self, period: int = 14):
+        self.gains = WilderSmoother(period)
+        self.losses = WilderSmoother(period)
+        self.last_price = NAN
+
+    def update(self, price: float) -> float:
+        delta = price - self.last_price
+        self.last_price = price
+        avg_gain = self.gains.update(max(delta, 0.0) if not math.isnan(delta) else NAN)
+        avg_loss = self.losses.update(max(-delta, 0.0) if not math.isnan(delta) else NAN)
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return NAN
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else NAN
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def seed(self, history) -> None:
+        for x in history:
+            self.update(float(x))
+
+
+# ---------------------------------------------------------------------------
+# Batch versions (vectorized over columns)
+# ---------------------------------------------------------------------------
+
+def _pad_front(values: np.ndarray, n: int) -> np.ndarray:
+    pad = np.full((n,) + values.shape[1:], np.nan)
+    return np.concatenate([pad, values], axis=0)
+
+
+def _window_sum(x: np.ndarray, window: int) -> np.ndarray:
+    # Sum of shifted slices: O(T * window) work but no (T x window) temporaries
+    n_out = x.shape[0] - window + 1
+    total = x[:n_out].copy()
+    for k in range(1, window):
+        total += x[k:k + n_out]
+    return total
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Same as ``pd.DataFrame(x).rolling(window).mean()``"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.shape[0] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_front(_window_sum(x, window) / window, window - 1)
+
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    """Same as ``pd.DataFrame(x).rolling(window).std(ddof=ddof)`` (two-pass, stable)"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.shape[0] < window or window <= ddof:
+        return np.full(x.shape, np.nan)
+    n_out = x.shape[0] - window + 1
+    mean = _window_sum(x, window) / window
+    sq = np.zeros_like(mean)
+    for k in range(window):
+        sq += (x[k:k + n_out] - mean) ** 2
+    return _pad_front(np.sqrt(sq / (window - ddof)), window - 1)
+
+
+def rolling_volatility(prices: np.ndarray, window: int = 30,
+                       periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """Same as ``np.log(close).diff().rolling(window).std() * sqrt(periods_per_year)``"""
+    prices = np.asarray(prices, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(prices), axis=0)
+    returns = _pad_front(returns, 1)
+    return rolling_std(returns, window) * np.sqrt(periods_per_year)
+
+
+def running_drawdown(prices: np.ndarray) -> np.ndarray:
+    """Same as ``close / close.cummax() - 1``"""
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        return drawdown_matrix(prices[:, None])[:, 0]
+    return drawdown_matrix(prices)
+
+
+def ewm_mean(x: np.ndarray, alpha: float, min_periods: int = 0) -> np.ndarray:
+    """Same as ``pd.DataFrame(x).ewm(alpha=alpha, adjust=False, min_periods=min_periods).mean()``
+    for series whose only NaNs are leading ones.
+
+    Loops over rows once with vector updates across columns.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    squeeze = x.ndim == 1
+    if squeeze:
+        x = x[:, None]
+    out = np.empty_like(x)
+    state = np.full(x.shape[1], np.nan)
+    counts = np.zeros(x.shape[1], dtype=np.int64)
+    for i in range(x.shape[0]):
+        row = x[i]
+        present = ~np.isnan(row)
+        counts += present
+        state = np.where(np.isnan(state), row, np.where(present, state + alpha * (row - state), state))
+        out[i] = np.where(counts >= max(min_periods, 1), state, np.nan)
+    return out[:, 0] if squeeze else out
+
+
+def wilder_smooth(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder smoothing; same as ``ewm(alpha=1/period, adjust=False, min_periods=period)``"""
+    return ewm_mean(x, 1.0 / period, min_periods=period)
+
+
+def rsi(prices: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder RSI, matching the ``RSI`` kernel bar for bar"""
+    prices = np.asarray(prices, dtype=np.float64)
+    delta = _pad_front(np.diff(prices, axis=0), 1)
+    gains = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+    losses = np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0))
+    avg_gain = wilder_smooth(gains, period)
+    avg_loss = wilder_smooth(losses, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+class RollingStats:
+    """Rolling volatility, drawdown, SMA and RSI for one close series.
+
+    ``seed`` computes the full history with the batch functions and primes
+    the kernels; ``extend`` then advances only the bars that were appended
+    since, so a rerun with one new bar costs a handful of float operations.
+    """
+
+    def __init__(self, vol_window: int = 30, sma_window: int = 20, rsi_period: int = 14,
+                 periods_per_year: int = TRADING_DAYS):
+        self.vol_window = vol_window
+        self.sma_window = sma_window
+        self.rsi_period = rsi_period
+        self.periods_per_year = periods_per_year
+        self.index = pd.Index([])
+        self.columns: Dict[str, np.ndarray] = {}
+        self.kernels: Dict[str, object] = {}
+        self.tail = np.array([])  # last closes seen, to catch revised bars
+
+    def _kernels(self):
+        return {
+            'volatility': RollingVolatility(self.vol_window, self.periods_per_year),
+            'drawdown': RunningDrawdown(),
+            'sma': RollingMean(self.sma_window),
+            'rsi': RSI(self.rsi_period),
+        }
+
+    def seed(self, close: pd.Series) -> None:
+        values = close.to_numpy(dtype=np.float64)
+        self.index = close.index
+        self.columns = {
+            'volatility': rolling_volatility(values, self.vol_window, self.periods_per_year),
+            'drawdown': running_drawdown(values),
+            'sma': rolling_mean(values, self.sma_window),
+            'rsi': rsi(values, self.rsi_period),
+        }
+        self.kernels = self._kernels()
+        for kernel in self.kernels.values():
+            kernel.seed(values)
+        self.tail = values[-TAIL_CHECK:].copy()
+
+    def can_extend(self, close: pd.Series) -> bool:
+        """Same first and last seen bar, and the last seen closes unrevised"""
+        n = len(self.index)
+        if not (0 < n <= len(close) and close.index[n - 1] == self.index[-1]
+                and close.index[0] == self.index[0]):
+            return False
+        # A replaced close (intraday -> final) or a dividend re-adjustment changes the tail
+        seen = close.to_numpy(dtype=np.float64)[n - len(self.tail):n]
+        return np.array_equal(seen, self.tail)
+
+    def extend(self, close: pd.Series) -> int:
+        """Advance the kernels over bars newer than the last seen one; returns bars added"""
+        return self.append(close.iloc[len(self.index):])
+
+    def append(self, new: pd.Series) -> int:
+        """Advance the kernels over bars known to follow the last seen one"""
+        if new.empty:
+            return 0
+        appended = {name: [] for name in self.kernels}
+        for price in new.to_numpy(dtype=np.float64):
+            for name, kernel in self.kernels.items():
+                appended[name].append(kernel.update(price))
+        for name, values in appended.items():
+            self.columns[name] = np.concatenate([self.columns[name], values])
+        self.index = self.index.append(new.index)
+        self.tail = np.concatenate([self.tail, new.to_numpy(dtype=np.float64)])[-TAIL_CHECK:]
+        return len(new)
+
+    def trim(self, max_bars: int) -> None:
+        """Drop the oldest outputs beyond ``max_bars`` (kernel state is unaffected)"""
+        if len(self.index) > max_bars:
+            self.index = self.index[-max_bars:]
+            self.columns = {name: values[-max_bars:] for name, values in self.columns.items()}
+
+    def series(self, name: str) -> pd.Series:
+        return pd.Series(self.columns[name], index=self.index, name=name)
+
+
+def update_rolling_stats(stats: Optional[RollingStats], close: pd.Series) -> RollingStats:
+    """Reuse ``stats`` when ``close`` only appends bars to it, otherwise reseed"""
+    if stats is None or not stats.can_extend(close):
+        stats = RollingStats()
+        stats.seed(close)
+    else:
+        stats.extend(close)
+    return stats
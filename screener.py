@@ -0,0 +1,161 @@
+"""Cross-sectional fundamentals screener.
+
+The ratio snapshot for the whole universe is held column-wise in NumPy
+arrays. Each metric keeps a sorted index, so value-range queries are a
+pair of binary searches, and precomputed percentile ranks and sector /
+industry medians make the other criteria plain vectorized comparisons.
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sector_index import METRICS, SECTOR_INDEX_DB
+
+# kind: 'range'            low <= value <= high (None leaves a side open)
+#       'percentile'       universe percentile rank (0-100) within [low, high]
+#       'below_median'     value below the median of its group ('sector' or 'industry')
+#       'above_median'     value above the median of its group
+Criterion = namedtuple('Criterion', ['metric', 'kind', 'low', 'high', 'group'],
+                       defaults=(None, None, 'sector'))
+
+
+class ScreenerTable:
+    """Columnar ratio snapshot with per-metric sorted indexes"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.tickers = frame['ticker'].to_numpy(dtype=object)
+        self.groups = {
+            'sector': frame['sector'].fillna('Unknown').to_numpy(dtype=object),
+            'industry': frame['industry'].fillna('Unknown').to_numpy(dtype=object),
+        }
+        self.values: Dict[str, np.ndarray] = {}
+        self.order: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.ranks: Dict[str, np.ndarray] = {}
+        self.group_medians: Dict[tuple, np.ndarray] = {}
+
+        for metric in METRICS:
+            values = frame[metric].to_numpy(dtype=np.float64) if metric in frame else \
+                np.full(len(frame), np.nan)
+            self.values[metric] = values
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self.order[metric] = order
+            self.sorted_values[metric] = values[order]
+            ranks = np.full(len(values), np.nan)
+            if len(order) > 1:
+                ranks[order] = np.arange(len(order)) * 100.0 / (len(order) - 1)
+            elif len(order) == 1:
+                ranks[order] = 50.0
+            self.ranks[metric] = ranks
+            for level, labels in self.groups.items():
+                self.group_medians[(level, metric)] = self._group_median(values, labels)
+
+    @staticmethod
+    def _group_median(values: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        codes, inverse = np.unique(labels.astype(str), return_inverse=True)
+        medians = np.full(len(codes), np.nan)
+        for code in range(len(codes)):
+            group = values[inverse == code]
+            group = group[~np.isnan(group)]
+            if len(group):
+                medians[code] = np.median(group)
+        return medians[inverse]
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def range_mask(self, metric: str, low: Optional[float] = None,
+                   high: Optional[float] = None) -> np.ndarray:
+        """Rows with low <= value <= high, found by binary search on the sorted index"""
+        sorted_values = self.sorted_values[metric]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side='right')
+        mask = np.zeros(len(self.tickers), dtype=bool)
+        mask[self.order[metric][start:stop]] = True
+        return mask
+
+    def percentile_value(self, metric: str, pct: float) -> float:
+        """Universe percentile of a metric, read off the sorted index"""
+        sorted_values = self.sorted_values[metric]
+        if not len(sorted_values):
+            return float('nan')
+        return float(np.percentile(sorted_values, pct))
+
+    def mask(self, criterion: Criterion) -> np.ndarray:
+        values = self.values[criterion.metric]
+        if criterion.kind == 'range':
+            return self.range_mask(criterion.metric, criterion.low, criterion.high)
+        if criterion.kind == 'percentile':
+            ranks = self.ranks[criterion.metric]
+            low = 0 if criterion.low is None else criterion.low
+            high = 100 if criterion.high is None else criterion.high
+            with np.errstate(invalid='ignore'):
+                return (ranks >= low) & (ranks <= high)
+        medians = self.group_medians[(criterion.group, criterion.metric)]
+        with np.errstate(invalid='ignore'):
+            if criterion.kind == 'below_median':
+                return values < medians
+            if criterion.kind == 'above_median':
+                return values > medians
+        raise ValueError(f"Unknown criterion kind: {criterion.kind}")
+
+    def query(self, criteria: List[Criterion], sectors: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rows matching every criterion (and sector filter), as a DataFrame"""
+        mask = np.ones(len(self.tickers), dtype=bool)
+        if sectors:
+            mask &= np.isin(self.groups['sector'], sectors)
+        for criterion in criteria:
+            mask &= self.mask(criterion)
+        rows = np.flatnonzero(mask)
+        result = pd.DataFrame({
+            'Ticker': self.tickers[rows],
+            'Sector': self.groups['sector'][rows],
+            'Industry': self.groups['industry'][rows],
+        })
+        for metric in METRICS:
+            result[metric] = self.values[metric][rows]
+        return result
+
+    def sectors(self) -> List[str]:
+        return sorted(set(self.groups['sector']))
+
+
+def load_snapshot(db_path: str = SECTOR_INDEX_DB) -> pd.DataFrame:
+    """Constituent fundamentals stored by the sector index job"""
+    if not os.path.exists(db_path):
+        return pd.DataFrame()
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query("SELECT * FROM fundamentals", conn)
+    except Exception:
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+
+@lru_cache(maxsize=2)
+def _cached_table(db_path: str, mtime: float) -> Optional[ScreenerTable]:
+    frame = load_snapshot(db_path)
+    return ScreenerTable(frame) if not frame.empty else None
+
+
+def get_screener(db_path: str = SECTOR_INDEX_DB) -> Optional[ScreenerTable]:
+    """Process-wide screener table, rebuilt only when the snapshot file changes"""
+    if not os.path.exists(db_path):
+        return None
+    return _cached_table(db_path, os.path.getmtime(db_path))
+
+
+def timed_query(table: ScreenerTable, criteria: List[Criterion],
+                sectors: Optional[List[str]] = None):
+    """Run a query and return (results, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = table.query(criteria, sectors)
+    return result, (time.perf_counter() - start) * 1000
@@ -0,0 +1,225 @@
+"""Offline sector/industry benchmark index.
+
+Pulls fundamentals for every constituent ticker concurrently, computes
+per-sector and per-industry medians and percentiles for the six ratios the
+dashboard shows, and stores them in a local SQLite file. The app loads the
+whole table once into a dict, so a benchmark lookup is a dict access.
+
+Run it periodically (e.g. nightly):
+
+    python sector_index.py --universe tickers.txt --workers 8
+"""
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+SECTOR_INDEX_DB = os.environ.get("SECTOR_INDEX_DB", "sector_index.db")
+
+# Yahoo info field -> dashboard display name, and the factor that puts the
+# value in the dashboard's units (ROE/ROA are shown as percentages)
+RATIO_FIELDS = {
+    'trailingPE': ('P/E Ratio', 1),
+    'priceToBook': ('P/B Ratio', 1),
+    'debtToEquity': ('Debt/Equity', 1),
+    'currentRatio': ('Current Ratio', 1),
+    'returnOnEquity': ('ROE', 100),
+    'returnOnAssets': ('ROA', 100),
+}
+METRICS = [name for name, _ in RATIO_FIELDS.values()]
+PERCENTILES = [10, 25, 50, 75, 90]
+# Industries with fewer constituents than this fall back to the sector
+MIN_GROUP_SIZE = 5
+
+DEFAULT_UNIVERSE = [
+    # Technology
+    'AAPL', 'MSFT', 'NVDA', 'AVGO', 'ORCL', 'CRM', 'ADBE', 'AMD', 'CSCO', 'ACN',
+    'INTC', 'IBM', 'QCOM', 'TXN', 'NOW', 'INTU', 'AMAT', 'MU', 'LRCX', 'ADI',
+    # Communication Services
+    'GOOGL', 'META', 'NFLX', 'DIS', 'CMCSA', 'T', 'VZ', 'TMUS', 'EA', 'CHTR',
+    # Consumer Cyclical
+    'AMZN', 'TSLA', 'HD', 'MCD', 'NKE', 'LOW', 'SBUX', 'BKNG', 'TJX', 'GM',
+    # Consumer Defensive
+    'WMT', 'PG', 'KO', 'PEP', 'COST', 'PM', 'MO', 'MDLZ', 'CL', 'KMB',
+    # Financial Services
+    'JPM', 'BAC', 'WFC', 'GS', 'MS', 'C', 'BLK', 'SCHW', 'AXP', 'V', 'MA', 'PYPL',
+    # Healthcare
+    'JNJ', 'UNH', 'LLY', 'PFE', 'ABBV', 'MRK', 'TMO', 'ABT', 'DHR', 'BMY', 'AMGN', 'CVS',
+    # Industrials
+    'CAT', 'HON', 'UPS', 'BA', 'GE', 'RTX', 'LMT', 'DE', 'MMM', 'UNP',
+    # Energy
+    'XOM', 'CVX', 'COP', 'SLB', 'EOG', 'PSX', 'MPC', 'OXY', 'VLO', 'KMI',
+    # Utilities
+    'NEE', 'DUK', 'SO', 'D', 'AEP', 'EXC', 'SRE', 'XEL', 'PEG', 'ED',
+    # Real Estate
+    'PLD', 'AMT', 'EQIX', 'CCI', 'PSA', 'SPG', 'O', 'WELL', 'DLR', 'AVB',
+    # Basic Materials
+    'LIN', 'APD', 'SHW', 'ECL', 'FCX', 'NEM', 'DOW', 'DD', 'NUE', 'PPG',
+]
+
+
+def load_universe(path: Optional[str]) -> List[str]:
+    """Read one ticker per line (blank lines and # comments ignored)"""
+    if not path:
+        return list(DEFAULT_UNIVERSE)
+    with open(path) as f:
+        tickers = [line.split('#')[0].strip().upper() for line in f]
+    return [t for t in tickers if t]
+
+
+def fundamentals_row(ticker: str, info: Dict) -> Optional[Dict]:
+    """Extract sector, industry and the six ratios (dashboard units) from a Yahoo info dict"""
+    if not info or not info.get('sector'):
+        return None
+    row = {'ticker': ticker, 'sector': info.get('sector'), 'industry': info.get('industry')}
+    for field, (name, factor) in RATIO_FIELDS.items():
+        value = info.get(field)
+        try:
+            row[name] = float(value) * factor if value is not None else None
+        except (TypeError, ValueError):
+            row[name] = None
+    return row
+
+
+def fetch_fundamentals(ticker: str) -> Optional[Dict]:
+    """Fetch one constituent's fundamentals; None if Yahoo has nothing usable"""
+    try:
+        return fundamentals_row(ticker, yf.Ticker(ticker).info)
+    except Exception:
+        return None
+
+
+def compute_benchmarks(rows: pd.DataFrame) -> pd.DataFrame:
+    """Median/percentiles per sector and per industry for every metric"""
+    records = []
+    for level in ('sector', 'industry'):
+        for name, group in rows.groupby(level):
+            for metric in METRICS:
+                values = group[metric].dropna()
+                if values.empty:
+                    continue
+                quantiles = values.quantile([p / 100 for p in PERCENTILES])
+                record = {'level': level, 'name': name, 'metric': metric, 'n': int(len(values))}
+                record.update({f'p{p}': float(q) for p, q in zip(PERCENTILES, quantiles)})
+                records.append(record)
+    return pd.DataFrame(records)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    percentile_cols = ", ".join(f"p{p} REAL" for p in PERCENTILES)
+    metric_cols = ", ".join(f'"{m}" REAL' for m in METRICS)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            ticker TEXT PRIMARY KEY, sector TEXT, industry TEXT, {metric_cols}, fetched_at REAL);
+        CREATE TABLE IF NOT EXISTS benchmarks (
+            level TEXT, name TEXT, metric TEXT, n INTEGER, {percentile_cols},
+            PRIMARY KEY (level, name, metric));
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return conn
+
+
+def save_index(rows: pd.DataFrame, benchmarks: pd.DataFrame, db_path: str = SECTOR_INDEX_DB) -> None:
+    """Replace the stored constituents and benchmarks in one transaction"""
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM fundamentals")
+            conn.execute("DELETE FROM benchmarks")
+            columns = ['ticker', 'sector', 'industry'] + METRICS
+            placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+            conn.executemany(
+                f"INSERT INTO fundamentals VALUES ({placeholders})",
+                [tuple(None if pd.isna(v) else v for v in row) + (now,)
+                 for row in rows[columns].itertuples(index=False)])
+            columns = ['level', 'name', 'metric', 'n'] + [f'p{p}' for p in PERCENTILES]
+            placeholders = ", ".join("?" for _ in columns)
+            conn.executemany(f"INSERT INTO benchmarks VALUES ({placeholders})",
+                             list(benchmarks[columns].itertuples(index=False)))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('built_at', ?)", (str(now),))
+    finally:
+        conn.close()
+
+
+def build_sector_index(tickers: List[str], max_workers: int = 8,
+                       db_path: str = SECTOR_INDEX_DB, fetch=fetch_fundamentals) -> pd.DataFrame:
+    """Fetch every constituent concurrently, compute benchmarks and persist them"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = [row for row in pool.map(fetch, tickers) if row]
+    if not rows:
+        raise RuntimeError("No fundamentals could be fetched for the universe")
+    frame = pd.DataFrame(rows)
+    benchmarks = compute_benchmarks(frame)
+    save_index(frame, benchmarks, db_path)
+    return benchmarks
+
+
+@lru_cache(maxsize=4)
+def _load_index(db_path: str, mtime: float) -> Dict[Tuple[str, str], Dict[str, Dict[str, float]]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(
+            "SELECT level, name, metric, n, " + ", ".join(f"p{p}" for p in PERCENTILES) + " FROM benchmarks")
+        index: Dict[Tuple[str, str], Dict[str, Dict[str, float]]] = {}
+        for level, name, metric, n, *quantiles in cursor:
+            stats = {'n': n}
+            stats.update({f'p{p}': q for p, q in zip(PERCENTILES, quantiles)})
+            index.setdefault((level, name), {})[metric] = stats
+        return index
+    finally:
+        conn.close()
+
+
+def load_index(db_path: str = SECTOR_INDEX_DB) -> Dict[Tuple[str, str], Dict[str, Dict[str, float]]]:
+    """The whole benchmark table keyed by (level, name); reloaded when the file changes"""
+    if not os.path.exists(db_path):
+        return {}
+    try:
+        return _load_index(db_path, os.path.getmtime(db_path))
+    except sqlite3.Error:
+        return {}
+
+
+def lookup_benchmarks(sector: str, industry: Optional[str] = None,
+                      db_path: str = SECTOR_INDEX_DB) -> Dict[str, Dict[str, float]]:
+    """Per-metric stats for the industry (when well populated) or else the sector"""
+    index = load_index(db_path)
+    sector_stats = index.get(('sector', sector), {})
+    industry_stats = index.get(('industry', industry), {}) if industry else {}
+    merged = dict(sector_stats)
+    for metric, stats in industry_stats.items():
+        if stats['n'] >= MIN_GROUP_SIZE:
+            merged[metric] = stats
+    return merged
+
+
+def lookup_sector_averages(sector: str, industry: Optional[str] = None,
+                           db_path: str = SECTOR_INDEX_DB) -> Dict[str, float]:
+    """Median of each metric, in the same shape as get_sector_averages"""
+    return {metric: stats['p50'] for metric, stats in lookup_benchmarks(sector, industry, db_path).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the sector benchmark index")
+    parser.add_argument("--universe", help="file with one ticker per line (default: built-in list)")
+    parser.add_argument("--db", default=SECTOR_INDEX_DB, help="SQLite output path")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent fetches")
+    args = parser.parse_args()
+
+    tickers = load_universe(args.universe)
+    start = time.time()
+    benchmarks = build_sector_index(tickers, max_workers=args.workers, db_path=args.db)
+    sectors = benchmarks.loc[benchmarks['level'] == 'sector', 'name'].nunique()
+    print(f"Indexed {len(tickers)} tickers into {sectors} sectors in {time.time() - start:.1f}s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
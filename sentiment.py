@@ -0,0 +1,191 @@
+"""Headline sentiment scoring.
+
+Two backends: TextBlob polarity (fast path) and a locally stored
+transformers sequence-classification model (accurate path) run with
+batched, truncated inference. Scores are memoized per headline hash in
+memory and in a local SQLite file, then aggregated into daily series for
+the Stock Analysis page. Everything runs offline from local headline files and a local model directory.
+
+Headline files live in NEWS_DIR as ``<TICKER>.csv`` or ``<TICKER>.jsonl``
+with ``date`` and ``headline`` columns.
+"""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+NEWS_DIR = os.environ.get("NEWS_DIR", "news")
+SENTIMENT_MODEL_DIR = os.environ.get("SENTIMENT_MODEL_DIR", "models/sentiment")
+SENTIMENT_DB = os.environ.get("SENTIMENT_DB", "sentiment_cache.db")
+
+
+def headline_key(text: str) -> str:
+    normalized = " ".join(str(text).lower().split())
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def headline_files(ticker: str, news_dir: str = NEWS_DIR) -> List[str]:
+    pattern = os.path.join(news_dir, f"{ticker.upper()}.*")
+    return sorted(p for p in glob.glob(pattern) if p.endswith(('.csv', '.jsonl')))
+
+
+def load_headlines(ticker: str, news_dir: str = NEWS_DIR) -> pd.DataFrame:
+    """All local headlines for a ticker as a frame with date and headline columns"""
+    frames = []
+    for path in headline_files(ticker, news_dir):
+        if path.endswith('.csv'):
+            frames.append(pd.read_csv(path))
+        else:
+            with open(path) as f:
+                frames.append(pd.DataFrame([json.loads(line) for line in f if line.strip()]))
+    if not frames:
+        return pd.DataFrame(columns=['date', 'headline'])
+    headlines = pd.concat(frames, ignore_index=True)[['date', 'headline']].dropna()
+    headlines['date'] = pd.to_datetime(headlines['date'], utc=True).dt.tz_localize(None).dt.normalize()
+    return headlines.drop_duplicates().reset_index(drop=True)
+
+
+@lru_cache(maxsize=2)
+def _load_transformer(model_dir: str):
+    # Never reach for the hub: the model must already be on disk
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    from transformers import pipeline
+
+    pipe = pipeline("text-classification", model=model_dir, tokenizer=model_dir, top_k=None)
+    return pipe, label_signs(pipe.model.config.id2label)
+
+
+def transformer_available(model_dir: str = SENTIMENT_MODEL_DIR) -> bool:
+    return os.path.isfile(os.path.join(model_dir, "config.json"))
+
+
+LABEL_SIGNS = (('pos', 1.0), ('bull', 1.0), ('neg', -1.0), ('bear', -1.0), ('neu', 0.0))
+
+
+def label_signs(id2label: Dict[int, str]) -> Dict[str, float]:
+    """+1 / -1 / 0 per label name of a model's config; raises on names with no known meaning"""
+    signs = {}
+    for label in id2label.values():
+        name = label.lower()
+        sign = next((s for prefix, s in LABEL_SIGNS if name.startswith(prefix)), None)
+        if sign is None:
+            raise ValueError(f"Can't tell the sentiment of model label {label!r}; set id2label in the "
+                             f"model's config.json to positive/negative/neutral names")
+        signs[label] = sign
+    return signs
+
+
+def _signed_score(label_scores: List[Dict], signs: Dict[str, float]) -> float:
+    """P(positive) - P(negative) from a full label distribution"""
+    return sum(signs[item['label']] * item['score'] for item in label_scores)
+
+
+class SentimentScorer:
+    """Batched, memoized headline scorer (scores in [-1, 1])"""
+
+    def __init__(self, backend: str = 'textblob', model_dir: str = SENTIMENT_MODEL_DIR,
+                 batch_size: int = 32, max_length: int = 128, db_path: Optional[str] = SENTIMENT_DB):
+        if backend not in ('textblob', 'transformer'):
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+        self.backend = backend
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._memo: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS scores (
+                key TEXT, backend TEXT, score REAL, PRIMARY KEY (key, backend))""")
+            self._conn.commit()
+
+    def _backend_id(self) -> str:
+        return self.backend if self.backend == 'textblob' else f"transformer:{os.path.abspath(self.model_dir)}"
+
+    def _lookup_disk(self, keys: List[str]) -> Dict[str, float]:
+        if self._conn is None or not keys:
+            return {}
+        found = {}
+        backend = self._backend_id()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT key, score FROM scores WHERE backend = ? AND key IN ({placeholders})",
+                    [backend] + chunk).fetchall()
+                found.update(rows)
+        return found
+
+    def _store(self, scored: Dict[str, float]) -> None:
+        self._memo.update(scored)
+        if self._conn is None or not scored:
+            return
+        backend = self._backend_id()
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                                   [(k, backend, v) for k, v in scored.items()])
+            self._conn.commit()
+
+    def _score_batch(self, texts: List[str]) -> List[float]:
+        if self.backend == 'textblob':
+            from textblob import TextBlob
+
+            return [TextBlob(text).sentiment.polarity for text in texts]
+        pipe, signs = _load_transformer(self.model_dir)
+        outputs = pipe(texts, batch_size=self.batch_size, truncation=True, max_length=self.max_length)
+        return [_signed_score(item, signs) for item in outputs]
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """Scores for every text; only headlines never seen before are run through the model"""
+        keys = [headline_key(t) for t in texts]
+        missing = [k for k in dict.fromkeys(keys) if k not in self._memo]
+        if missing:
+            self._memo.update(self._lookup_disk(missing))
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in self._memo and key not in todo:
+                todo[key] = text
+        todo_keys = list(todo)
+        for start in range(0, len(todo_keys), self.batch_size):
+            batch_keys = todo_keys[start:start + self.batch_size]
+            scores = self._score_batch([todo[k] for k in batch_keys])
+            self._store(dict(zip(batch_keys, scores)))
+        return np.array([self._memo[k] for k in keys], dtype=np.float64)
+
+
+def daily_sentiment(headlines: pd.DataFrame, scores: np.ndarray) -> pd.DataFrame:
+    """Mean score and headline count per calendar day"""
+    frame = pd.DataFrame({'date': headlines['date'].to_numpy(), 'score': scores})
+    daily = frame.groupby('date')['score'].agg(['mean', 'count'])
+    daily.columns = ['sentiment', 'headline_count']
+    return daily.sort_index()
+
+
+def ticker_sentiment(ticker: str, backend: str = 'textblob',
+                     news_dir: str = NEWS_DIR, scorer: Optional[SentimentScorer] = None) -> pd.DataFrame:
+    """Daily sentiment series for a ticker from its local headline files"""
+    headlines = load_headlines(ticker, news_dir)
+    if headlines.empty:
+        return pd.DataFrame(columns=['sentiment', 'headline_count'])
+    scorer = scorer or get_scorer(backend)
+    return daily_sentiment(headlines, scorer.score(headlines['headline'].tolist()))
+
+
+_SCORERS: Dict[str, SentimentScorer] = {}
+
+
+def get_scorer(backend: str = 'textblob') -> SentimentScorer:
+    """Process-wide scorer per backend, so the memo and model are loaded once"""
+    if backend not in _SCORERS:
+        _SCORERS[backend] = SentimentScorer(backend)
+    return _SCORERS[backend]
@@ -0,0 +1,166 @@
+"""Run the dashboard as several Streamlit worker processes behind one port.
+
+    python serve.py --workers 4 --port 8501
+
+Each worker is its own ``streamlit run stock.py`` on an internal port. They
+share one cache tier: shared_cache.py's SQLite file (or Redis via REDIS_URL)
+for prices, sector averages, fitted models and simulations, plus the
+fundamentals, Prophet model, forecast-residual and sector index stores and the replay archive, all resolved
+to absolute paths so every worker opens the same files. A Streamlit session lives on a single
+websocket, so the bundled TCP proxy pins each client address to one worker
+(and skips workers that are down). To run behind nginx instead, pass
+--no-proxy and use the printed upstream block. With METRICS_PORT set,
+worker i exports its metrics on METRICS_PORT + i.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stock.py")
+
+# Files every worker must agree on, with the defaults the modules use
+SHARED_PATHS = {
+    "SHARED_CACHE_DB": "shared_cache.db",
+    "FUNDAMENTALS_DB": "fundamentals_cache.db",
+    "MODEL_CACHE_DIR": "model_cache",
+    "SENTIMENT_DB": "sentiment_cache.db",
+    "RESIDUALS_DB": "residuals.db",
+    "DATA_ARCHIVE": "data_archive.db",
+    "SECTOR_INDEX_DB": "sector_index.db",
+}
+
+
+def worker_env(index: int = 0) -> dict:
+    env = os.environ.copy()
+    for var, default in SHARED_PATHS.items():
+        env[var] = os.path.abspath(env.get(var, default))
+    if env.get("METRICS_PORT"):
+        # Each worker has its own registry, so each needs its own exporter port
+        env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + index)
+    return env
+
+
+def worker_command(port: int) -> List[str]:
+    return [sys.executable, "-m", "streamlit", "run", APP,
+            "--server.port", str(port), "--server.address", "127.0.0.1",
+            "--server.headless", "true", "--browser.gatherUsageStats", "false"]
+
+
+def start_workers(count: int, base_port: int) -> List[subprocess.Popen]:
+    env = worker_env()
+    if not env.get("REDIS_URL"):
+        # Create the shared schema (and switch to WAL) before the workers race to do it
+        from shared_cache import SQLiteBackend
+        SQLiteBackend(env["SHARED_CACHE_DB"]).init()
+    return [subprocess.Popen(worker_command(base_port + i), env=worker_env(i)) for i in range(count)]
+
+
+def stop_workers(workers: List[subprocess.Popen], timeout: float = 10.0) -> None:
+    for worker in workers:
+        if worker.poll() is None:
+            worker.terminate()
+    deadline = time.time() + timeout
+    for worker in workers:
+        try:
+            worker.wait(max(deadline - time.time(), 0.1))
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+def worker_order(client: str, ports: List[int]) -> List[int]:
+    """Ports to try for a client: its sticky worker first, then the others"""
+    start = int(hashlib.md5(client.encode()).hexdigest(), 16) % len(ports)
+    return ports[start:] + ports[:start]
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _handle(client_reader, client_writer, ports: List[int]) -> None:
+    peer = client_writer.get_extra_info("peername")
+    client = peer[0] if peer else ""
+    for port in worker_order(client, ports):
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", port)
+            break
+        except OSError:
+            continue  # Worker down or still starting; fail over to the next one
+    else:
+        client_writer.close()
+        return
+    await asyncio.gather(_pipe(client_reader, upstream_writer), _pipe(upstream_reader, client_writer))
+
+
+async def run_proxy(host: str, port: int, ports: List[int]) -> None:
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, ports), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def nginx_config(ports: List[int], listen: int) -> str:
+    servers = "\n".join(f"    server 127.0.0.1:{port};" for port in ports)
+    return f"""upstream stock_dashboard {{
+    ip_hash;
+{servers}
+}}
+
+server {{
+    listen {listen};
+    location / {{
+        proxy_pass http://stock_dashboard;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host $host;
+        proxy_read_timeout 86400;
+    }}
+}}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard with several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501, help="public port")
+    parser.add_argument("--worker-port", type=int, default=8601, help="first internal worker port")
+    parser.add_argument("--no-proxy", action="store_true",
+                        help="only start the workers and print an nginx config for them")
+    args = parser.parse_args()
+
+    ports = [args.worker_port + i for i in range(args.workers)]
+    workers = start_workers(args.workers, args.worker_port)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if args.no_proxy:
+            print(nginx_config(ports, args.port))
+            while all(worker.poll() is None for worker in workers):
+                time.sleep(1)
+        else:
+            print(f"Serving {args.workers} workers on http://{args.host}:{args.port}")
+            asyncio.run(run_proxy(args.host, args.port, ports))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
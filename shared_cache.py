@@ -0,0 +1,265 @@
+"""Cache tier shared by every worker process on a host.
+
+Per-process caches (lru_cache, module dicts) multiply upstream calls by the
+number of workers. This tier sits behind them: values are pickled into a
+SQLite file in WAL mode (SHARED_CACHE_DB), or into Redis when REDIS_URL is
+set and the redis package is installed. ``get_or_compute`` takes a short
+cross-worker lease, so when several workers miss the same key at once only
+one of them computes it and the rest wait for the result.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+SHARED_CACHE_DB = os.environ.get("SHARED_CACHE_DB", "shared_cache.db")
+REDIS_URL = os.environ.get("REDIS_URL")
+MAX_ITEM_BYTES = int(float(os.environ.get("SHARED_CACHE_MAX_ITEM_MB", "64")) * 2**20)
+
+# Default time-to-live per namespace in seconds (None keeps entries until evicted)
+DEFAULT_TTLS = {
+    'prices': 15 * 60,
+    'sector_averages': 24 * 3600,
+    'models': 24 * 3600,
+    'simulations': 3600,
+}
+
+
+def series_digest(series: pd.Series) -> str:
+    """Content hash of a price series, stable across processes (for cache keys)"""
+    digest = hashlib.sha1()
+    digest.update(np.asarray(pd.DatetimeIndex(series.index).asi8).tobytes())
+    digest.update(series.to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SQLiteBackend:
+    """Key/value store in one SQLite file that many processes can open at once"""
+
+    def __init__(self, path: str = SHARED_CACHE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open_lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, expires_at REAL, value BLOB)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+            key TEXT PRIMARY KEY, expires_at REAL)""")
+        conn.commit()
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module creates no file
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._connect()
+        return self._db
+
+    def init(self) -> "SQLiteBackend":
+        """Create the file and schema now rather than on first use"""
+        self._conn
+        return self
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?",
+                                     (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                               (key, expires_at, sqlite3.Binary(value)))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            self._conn.commit()
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = self._conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?)", (key, now + ttl))
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def held(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?",
+                                     (key, time.time())).fetchone()
+        return row is not None
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class RedisBackend:
+    """Same interface on top of a Redis (or Redis-compatible) server"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self._client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        return bool(self._client.set(f"lease:{key}", b"1", nx=True, px=int(ttl * 1000)))
+
+    def held(self, key: str) -> bool:
+        return bool(self._client.exists(f"lease:{key}"))
+
+    def release(self, key: str) -> None:
+        self._client.delete(f"lease:{key}")
+
+
+class SharedCache:
+    """Namespaced, pickling front end over a shared backend (``open_backend()`` on first use by default)"""
+
+    def __init__(self, backend=None, max_item_bytes: int = MAX_ITEM_BYTES):
+        self._backend = backend
+        self._open_lock = threading.Lock()
+        self.max_item_bytes = max_item_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._open_lock:
+                if self._backend is None:
+                    self._backend = open_backend()
+        return self._backend
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        try:
+            payload = self.backend.get(self._key(namespace, key))
+        except Exception:
+            payload = None  # The shared tier is an optimization, never a hard dependency
+        if payload is None:
+            self.misses += 1
+            return default
+        try:
+            value = pickle.loads(payload)
+        except Exception:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a value; returns False when it can't be pickled or is too large to share"""
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self.skipped += 1
+            return False
+        if len(payload) > self.max_item_bytes:
+            self.skipped += 1
+            return False
+        try:
+            self.backend.set(self._key(namespace, key), payload,
+                             ttl if ttl is not None else DEFAULT_TTLS.get(namespace))
+        except Exception:
+            self.skipped += 1
+            return False
+        self.stores += 1
+        return True
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any],
+                       ttl: Optional[float] = None, wait: float = 60.0) -> Any:
+        """Cached value, or compute it once across workers (None results are not stored)"""
+        missing = object()
+        value = self.get(namespace, key, missing)
+        if value is not missing:
+            return value
+        full_key = self._key(namespace, key)
+        try:
+            leased = self.backend.acquire(full_key, wait)
+        except Exception:
+            leased = True  # Without a working lease just compute locally
+        if not leased:
+            # Another worker is computing it; poll until it stores a result or gives up
+            deadline = time.time() + wait
+            while time.time() < deadline:
+                time.sleep(0.1)
+                value = self.get(namespace, key, missing)
+                if value is not missing:
+                    return value
+                try:
+                    if not self.backend.held(full_key):
+                        break
+                except Exception:
+                    break
+        try:
+            value = compute()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+            return value
+        finally:
+            if leased:
+                try:
+                    self.backend.release(full_key)
+                except Exception:
+                    pass
+
+    def clear(self, namespace: str) -> None:
+        self.backend.delete_prefix(self._key(namespace, ""))
+
+
+def open_backend():
+    """Redis when REDIS_URL is set and reachable, otherwise the local SQLite file"""
+    if REDIS_URL:
+        try:
+            return RedisBackend(REDIS_URL)
+        except Exception:
+            pass
+    return SQLiteBackend(SHARED_CACHE_DB)
+
+
+def open_shared_cache() -> SharedCache:
+    return SharedCache(open_backend())
+
+
+# Process-wide handle; every worker opens the same file (or server) on its first lookup
+SHARED = SharedCache()
@@ -0,0 +1,116 @@
+"""Trend extraction for price paths and price matrices.
+
+Every smoother works on 1-D series or along one axis of a 2-D array in a
+single call, so a whole Monte Carlo path matrix (days x simulations) or a
+multi-ticker price matrix (dates x tickers) is smoothed without Python
+loops over columns.
+
+Trailing smoothers (``moving_average``, ``weighted_moving_average``,
+``ema``) only look back and leave the first ``window - 1`` values NaN, the
+same as pandas rolling windows. ``savgol`` and ``wavelet`` are centered,
+so they are meant for displaying trends, not for features a model trains on.
+"""
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from rolling import _pad_front, ewm_mean, rolling_mean
+
+
+def _along_axis(func: Callable[[np.ndarray], np.ndarray], x, axis: int) -> np.ndarray:
+    """Apply a time-on-axis-0 function along ``axis``"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 0:
+        raise ValueError("Expected a 1-D or 2-D array")
+    moved = np.moveaxis(x, axis, 0)
+    return np.moveaxis(func(moved), 0, axis)
+
+
+def moving_average(x, window: int = 20, axis: int = 0) -> np.ndarray:
+    """Trailing simple moving average; same as ``rolling(window).mean()``"""
+    return _along_axis(lambda a: rolling_mean(a, window), x, axis)
+
+
+def weighted_moving_average(x, window: int = 20, axis: int = 0) -> np.ndarray:
+    """Trailing linearly weighted average (newest value weighs ``window``, oldest 1)"""
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    weights /= weights.sum()
+
+    def wma(a):
+        if a.shape[0] < window:
+            return np.full(a.shape, np.nan)
+        n_out = a.shape[0] - window + 1
+        total = weights[0] * a[:n_out]
+        for k in range(1, window):
+            total = total + weights[k] * a[k:k + n_out]
+        return _pad_front(total, window - 1)
+
+    return _along_axis(wma, x, axis)
+
+
+def ema(x, span: int = 20, axis: int = 0) -> np.ndarray:
+    """Exponential moving average; same as ``ewm(span=span, adjust=False, min_periods=span).mean()``"""
+    return _along_axis(lambda a: ewm_mean(a, 2.0 / (span + 1), min_periods=span), x, axis)
+
+
+def savgol(x, window: int = 21, polyorder: int = 3, axis: int = 0) -> np.ndarray:
+    """Savitzky-Golay filter: a local polynomial fit that keeps peaks sharper than a moving average"""
+    from scipy.signal import savgol_filter
+
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[axis]
+    window = min(window, n if n % 2 else n - 1)
+    if window <= polyorder:
+        return x.copy()
+    return savgol_filter(x, window | 1, polyorder, axis=axis, mode='interp')
+
+
+# B3-spline scaling kernel of the "a trous" (undecimated) wavelet transform
+_B3_KERNEL = np.array([1, 4, 6, 4, 1], dtype=np.float64) / 16
+
+
+def _a_trous_level(a: np.ndarray, step: int) -> np.ndarray:
+    # Kernel taps spaced ``step`` apart, mirrored at the edges
+    pad = 2 * step
+    n = a.shape[0]
+    padded = np.pad(a, [(pad, pad)] + [(0, 0)] * (a.ndim - 1),
+                    mode='reflect' if n > pad else 'edge')
+    out = np.zeros_like(a)
+    for tap, weight in enumerate(_B3_KERNEL):
+        start = tap * step
+        out += weight * padded[start:start + n]
+    return out
+
+
+def wavelet(x, levels: int = 3, axis: int = 0) -> np.ndarray:
+    """Multi-resolution trend: the "a trous" approximation after ``levels`` scales.
+
+    Each level removes detail at roughly twice the previous period
+    (level 3 keeps swings longer than about 16 bars).
+    """
+    def approximate(a):
+        for level in range(levels):
+            a = _a_trous_level(a, 2 ** level)
+        return a
+
+    return _along_axis(approximate, x, axis)
+
+
+# Display name -> (function, parameter name that controls the smoothing width)
+METHODS: Dict[str, tuple] = {
+    'Moving Average': (moving_average, 'window'),
+    'Weighted MA': (weighted_moving_average, 'window'),
+    'EMA': (ema, 'span'),
+    'Savitzky-Golay': (savgol, 'window'),
+    'Wavelet': (wavelet, 'levels'),
+}
+
+
+def smooth(x, method: str, width: Optional[int] = None, axis: int = 0, **params) -> np.ndarray:
+    """Smooth with one of ``METHODS``; ``width`` maps to that method's window/span/levels"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    func, width_param = METHODS[method]
+    if width is not None:
+        params[width_param] = width
+    return func(x, axis=axis, **params)
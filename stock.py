@@ -4,34 +4,108 @@ import pandas as pd
 import numpy as np
 import requests
 import plotly.graph_objects as go
-from textblob import TextBlob
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
 import json
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
-from xgboost import XGBRegressor
-from statsmodels.tsa.arima.model import ARIMA
-from prophet import Prophet
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
+import importlib
+import os
+import sys
+import threading
 import time
 import random
-from sklearn.metrics import mean_absolute_error
 from functools import lru_cache
-import requests
-from typing import  Dict, Any,Tuple, Optional,List
-from sklearn.preprocessing import MinMaxScaler
+from typing import  Dict, Any,Tuple, Optional,List, Union
 import uuid
-from scipy.signal import savgol_filter
+from risk import build_price_matrix, compute_risk_metrics
+from correlation import cluster_order, window_correlation
+from portfolio import efficient_frontier, estimate_moments, max_sharpe, min_variance, risk_contributions, risk_parity
+from backtest import GRIDS as BACKTEST_GRIDS, backtest_equity, run_backtest
+from rolling import RollingStats, update_rolling_stats
+from indicators import ENGINE as INDICATOR_ENGINE
+from charts import band_traces, bar_trace, fan_traces, histogram_trace, line_trace
+from sector_index import lookup_benchmarks, lookup_sector_averages
+from screener import Criterion, get_screener, timed_query
+from fundamentals_cache import FUNDAMENTALS
+from shared_cache import SHARED, series_digest
+from tuning import TUNING_CORES, tune, tuned_params
+from conformal import RESIDUALS, Forecast
+from prefetch import PREFETCH, RateLimited
+from compact import CompactOHLCV
+from providers import FunctionProvider, NoData, ProviderError, ProviderPool
+from replay import configured, recorded
+from intraday import INTERVALS, get_live
+from memo import MEMO, memoize
+from smoothing import METHODS as SMOOTHING_METHODS, moving_average, smooth, weighted_moving_average
+from sentiment import headline_files, ticker_sentiment, transformer_available
+import prophet_backend
+from instrumentation import configure_from_env, lru_source, register_cache, snapshot, span, timed
+
+# Heavy model backends (TensorFlow, XGBoost, statsmodels, sklearn) are imported
+# lazily by the train functions, so pages that never train a model don't pay
+# for them. MODEL_BACKENDS lists what each Predictions model needs so the
+# imports can be started in the background before the user clicks "Generate".
+MODEL_BACKENDS = {
+    "Holt-Winters": ["statsmodels.tsa.holtwinters"],
+    "Arima": ["statsmodels.tsa.arima.model"],
+    "LSTM": ["sklearn.preprocessing", "tensorflow.keras.models", "tensorflow.keras.layers"],
+    "Random Forest": ["sklearn.ensemble"],
+    "XGBoost": ["xgboost", "sklearn.preprocessing"],
+    "Prophet": ["prophet", "prophet.serialize", "prophet.diagnostics"],
+}
+
+def backend_loaded(model_type: str) -> bool:
+    """Check whether every module behind a Predictions model is already imported"""
+    return all(name in sys.modules for name in MODEL_BACKENDS.get(model_type, []))
+
+def load_model_backend(model_type: str) -> None:
+    """Import the modules behind a Predictions model (no-op once loaded)"""
+    for module_name in MODEL_BACKENDS.get(model_type, []):
+        importlib.import_module(module_name)
+
+def _warm_up_backend(model_type: str) -> None:
+    try:
+        load_model_backend(model_type)
+    except Exception:
+        pass  # The train function reports the import error when it is actually used
+
+def warm_up_backends(model_types: List[str]) -> List[threading.Thread]:
+    """Start daemon threads importing the backends that aren't loaded yet"""
+    threads = []
+    for model_type in model_types:
+        if model_type not in MODEL_BACKENDS or backend_loaded(model_type):
+            continue
+        thread = threading.Thread(target=_warm_up_backend, args=(model_type,),
+                                  name=f"warmup-{model_type}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+# Optional warm-up at startup: STOCK_WARMUP_BACKENDS="all" or "LSTM,XGBoost"
+_warmup_setting = os.environ.get("STOCK_WARMUP_BACKENDS", "").strip()
+if _warmup_setting:
+    warm_up_backends(list(MODEL_BACKENDS) if _warmup_setting.lower() == "all"
+                     else [m.strip() for m in _warmup_setting.split(",")])
 
 st.set_page_config(layout="wide")
 st.title("📊 Advanced Stock Analysis Dashboard")
-@lru_cache(maxsize=32)
+
+ALPHA_VANTAGE_API_KEY = os.environ.get("ALPHA_VANTAGE_API_KEY")
+FMP_API_KEY = os.environ.get("FMP_API_KEY")
+# Compact histories are ~28 bytes per bar: measured ~36 KB resident for 5y and
+# ~142 KB for 20y, so a full cache of 5y histories is ~150 MB per worker
+PRICE_CACHE_SIZE = int(os.environ.get("PRICE_CACHE_SIZE", "4096"))
+
+# Metrics exporters (METRICS_PORT / METRICS_JSONL); started once per process
+configure_from_env()
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart with the figure serialization/render time recorded"""
+    with span("render.plotly_chart"):
+        st.plotly_chart(fig, **kwargs)
+
+NO_PRICE_DATA = "No data available for this symbol"
+
+@timed("data.fetch_yahoo")
+@recorded("yahoo.history")
 def fetch_stock_data_yahoo(symbol: str, period: str = "1y") -> Tuple[pd.DataFrame, str]:
     """Fetch stock data from Yahoo Finance API"""
     try:
@@ -52,7 +126,7 @@ def fetch_stock_data_yahoo(symbol: str, period: str = "1y") -> Tuple[pd.DataFram
         df = ticker.history(period=yahoo_period)
         
         if df.empty:
-            return pd.DataFrame(), "No data available for this symbol"
+            return pd.DataFrame(), NO_PRICE_DATA
             
         # Clean and standardize the data
         df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
@@ -64,24 +138,122 @@ def fetch_stock_data_yahoo(symbol: str, period: str = "1y") -> Tuple[pd.DataFram
     except Exception as e:
         return pd.DataFrame(), f"Error fetching data: {str(e)}"
 
-@lru_cache(maxsize=32)
-def fetch_stock_data_cached(symbol: str, period: str = "1y") -> Tuple[bool, str]:
-    """Fetch stock data with caching"""
+def yahoo_price_history(symbol: str, period: str) -> pd.DataFrame:
+    """Yahoo provider: the frame, or an exception carrying Yahoo's error"""
+    df, error = fetch_stock_data_yahoo(symbol, period)
+    if error == NO_PRICE_DATA:
+        raise NoData(error)  # Yahoo answered; the symbol just has no history
+    if error:
+        raise ProviderError(error)
+    return df
+
+@recorded("fmp.history")
+def fmp_price_history(symbol: str, period: str) -> pd.DataFrame:
+    """Financial Modeling Prep provider, adjusted like Yahoo's auto-adjusted history"""
+    days = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}.get(period, 366)
+    start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?from={start}&apikey={FMP_API_KEY}"
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    rows = response.json().get('historical') or []
+    if not rows:
+        raise NoData(NO_PRICE_DATA)
+    raw = pd.DataFrame(rows)
+    raw.index = pd.DatetimeIndex(pd.to_datetime(raw['date']), name='Date').tz_localize("America/New_York")
+    raw = raw.sort_index()
+    # Scale OHLC by each bar's adjustment factor so splits and dividends line up
+    factor = raw['adjClose'] / raw['close']
+    df = raw[['open', 'high', 'low', 'close']].mul(factor, axis=0)
+    df.columns = ['Open', 'High', 'Low', 'Close']
+    df['Volume'] = raw['volume']
+    return df
+
+# Price sources in declared order; routing then follows measured latency and errors
+PRICE_PROVIDERS = ProviderPool("prices", [
+    FunctionProvider("yahoo", yahoo_price_history, accept=lambda df: df is not None and not df.empty),
+] + ([FunctionProvider("fmp", fmp_price_history, accept=lambda df: df is not None and not df.empty)]
+     if configured(FMP_API_KEY, "fmp.history") else []))
+
+@timed("data.fetch_prices")
+def fetch_price_history(symbol: str, period: str = "1y") -> Tuple[pd.DataFrame, str]:
+    """Price history from the fastest healthy provider"""
     try:
-        df, error = fetch_stock_data_yahoo(symbol, period)
+        return PRICE_PROVIDERS.call(symbol, period), None
+    except ProviderError as e:
+        return pd.DataFrame(), str(e)
+
+def shared_prices(symbol: str, period: str, fetch=None) -> Tuple[Optional[CompactOHLCV], Optional[str]]:
+    """(compact history, error) from the cross-worker price tier, fetched once on a miss"""
+    fetch = fetch or fetch_price_history  # Looked up per call so it can be swapped out
+    errors = []
+    
+    def compute():
+        df, error = fetch(symbol, period)
         if error:
+            errors.append(error)  # Failures aren't shared
+            return None
+        return CompactOHLCV.from_frame(df)
+    
+    payload = SHARED.get_or_compute("prices", f"ohlcv:{symbol}:{period}", compute)
+    if payload is None:
+        return None, errors[0] if errors else fetch(symbol, period)[1]
+    return payload, None
+
+@lru_cache(maxsize=PRICE_CACHE_SIZE)
+def fetch_stock_data_cached(symbol: str, period: str = "1y") -> Tuple[bool, Union[CompactOHLCV, str]]:
+    """Fetch stock data with caching (per worker, then shared across workers)"""
+    try:
+        payload, error = shared_prices(symbol, period)
+        if payload is None:
             return False, error
-        return True, df.to_json(date_format='iso')
+        return True, payload
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def prefetch_prices(symbol: str, period: str) -> None:
+    """Warm the shared price tier, bypassing this worker's lru cache so errors aren't cached"""
+    _, error = shared_prices(symbol, period)
+    if error and "rate limit" in error.lower():
+        raise RateLimited(error)
+
+def prefetch_related(ticker: str, period: str) -> None:
+    """Queue peers' prices and fundamentals and the sector ETFs for ``ticker``"""
+    info = FUNDAMENTALS.get(ticker)
+    sector = info.get('sector', 'General')
+    peers = peer_universe(ticker, sector, info.get('competitors', []) or [], limit=8)
+    for peer in peers:
+        PREFETCH.submit(f"prices:{peer}:{period}", lambda p=peer: prefetch_prices(p, period), priority=2)
+    for etf in get_sector_tickers(sector):
+        PREFETCH.submit(f"prices:{etf}:{period}", lambda e=etf: prefetch_prices(e, period), priority=3)
+    for peer in peers:
+        PREFETCH.submit(f"fundamentals:{peer}", lambda p=peer: FUNDAMENTALS.get(p), priority=4)
+
+def schedule_prefetch(ticker: str, period: str) -> None:
+    """Queue what a user usually opens next after viewing ``ticker``"""
+    if period != "5y":
+        PREFETCH.submit(f"prices:{ticker}:5y", lambda: prefetch_prices(ticker, "5y"), priority=0)
+    PREFETCH.submit(f"related:{ticker}:{period}", lambda: prefetch_related(ticker, period), priority=1)
+
+@timed("data.get_stock_data")
 def get_stock_data(symbol: str, period: str = "1y") -> Tuple[pd.DataFrame, str]:
-    """Main function to get stock data"""
+    """Main function to get stock data
+
+    Only the compact history is cached; the float64 frame (~1.8x its size)
+    is rebuilt per call, which takes ~0.3 ms.
+    """
     success, result = fetch_stock_data_cached(symbol, period)
     if success:
-        return pd.read_json(result), None
+        with span("data.decode"):
+            return result.to_frame(), None
     return pd.DataFrame(), result
 
+register_cache("fetch_stock_data_cached", lru_source(fetch_stock_data_cached))
+register_cache("indicators", lambda: (INDICATOR_ENGINE.hits, INDICATOR_ENGINE.misses))
+register_cache("fundamentals", lambda: (FUNDAMENTALS.hits, FUNDAMENTALS.misses))
+register_cache("shared", lambda: (SHARED.hits, SHARED.misses))
+register_cache("memo", lambda: (MEMO.session_hits + MEMO.shared_hits, MEMO.misses))
+
+@recorded("alpha_vantage.ratios")
 def get_alpha_vantage_ratios(ticker: str) -> Dict[str, Optional[float]]:
     """Get ROE and ROA from Alpha Vantage API with proper typing"""
     ratios = {"ROE": None, "ROA": None}
@@ -120,8 +292,7 @@ def safe_float(value: Any, div_by: int = 1) -> Optional[float]:
 def get_sector_peers(ticker: str) -> Tuple[str, str, List[str]]:
     """Dynamically identify sector and peers for any stock"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = FUNDAMENTALS.get(ticker)
         
         sector = info.get('sector', 'General')
         industry = info.get('industry', 'Various')
@@ -133,68 +304,69 @@ def get_sector_peers(ticker: str) -> Tuple[str, str, List[str]]:
         st.warning(f"Couldn't determine sector: {str(e)}")
         return "General", "Various", []
 
-def get_sector_averages(sector: str) -> Dict[str, float]:
-    """Get real-time sector averages from multiple reliable sources"""
-    if sector in SECTOR_AVG_CACHE:
-        return SECTOR_AVG_CACHE[sector]
+@timed("data.sector_averages")
+def get_sector_averages(sector: str, industry: Optional[str] = None) -> Dict[str, float]:
+    """Get sector averages, preferring the precomputed benchmark index over live sources"""
+    # First try: offline benchmark index built by sector_index.py (in-memory lookup)
+    averages = lookup_sector_averages(sector, industry)
+    if averages:
+        return averages
     
-    # First try: Financial Modeling Prep (most comprehensive)
-    if FMP_API_KEY:
-        try:
-            url = f"https://financialmodelingprep.com/api/v4/industry/performance?name={sector}&apikey={FMP_API_KEY}"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data and isinstance(data, list):
-                    averages = {
-                        'P/E Ratio': safe_float(data[0].get('pe')),
-                        'P/B Ratio': safe_float(data[0].get('priceToBook')),
-                        'Debt/Equity': safe_float(data[0].get('debtToEquity')),
-                        'Current Ratio': safe_float(data[0].get('currentRatio')),
-                        'ROE': safe_float(data[0].get('roe')),
-                        'ROA': safe_float(data[0].get('roa'))
-                    }
-                    SECTOR_AVG_CACHE[sector] = averages
-                    return averages
-        except Exception:
-            pass
-
-    # Second try: Alpha Vantage sector performance
-    if ALPHA_VANTAGE_API_KEY:
-        try:
-            url = f"https://www.alphavantage.co/query?function=SECTOR&apikey={ALPHA_VANTAGE_API_KEY}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            sector_data = data.get('Rank E: Profitability', {}).get(sector, {})
-            if sector_data:
-                averages = {
-                    'P/E Ratio': safe_float(sector_data.get('PE Ratio')),
-                    'ROE': safe_float(sector_data.get('ROE')),
-                    'ROA': safe_float(sector_data.get('ROA'))
-                }
-                SECTOR_AVG_CACHE[sector] = averages
-                return averages
-        except Exception:
-            pass
-
-    # Third try: Yahoo Finance industry averages
+    averages = SHARED.get("sector_averages", sector)
+    if averages:
+        return averages
+    
+    # Second try: live providers (FMP, Alpha Vantage), hedged and routed by latency
     try:
-        sector_tickers = get_sector_tickers(sector)
-        if sector_tickers:
-            yf_sector = yf.Tickers(sector_tickers)
-            sector_pe = yf_sector.stats('trailingPE').median()
-            sector_pb = yf_sector.stats('priceToBook').median()
-            averages = {
-                'P/E Ratio': sector_pe,
-                'P/B Ratio': sector_pb
-            }
-            SECTOR_AVG_CACHE[sector] = averages
-            return averages
-    except Exception:
+        averages = SECTOR_PROVIDERS.call(sector)
+        SHARED.set("sector_averages", sector, averages)
+        return averages
+    except ProviderError:
         pass
 
     # Final fallback: Cached sector averages
     return get_cached_sector_averages(sector)
+
+@recorded("fmp.sector")
+def fmp_sector_averages(sector: str) -> Dict[str, float]:
+    """Financial Modeling Prep industry performance (most comprehensive)"""
+    url = f"https://financialmodelingprep.com/api/v4/industry/performance?name={sector}&apikey={FMP_API_KEY}"
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if not data or not isinstance(data, list):
+        raise NoData(f"No FMP data for {sector}")
+    return {
+        'P/E Ratio': safe_float(data[0].get('pe')),
+        'P/B Ratio': safe_float(data[0].get('priceToBook')),
+        'Debt/Equity': safe_float(data[0].get('debtToEquity')),
+        'Current Ratio': safe_float(data[0].get('currentRatio')),
+        'ROE': safe_float(data[0].get('roe')),
+        'ROA': safe_float(data[0].get('roa'))
+    }
+
+@recorded("alpha_vantage.sector")
+def alpha_vantage_sector_averages(sector: str) -> Dict[str, float]:
+    """Alpha Vantage sector performance"""
+    url = f"https://www.alphavantage.co/query?function=SECTOR&apikey={ALPHA_VANTAGE_API_KEY}"
+    response = requests.get(url, timeout=10)
+    data = response.json()
+    sector_data = data.get('Rank E: Profitability', {}).get(sector, {})
+    if not sector_data:
+        raise NoData(f"No Alpha Vantage data for {sector}")
+    return {
+        'P/E Ratio': safe_float(sector_data.get('PE Ratio')),
+        'ROE': safe_float(sector_data.get('ROE')),
+        'ROA': safe_float(sector_data.get('ROA'))
+    }
+
+def _has_values(averages: Optional[Dict[str, float]]) -> bool:
+    return bool(averages) and any(v is not None for v in averages.values())
+
+SECTOR_PROVIDERS = ProviderPool("sector_averages", (
+    ([FunctionProvider("fmp", fmp_sector_averages, accept=_has_values)] if configured(FMP_API_KEY, "fmp.sector") else [])
+    + ([FunctionProvider("alpha_vantage", alpha_vantage_sector_averages, accept=_has_values)]
+       if configured(ALPHA_VANTAGE_API_KEY, "alpha_vantage.sector") else [])))
 def get_sector_tickers(sector: str) -> List[str]:
     """Get representative tickers for a sector"""
     SECTOR_ETFS = {
@@ -234,11 +406,11 @@ def get_cached_sector_averages(sector: str) -> Dict[str, float]:
     
     return DEFAULTS.get(sector, DEFAULTS['General'])
 
+@timed("data.yahoo_ratios")
 def get_yahoo_ratios(ticker: str, fmp_api_key: str = None) -> Dict[str, Any]:  # Added fmp_api_key parameter
-    """Get financial ratios from Yahoo Finance"""
+    """Get financial ratios from Yahoo Finance (served from the local fundamentals cache)"""
     try:
-        yf_ticker = yf.Ticker(ticker)
-        info = yf_ticker.info
+        info = FUNDAMENTALS.get(ticker)
         
         if not info:    
             st.error("No financial data available for this ticker")
@@ -254,18 +426,20 @@ def get_yahoo_ratios(ticker: str, fmp_api_key: str = None) -> Dict[str, Any]:  #
             'returnOnAssets': info.get('returnOnAssets')
         }
         
-        # Add FMP fallback if needed
-        if ratios['returnOnEquity'] is None or ratios['returnOnAssets'] is None:
+        # Add Alpha Vantage fallback if needed
+        if (ratios['returnOnEquity'] is None or ratios['returnOnAssets'] is None) \
+                and configured(ALPHA_VANTAGE_API_KEY, "alpha_vantage.ratios"):
             av_ratios = get_alpha_vantage_ratios(ticker)
             if av_ratios:
-                ratios['returnOnEquity'] = ratios['returnOnEquity'] or av_ratios['returnOnEquity']
-                ratios['returnOnAssets'] = ratios['returnOnAssets'] or av_ratios['returnOnAssets']
+                ratios['returnOnEquity'] = ratios['returnOnEquity'] or av_ratios.get('ROE')
+                ratios['returnOnAssets'] = ratios['returnOnAssets'] or av_ratios.get('ROA')
         
         return {k: float(v) if v is not None else None for k, v in ratios.items()}
     except Exception as e:
         st.error(f"Error fetching ratios: {str(e)}")
         return None
 
+@timed("render.financial_ratios")
 def display_financial_ratios(ratios: Dict[str, Any], ticker: str):
     """Enhanced ratio display with dynamic sector comparison"""
     try:
@@ -275,7 +449,8 @@ def display_financial_ratios(ratios: Dict[str, Any], ticker: str):
             
         # Get sector context
         sector, industry, peers = get_sector_peers(ticker)
-        sector_avgs = get_sector_averages(sector)
+        sector_avgs = get_sector_averages(sector, industry)
+        sector_stats = lookup_benchmarks(sector, industry)
         
         # Prepare display data
         display_data = prepare_display_data(ratios)
@@ -286,7 +461,7 @@ def display_financial_ratios(ratios: Dict[str, Any], ticker: str):
 
         # Create visualization with sector comparison
         create_dynamic_chart(display_data, ticker, sector, sector_avgs)
-        show_metric_analysis(display_data, sector_avgs)
+        show_metric_analysis(display_data, sector_avgs, sector_stats)
     except Exception as e:
         st.error(f"Error displaying ratios: {str(e)}")
 
@@ -347,26 +522,11 @@ def create_dynamic_chart(display_data: Dict[str, float], ticker: str,
         hovermode="x unified",
         height=max(400, len(display_data) * 60)  # Dynamic height
     )
-    st.plotly_chart(fig, use_container_width=True)
-def get_alpha_vantage_ratios(ticker: str) -> Dict[str, Optional[float]]:
-    """Ensures proper decimal conversion from API"""
-    ratios = {"ROE": None, "ROA": None}
-    try:
-        # ... API call code ...
-        
-        # These values are already in percentage form from API (e.g., 15.25 means 15.25%)
-        # So we divide by 100 to convert to decimal (0.1525)
-        if "ReturnOnEquityTTM" in data:
-            ratios["ROE"] = safe_float(data["ReturnOnEquityTTM"], div_by=100)
-        if "ReturnOnAssetsTTM" in data:
-            ratios["ROA"] = safe_float(data["ReturnOnAssetsTTM"], div_by=100)
-            
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-    return ratios
-
-def show_metric_analysis(display_data: Dict[str, float], sector_avgs: Dict[str, float]):
+    plotly_chart(fig, use_container_width=True)
+def show_metric_analysis(display_data: Dict[str, float], sector_avgs: Dict[str, float],
+                         sector_stats: Optional[Dict[str, Dict[str, float]]] = None):
     """Displays detailed ratio analysis with correct percentage handling and enhanced visuals"""
+    sector_stats = sector_stats or {}
     st.subheader("📊 Detailed Ratio Analysis")
     
     # Define ratio categories for proper assessment
@@ -442,6 +602,12 @@ def show_metric_analysis(display_data: Dict[str, float], sector_avgs: Dict[str,
                     )
                     st.info(insight)
                 
+                stats = sector_stats.get(ratio)
+                if stats:
+                    unit = '%' if is_percentage else ''
+                    st.caption(f"Sector range (25th-75th percentile): {stats['p25']:,.2f}{unit} - "
+                               f"{stats['p75']:,.2f}{unit} across {stats['n']} companies")
+                
                 # Add visual gauge
                 show_ratio_gauge(actual_value, sector_avg_actual, ratio)
             else:
@@ -513,7 +679,7 @@ def show_ratio_gauge(value: float, benchmark: float, ratio_name: str):
             }
         }
     ))
-    st.plotly_chart(fig, use_container_width=True, use_container_height=True)
+    plotly_chart(fig, use_container_width=True, use_container_height=True)
 def generate_standalone_insight(ratio: str, value: float) -> str:
     """Insights when no sector benchmark is available"""
     if ratio == 'ROE':
@@ -531,32 +697,35 @@ def generate_standalone_insight(ratio: str, value: float) -> str:
     # Add other ratio insights...
     return "Financial metric analysis"
 
-def calculate_risk_metrics(data: pd.DataFrame) -> Dict[str, Any]:
-    """Calculate market risk metrics from price data."""
+@timed("risk.calculate_risk_metrics")
+def calculate_risk_metrics(data: pd.DataFrame,
+                           benchmark: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Calculate market risk metrics from price data (single-ticker view of risk.compute_risk_metrics)."""
     try:
         if data.empty or 'Close' not in data.columns:
             return {}
         
-        ratios = {}
-        returns = np.log(1 + data['Close'].pct_change()).dropna()
-        
-        if not returns.empty:
-            ratios.update({
-                'volatility': returns.std() * np.sqrt(252),
-                'sharpeRatio': (returns.mean() / returns.std() * np.sqrt(252)) 
-                              if returns.std() != 0 else None,
-            })
+        bench_close = None
+        if benchmark is not None and not benchmark.empty and 'Close' in benchmark.columns:
+            bench_close = benchmark['Close']
         
-        rolling_max = data['Close'].cummax()
-        daily_drawdown = data['Close']/rolling_max - 1
-        ratios['maximumDrawdown'] = daily_drawdown.min()
-        
-        return {k: float(v) if v is not None else None for k, v in ratios.items()}
+        metrics = compute_risk_metrics(data[['Close']], benchmark=bench_close).iloc[0]
+        return {k: float(v) if pd.notna(v) else None for k, v in metrics.items()}
         
     except Exception as e:
         st.error(f"Risk calculation error: {str(e)}")
         return {}
 
+def run_simulation(sim_key: str, data: pd.DataFrame, n_simulations: int, time_horizon: int) -> dict:
+    """Monte Carlo paths, shared across workers under ``sim_key``"""
+    return SHARED.get_or_compute("simulations", sim_key,
+                                 lambda: monte_carlo_simulation(data, n_simulations, time_horizon))
+
+def smoothing_window(days: int) -> int:
+    """Adaptive smoothing window for a simulation horizon"""
+    return max(min(20, days // 10), 2)
+
+@timed("sim.monte_carlo")
 def monte_carlo_simulation(data: pd.DataFrame, n_simulations: int = 1000, days: int = 180) -> dict:
     try:
         # Calculate daily returns
@@ -566,32 +735,21 @@ def monte_carlo_simulation(data: pd.DataFrame, n_simulations: int = 1000, days:
         last_price = data['Close'].iloc[-1]
         
         # Generate random walks
-        raw_simulations = np.zeros((days, n_simulations))
-        raw_simulations[0] = last_price
+        with span("sim.random_walk"):
+            raw_simulations = np.zeros((days, n_simulations))
+            raw_simulations[0] = last_price
         
-        for day in range(1, days):
-            shock = np.random.normal(mu, sigma, n_simulations)
-            raw_simulations[day] = raw_simulations[day-1] * np.exp(shock)
+            for day in range(1, days):
+                shock = np.random.normal(mu, sigma, n_simulations)
+                raw_simulations[day] = raw_simulations[day-1] * np.exp(shock)
         
         # Apply smoothing techniques
-        window_size = min(20, days//10)  # Adaptive window size
-        
-        # Simple Moving Average (fill NaN after smoothing)
-        ma_simulations = np.zeros_like(raw_simulations)
-        for i in range(n_simulations):
-            ma_simulations[:, i] = pd.Series(raw_simulations[:, i]).rolling(window=window_size).mean().values
-        ma_simulations = pd.DataFrame(ma_simulations).fillna(method='ffill').values  # Fill NaN AFTER smoothing
+        with span("sim.smoothing"):
+            window_size = smoothing_window(days)
         
-        # Weighted Moving Average (fill NaN after smoothing)
-        wma_simulations = np.zeros_like(raw_simulations)
-        weights = np.arange(1, window_size+1)
-        weights = weights / weights.sum()
-        
-        for i in range(n_simulations):
-            series = pd.Series(raw_simulations[:, i])
-            wma_simulations[:, i] = series.rolling(window=window_size)\
-                                         .apply(lambda x: np.sum(weights * x))
-        wma_simulations = pd.DataFrame(wma_simulations).fillna(method='ffill').values  # Fill NaN AFTER smoothing
+            # Trailing windows over every path at once; the first window_size-1 days stay NaN
+            ma_simulations = moving_average(raw_simulations, window_size)
+            wma_simulations = weighted_moving_average(raw_simulations, window_size)
         
         return {
             'raw': raw_simulations,
@@ -601,6 +759,7 @@ def monte_carlo_simulation(data: pd.DataFrame, n_simulations: int = 1000, days:
         
     except Exception as e:
         raise Exception(f"Enhanced Monte Carlo simulation failed: {str(e)}")
+@timed("model.train.holt_winters")
 def train_holt_winters(data: pd.DataFrame, seasonal_periods: int) -> Tuple[object, str]:
     """Train Holt-Winters forecasting model"""
     try:
@@ -616,6 +775,7 @@ def train_holt_winters(data: pd.DataFrame, seasonal_periods: int) -> Tuple[objec
     except Exception as e:
         return None, f"Holt-Winters training failed: {str(e)}"
 
+@timed("model.predict.holt_winters")
 def predict_holt_winters(model, periods: int = 30) -> pd.Series:
     """Generate predictions using Holt-Winters model"""
     try:
@@ -639,8 +799,13 @@ def create_lagged_features(data: pd.DataFrame, lags: int = 34) -> pd.DataFrame:
     
     return df
 
-def train_random_forest(data: pd.DataFrame) -> object:
-    """Train Random Forest model with exactly 34 features"""
+@timed("model.train.random_forest")
+def train_random_forest(data: pd.DataFrame, params: Optional[dict] = None) -> object:
+    """Train Random Forest model with exactly 34 features
+    
+    params: optional estimator parameters (e.g. from tuning.tune) that
+    override the defaults below.
+    """
     try:
         from sklearn.ensemble import RandomForestRegressor
         
@@ -660,12 +825,13 @@ def train_random_forest(data: pd.DataFrame) -> object:
             raise ValueError(f"Expected 34 features, got {X.shape[1]}")
         
         # Train model
-        model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            n_jobs=-1
-        )
+        model = RandomForestRegressor(**{
+            'n_estimators': 100,
+            'max_depth': 10,
+            'random_state': 42,
+            'n_jobs': -1,
+            **(params or {})
+        })
         model.fit(X, y)
         
         return model
@@ -673,6 +839,7 @@ def train_random_forest(data: pd.DataFrame) -> object:
     except Exception as e:
         raise Exception(f"Random Forest training failed: {str(e)}")
 
+@timed("model.predict.random_forest")
 def predict_random_forest(model, data: pd.DataFrame, periods: int = 30) -> np.ndarray:
     """Generate predictions using the trained Random Forest model"""
     try:
@@ -707,6 +874,7 @@ def predict_random_forest(model, data: pd.DataFrame, periods: int = 30) -> np.nd
         
     except Exception as e:
         raise Exception(f"Random Forest prediction failed: {str(e)}")
+@timed("model.train.lstm")
 def train_lstm_model(data: pd.DataFrame) -> Tuple[object, object]:
     """Basic LSTM model training"""
     try:
@@ -740,6 +908,7 @@ def train_lstm_model(data: pd.DataFrame) -> Tuple[object, object]:
     except Exception as e:
         raise Exception(f"LSTM training failed: {str(e)}")
 
+@timed("model.predict.lstm")
 def predict_lstm(model, scaler, data: pd.DataFrame, periods: int = 30) -> np.ndarray:
     """Generate LSTM predictions"""
     try:
@@ -759,6 +928,7 @@ def predict_lstm(model, scaler, data: pd.DataFrame, periods: int = 30) -> np.nda
         raise Exception(f"LSTM prediction failed: {str(e)}")
 
 
+@timed("model.train.arima")
 def train_arima_model(data: pd.DataFrame) -> object:
     """Train ARIMA model"""
     try:
@@ -769,6 +939,7 @@ def train_arima_model(data: pd.DataFrame) -> object:
     except Exception as e:
         raise Exception(f"ARIMA training failed: {str(e)}")
 
+@timed("model.predict.arima")
 def predict_arima(model, periods: int = 30) -> pd.Series:
     """Generate ARIMA predictions"""
     try:
@@ -777,27 +948,33 @@ def predict_arima(model, periods: int = 30) -> pd.Series:
     except Exception as e:
         raise Exception(f"ARIMA prediction failed: {str(e)}")
 
-def train_xgboost_model(data: pd.DataFrame) -> object:
-    """Train XGBoost model"""
+def create_xgboost_features(data: pd.DataFrame) -> pd.DataFrame:
+    """Price columns plus 30 lagged closes, the layout the XGBoost model trains on"""
+    df = data.copy()
+    for i in range(1, 31):
+        df[f'lag_{i}'] = df['Close'].shift(i)
+    df.dropna(inplace=True)
+    return df
+
+@timed("model.train.xgboost")
+def train_xgboost_model(data: pd.DataFrame, params: Optional[dict] = None) -> object:
+    """Train XGBoost model; params override the default estimator settings"""
     try:
         from xgboost import XGBRegressor
-        from sklearn.preprocessing import MinMaxScaler
         
         # Create features (using lagged values)
-        df = data.copy()
-        for i in range(1, 31):
-            df[f'lag_{i}'] = df['Close'].shift(i)
-        df.dropna(inplace=True)
+        df = create_xgboost_features(data)
         
         X = df.drop(columns=['Close'])
         y = df['Close']
         
-        model = XGBRegressor(n_estimators=100)
+        model = XGBRegressor(**{'n_estimators': 100, **(params or {})})
         model.fit(X, y)
         return model
     except Exception as e:
         raise Exception(f"XGBoost training failed: {str(e)}")
 
+@timed("model.predict.xgboost")
 def predict_xgboost(model, data: pd.DataFrame, periods: int = 30) -> np.ndarray:
     """Generate XGBoost predictions"""
     try:
@@ -815,104 +992,325 @@ def predict_xgboost(model, data: pd.DataFrame, periods: int = 30) -> np.ndarray:
     except Exception as e:
         raise Exception(f"XGBoost prediction failed: {str(e)}")
 
+@timed("model.train.prophet")
+def train_prophet_model(data: pd.DataFrame, ticker: str) -> Tuple[object, str]:
+    """Train Prophet model, reusing a cached fit for the same ticker and data"""
+    try:
+        return prophet_backend.fit_prophet(data, ticker)
+    except Exception as e:
+        raise Exception(f"Prophet training failed: {str(e)}")
+
+@timed("model.predict.prophet")
+def predict_prophet(model, periods: int = 30) -> pd.Series:
+    """Generate Prophet predictions"""
+    try:
+        return prophet_backend.forecast(model, periods)['yhat']
+    except Exception as e:
+        raise Exception(f"Prophet prediction failed: {str(e)}")
+
+
+def train_cached(model_type: str, ticker: str, data: pd.DataFrame, train, *args):
+    """Fitted model from the shared cache, trained once across workers on a miss"""
+    key = f"{model_type}:{ticker}:{series_digest(data['Close'])}:{args!r}"
+    failures = []
+    
+    def compute():
+        result = train(data, *args)
+        if isinstance(result, tuple) and result[0] is None:
+            failures.append(result)  # (None, error) is reported, not cached
+            return None
+        return result
+    
+    result = SHARED.get_or_compute("models", key, compute)
+    return failures[0] if failures else result
+
+@timed("model.tune")
+def tune_model(model_type: str, ticker: str, data: pd.DataFrame):
+    """Hyperparameter search on walk-forward folds; the winner is cached per ticker"""
+    try:
+        if model_type == "Random Forest":
+            df = create_lagged_features(data, lags=34)
+        else:
+            df = create_xgboost_features(data)
+        if len(df) < 100:
+            raise ValueError(f"Need at least 100 rows after lagging, got {len(df)}")
+        return tune(model_type, ticker, df.drop(columns=['Close']), df['Close'])
+    except Exception as e:
+        raise Exception(f"{model_type} tuning failed: {str(e)}")
+
+def with_intervals(ticker: str, model_type: str, data: pd.DataFrame, predictions,
+                   fit_predict, level: float = 0.9) -> Forecast:
+    """Attach conformal bands from the model's stored residuals (see conformal.py)
+    
+    fit_predict(history, horizon) refits on a shorter history to score a
+    holdout of the last ``horizon`` bars. That is a full training run, so it
+    goes on the background queue, at most once every CALIBRATE_EVERY bars;
+    the bands it adds show from the next forecast on.
+    """
+    horizon = len(predictions)
+    RESIDUALS.score(ticker, model_type, data['Close'])
+    if RESIDUALS.needs_calibration(ticker, model_type, data, horizon):
+        def calibrate():
+            RESIDUALS.calibrate(ticker, model_type, data, fit_predict, horizon)
+        if PREFETCH.enabled:
+            PREFETCH.submit(f"calibrate:{ticker}:{model_type}:{data.index[-1]}", calibrate, priority=1)
+        else:
+            calibrate()
+    RESIDUALS.record(ticker, model_type, data.index[-1], np.asarray(predictions))
+    return RESIDUALS.forecast(ticker, model_type, predictions, data['Close'], level)
+
+ROLLING_STATS_PER_SESSION = 16
+
+def get_rolling_stats(ticker: str, close: pd.Series) -> RollingStats:
+    """Rolling stats kept in session state and advanced only over newly appended bars"""
+    store = st.session_state.setdefault("rolling_stats", {})
+    key = (ticker, close.index[0] if len(close) else None)
+    stats = update_rolling_stats(store.pop(key, None), close)
+    store[key] = stats  # Re-inserted last, so the oldest entry is evicted first
+    while len(store) > ROLLING_STATS_PER_SESSION:
+        store.pop(next(iter(store)))
+    return stats
 
     
-def display_stock_analysis(stock_data, ticker):
+@memoize("fig.price_history")
+def price_history_figure(ticker: str, stock_data: pd.DataFrame, trend: str) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(line_trace(stock_data.index, stock_data['Close'], name='Close Price'))
+    if trend != "None" and len(stock_data) > 5:
+        width = {"EMA": 20, "Savitzky-Golay": 21, "Wavelet": 3}[trend]
+        fig.add_trace(line_trace(stock_data.index, smooth(stock_data['Close'], trend, width),
+                                 name=f'{trend} trend', line=dict(width=2)))
+    fig.update_layout(title=f"{ticker} Price History", xaxis_title="Date", yaxis_title="Price")
+    return fig
+
+@memoize("fig.volume")
+def volume_figure(stock_data: pd.DataFrame) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(bar_trace(stock_data.index, stock_data['Volume'], name='Volume'))
+    fig.update_layout(title="Trading Volume", xaxis_title="Date", yaxis_title="Volume")
+    return fig
+
+OVERLAY_INDICATORS = ("SMA", "EMA", "Bollinger Bands", "VWAP")
+
+@memoize("fig.indicator_overlays")
+def overlay_figure(ticker: str, period: str, stock_data: pd.DataFrame,
+                   overlays: Tuple[str, ...]) -> go.Figure:
+    """Close price with the selected overlay indicators (cached per selection)"""
+    dates = stock_data.index
+    fig = go.Figure()
+    fig.add_trace(line_trace(dates, stock_data['Close'], name='Close Price'))
+    # Indicator series are memoized per (ticker, period, indicator, params) in the shared engine
+    if "SMA" in overlays:
+        sma = INDICATOR_ENGINE.compute(ticker, period, stock_data, "SMA")
+        fig.add_trace(line_trace(dates, sma["SMA"], name='20-day SMA'))
+    if "EMA" in overlays:
+        ema = INDICATOR_ENGINE.compute(ticker, period, stock_data, "EMA")
+        fig.add_trace(line_trace(dates, ema["EMA"], name='20-day EMA'))
+    if "Bollinger Bands" in overlays:
+        bands = INDICATOR_ENGINE.compute(ticker, period, stock_data, "Bollinger Bands")
+        fig.add_traces(band_traces(dates, bands["Upper"], bands["Lower"], name='Band'))
+    if "VWAP" in overlays:
+        vwap = INDICATOR_ENGINE.compute(ticker, period, stock_data, "VWAP")
+        fig.add_trace(line_trace(dates, vwap["VWAP"], name='VWAP', line=dict(dash='dash')))
+    fig.update_layout(title="Technical Indicators")
+    return fig
+
+@memoize("fig.indicator_panel")
+def indicator_panel_figure(ticker: str, period: str, stock_data: pd.DataFrame, name: str) -> go.Figure:
+    """Stand-alone panel for an oscillator-style indicator"""
+    result = INDICATOR_ENGINE.compute(ticker, period, stock_data, name)
+    dates = stock_data.index
+    fig = go.Figure()
+    if name == "RSI":
+        fig.add_trace(line_trace(dates, result["RSI"], name='RSI'))
+        fig.update_layout(title="Relative Strength Index (RSI)", yaxis_range=[0,100])
+    elif name == "MACD":
+        fig.add_trace(bar_trace(dates, result["Histogram"], name='Histogram',
+                                marker_color='lightgray'))
+        fig.add_trace(line_trace(dates, result["MACD"], name='MACD'))
+        fig.add_trace(line_trace(dates, result["Signal"], name='Signal'))
+        fig.update_layout(title="MACD (12, 26, 9)")
+    elif name == "Stochastic":
+        fig.add_trace(line_trace(dates, result["%K"], name='%K'))
+        fig.add_trace(line_trace(dates, result["%D"], name='%D'))
+        fig.update_layout(title="Stochastic Oscillator (14, 3)", yaxis_range=[0,100])
+    else:
+        titles = {"ATR": "Average True Range (14)", "OBV": "On-Balance Volume"}
+        fig.add_trace(line_trace(dates, result[name], name=name,
+                                 method='minmax' if name == 'OBV' else 'lttb'))
+        fig.update_layout(title=titles.get(name, name))
+    return fig
+
+@timed("render.stock_analysis")
+def display_stock_analysis(stock_data, ticker, period: str = ""):
+    # Figures are memoized on their inputs, so a widget change rebuilds only what it affects
     col1, col2 = st.columns(2)
     
     with col1:
         # Price History
-        fig1 = go.Figure()
-        fig1.add_trace(go.Scatter(x=stock_data.index, y=stock_data['Close'], name='Close Price'))
-        fig1.update_layout(title=f"{ticker} Price History", xaxis_title="Date", yaxis_title="Price")
-        st.plotly_chart(fig1, use_container_width=True)
+        trend = st.selectbox("Trend line", ["None", "EMA", "Savitzky-Golay", "Wavelet"])
+        plotly_chart(price_history_figure(ticker, stock_data, trend), use_container_width=True)
       
     with col2:
         # Volume Analysis
-        fig2 = go.Figure()
-        fig2.add_trace(go.Bar(x=stock_data.index, y=stock_data['Volume'], name='Volume'))
-        fig2.update_layout(title="Trading Volume", xaxis_title="Date", yaxis_title="Volume")
-        st.plotly_chart(fig2, use_container_width=True)
+        plotly_chart(volume_figure(stock_data), use_container_width=True)
     
     # Technical Indicators
     st.subheader("Technical Indicators")
     indicators = st.multiselect("Select indicators", 
-                               ["SMA", "EMA", "RSI", "MACD", "Bollinger Bands"],
+                               ["SMA", "EMA", "RSI", "MACD", "Bollinger Bands",
+                                "ATR", "OBV", "VWAP", "Stochastic"],
                                default=["SMA", "RSI"])
     
     if indicators:
-        fig3 = go.Figure()
-        fig3.add_trace(go.Scatter(x=stock_data.index, y=stock_data['Close'], name='Close Price'))
-        
-        if "SMA" in indicators:
-            sma = stock_data['Close'].rolling(20).mean()
-            fig3.add_trace(go.Scatter(x=stock_data.index, y=sma, name='20-day SMA'))
-        
-        if "RSI" in indicators:
-            delta = stock_data['Close'].diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            avg_gain = gain.rolling(14).mean()
-            avg_loss = loss.rolling(14).mean()
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            fig_rsi = go.Figure()
-            fig_rsi.add_trace(go.Scatter(x=stock_data.index, y=rsi, name='RSI'))
-            fig_rsi.update_layout(title="Relative Strength Index (RSI)", yaxis_range=[0,100])
-            st.plotly_chart(fig_rsi, use_container_width=True)
+        overlays = tuple(name for name in OVERLAY_INDICATORS if name in indicators)
+        plotly_chart(overlay_figure(ticker, period, stock_data, overlays), use_container_width=True)
         
-        fig3.update_layout(title="Technical Indicators")
-        st.plotly_chart(fig3, use_container_width=True)
+        for name in ("RSI", "MACD", "Stochastic", "ATR", "OBV"):
+            if name in indicators:
+                plotly_chart(indicator_panel_figure(ticker, period, stock_data, name),
+                             use_container_width=True)
+    
+    with st.expander("Strategy Backtest"):
+        display_backtest(stock_data, ticker)
+    
+    # News sentiment from local headline files (NEWS_DIR/<TICKER>.csv|jsonl)
+    if headline_files(ticker):
+        st.subheader("News Sentiment")
+        backends = ["TextBlob (fast)"]
+        if transformer_available():
+            backends.append("Transformer (accurate)")
+        backend_choice = st.radio("Sentiment model", backends, horizontal=True)
+        backend = "transformer" if backend_choice.startswith("Transformer") else "textblob"
+        try:
+            with st.spinner("Scoring headlines..."):
+                daily = ticker_sentiment(ticker, backend)
+            if not daily.empty:
+                start = pd.Timestamp(stock_data.index[0])
+                start = (start.tz_localize(None) if start.tzinfo else start).normalize()
+                daily = daily[daily.index >= start]
+                fig_sent = go.Figure()
+                fig_sent.add_trace(go.Bar(
+                    x=daily.index,
+                    y=daily['sentiment'],
+                    marker_color=np.where(daily['sentiment'] >= 0, '#2ca02c', '#d62728'),
+                    customdata=daily['headline_count'],
+                    hovertemplate="%{x|%Y-%m-%d}: %{y:.2f} (%{customdata} headlines)<extra></extra>",
+                    name='Daily sentiment'
+                ))
+                fig_sent.update_layout(title="Daily Headline Sentiment", yaxis_range=[-1, 1])
+                plotly_chart(fig_sent, use_container_width=True)
+        except Exception as e:
+            st.warning(f"Couldn't score headlines: {str(e)}")
 
 
-def display_monte_carlo(simulations):
+def display_backtest(stock_data: pd.DataFrame, ticker: str):
+    """Every parameter combination of an indicator rule, ranked, with the best one charted"""
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        strategy = st.selectbox("Rule", list(BACKTEST_GRIDS))
+    with c2:
+        cost_bps = st.number_input("Cost per trade (bps)", 0.0, 100.0, 10.0, step=1.0)
+    with c3:
+        allow_short = st.checkbox("Allow shorts")
+    st.caption("Grid: " + ", ".join(f"{name} {values}" for name, values in BACKTEST_GRIDS[strategy].items()))
+    
+    close = stock_data['Close'].rename(ticker)
+    try:
+        results = MEMO.call("backtest.grid", run_backtest, close, strategy,
+                            cost_bps=cost_bps, allow_short=allow_short)
+    except Exception as e:
+        st.error(f"Backtest failed: {str(e)}")
+        return
+    ranked = results.sort_values('sharpeRatio', ascending=False).reset_index()
+    st.dataframe(ranked.drop(columns='Ticker')[list(BACKTEST_GRIDS[strategy]) + [
+        'sharpeRatio', 'annualReturn', 'totalReturn', 'maximumDrawdown', 'trades', 'exposure']].head(10),
+        use_container_width=True, hide_index=True)
+    
+    best = {name: ranked.loc[0, name] for name in BACKTEST_GRIDS[strategy]}
+    equity = backtest_equity(close, strategy, best, cost_bps, allow_short)
+    fig = go.Figure()
+    for column in ('Strategy', 'Buy & Hold'):
+        fig.add_trace(line_trace(equity.index, equity[column], name=column))
+    label = ", ".join(f"{name}={value:g}" for name, value in best.items())
+    fig.update_layout(title=f"Best {strategy} ({label}) vs Buy & Hold", yaxis_title="Growth of $1")
+    plotly_chart(fig, use_container_width=True)
+
+
+@timed("render.monte_carlo")
+def display_monte_carlo(simulations, sim_key: Optional[str] = None):
     """Enhanced display with smoothing options"""
     st.subheader("Simulation Smoothing Options")
     smooth_type = st.radio("Select smoothing type", 
-                          ["Raw", "Moving Average", "Weighted MA"],
+                          ["Raw"] + list(SMOOTHING_METHODS),
                           horizontal=True)
     
+    def cached(name, func):
+        # Path matrices are too large to fingerprint on every rerun; sim_key stands in for them.
+        # Draws are per session, so they stay out of the process-wide tier
+        if sim_key is None:
+            return func(None, smooth_type)
+        return MEMO.call(name, func, sim_key, smooth_type, shared=False)
+    
+    def smoothed(_sim_key, method):
+        # One vectorized pass over the whole path matrix
+        window = smoothing_window(simulations['raw'].shape[0])
+        width = {"EMA": window, "Savitzky-Golay": 2 * window + 1, "Wavelet": 3}[method]
+        with span("sim.smoothing"):
+            return smooth(simulations['raw'], method, width)
+    
     # Select which simulations to show
+    variants = dict(simulations)
     if smooth_type == "Moving Average":
         data = simulations['ma']
     elif smooth_type == "Weighted MA":
         data = simulations['wma']
+    elif smooth_type in SMOOTHING_METHODS:
+        data = cached("sim.smoothed", smoothed)
+        variants[smooth_type] = data
     else:
         data = simulations['raw']
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Simulation Paths
+    def paths_figure(_sim_key, label):
+        # Simulation paths as quantile bands plus a handful of sample paths
         fig1 = go.Figure()
-        for i in range(min(20, data.shape[1])):
-            fig1.add_trace(go.Scatter(
-                x=np.arange(data.shape[0]),
-                y=data[:, i],
+        fig1.add_traces(fan_traces(data))
+        for i in range(min(5, data.shape[1])):
+            fig1.add_trace(line_trace(
+                np.arange(data.shape[0]),
+                data[:, i],
                 mode='lines',
                 line=dict(width=1),
+                opacity=0.5,
                 showlegend=False
             ))
-        fig1.update_layout(title=f"Monte Carlo Simulation Paths ({smooth_type})", 
+        fig1.update_layout(title=f"Monte Carlo Simulation Paths ({label})", 
                          xaxis_title="Days", 
                          yaxis_title="Price")
-        st.plotly_chart(fig1, use_container_width=True)
+        return fig1
     
-    with col2:
+    def terminal_figure(_sim_key, label):
         # Terminal Distribution
         terminal_prices = data[-1, :]
         fig2 = go.Figure()
-        fig2.add_trace(go.Histogram(x=terminal_prices, name="Outcomes"))
-        fig2.update_layout(title=f"Terminal Price Distribution ({smooth_type})",
+        fig2.add_trace(histogram_trace(terminal_prices, name="Outcomes"))
+        fig2.update_layout(title=f"Terminal Price Distribution ({label})",
                           xaxis_title="Price",
-                          yaxis_title="Frequency")
-        st.plotly_chart(fig2, use_container_width=True)
+                          yaxis_title="Frequency",
+                          bargap=0)
+        return fig2
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        plotly_chart(cached("fig.mc_paths", paths_figure), use_container_width=True)
+    with col2:
+        plotly_chart(cached("fig.mc_terminal", terminal_figure), use_container_width=True)
     
     # Risk Metrics Comparison
     st.subheader("Risk Metrics Comparison")
     
     metrics = []
-    for name, sim_data in simulations.items():
+    for name, sim_data in variants.items():
         tp = sim_data[-1, :]
         metrics.append({
             'Type': name.upper(),
@@ -926,136 +1324,259 @@ def display_monte_carlo(simulations):
 
 
 
-def display_financial_ratios(ratios: Dict[str, Any], ticker: str):
-    """
-    Displays financial ratios from FMP API data
-    Args:
-        ratios: Dictionary from FMP's /v3/ratios endpoint
-        ticker: Stock ticker symbol for display purposes
-    """
-    try:
-        if not ratios:
-            st.error("No ratio data available")
-            return
-        if 'go' not in globals():
-            raise ImportError("Plotly graph_objects not imported properly")
-            
-        # Create the figure safely
-        fig = go.Figure()  # This will now work
-
-        # FMP field to display name mapping
-        ratio_map = {
-            'priceEarningsRatio': 'P/E Ratio',
-            'priceToBookRatio': 'P/B Ratio',
-            'debtEquityRatio': 'Debt/Equity',
-            'currentRatio': 'Current Ratio',
-            'returnOnEquity': 'ROE',
-            'returnOnAssets': 'ROA'
-        }
+def display_screener():
+    """Cross-sectional screen over the fundamentals snapshot of the whole universe"""
+    st.header("🔎 Fundamentals Screener")
+    table = get_screener()
+    if table is None:
+        st.info("No fundamentals snapshot found. Build it with `python sector_index.py`.")
+        return
+    
+    st.caption(f"{len(table)} companies in the snapshot")
+    sectors = st.multiselect("Sectors", table.sectors())
+    metrics = st.multiselect("Filter on", list(table.values),
+                             default=["P/E Ratio", "ROE"])
+    
+    conditions = {
+        "Range": "range",
+        "Percentile range": "percentile",
+        "Below sector median": "below_median",
+        "Above sector median": "above_median",
+    }
+    criteria = []
+    for metric in metrics:
+        c1, c2, c3 = st.columns([1.2, 1, 1])
+        with c1:
+            condition = st.selectbox(metric, list(conditions), key=f"screen_{metric}")
+        kind = conditions[condition]
+        low = high = None
+        if kind == "range":
+            low_default = table.percentile_value(metric, 0)
+            high_default = table.percentile_value(metric, 100)
+            with c2:
+                low = st.number_input("Min", value=low_default, key=f"screen_{metric}_min")
+            with c3:
+                high = st.number_input("Max", value=high_default, key=f"screen_{metric}_max")
+        elif kind == "percentile":
+            with c2:
+                low, high = st.slider("Percentile", 0, 100, (0, 100), key=f"screen_{metric}_pct")
+        criteria.append(Criterion(metric, kind, low, high))
+    
+    results, elapsed_ms = timed_query(table, criteria, sectors)
+    st.caption(f"{len(results)} matches in {elapsed_ms:.2f} ms")
+    st.dataframe(results, use_container_width=True, hide_index=True)
 
-        # Mock sector averages (replace with actual FMP sector data)
-        sector_avg = {
-            'priceEarningsRatio': 15.2,
-            'priceToBookRatio': 2.8,
-            'debtEquityRatio': 0.85,
-            'currentRatio': 1.5,
-            'returnOnEquity': 0.15,
-            'returnOnAssets': 0.075
-        }
 
-        # Prepare display data
-        display_data = {}
-        for api_key, display_name in ratio_map.items():
-            if api_key in ratios and ratios[api_key] is not None:
-                # Convert decimals to percentages for ROE/ROA
-                if display_name in ['ROE', 'ROA']:
-                    display_data[display_name] = f"{ratios[api_key] * 100:.2f}%"
-                else:
-                    display_data[display_name] = f"{ratios[api_key]:.2f}"
+def get_price_matrix(tickers: List[str], period: str) -> pd.DataFrame:
+    """Dates x tickers close matrix; tickers without data are reported and left out"""
+    frames, missing = {}, []
+    for symbol in tickers:
+        data, _ = get_stock_data(symbol, period)
+        if data.empty:
+            missing.append(symbol)
+        else:
+            frames[symbol] = data
+    if missing:
+        st.caption(f"No data for: {', '.join(missing)}")
+    return build_price_matrix(frames)
 
-        if not display_data:
-            st.error("No valid ratio data available for display")
-            return
 
-        # Create visualization
-        st.subheader(f"Financial Ratios for {ticker}")
-        
-        # Bar chart
-        fig = go.Figure()
-        
-        # Add company bars
-        fig.add_trace(go.Bar(
-            x=list(display_data.keys()),
-            y=[float(v.strip('%')) if '%' in v else float(v) for v in display_data.values()],
-            name=ticker,
-            text=list(display_data.values()),
-            textposition='auto'
-        ))
-        
-        # Add sector average bars (only for available metrics)
-        sector_x = []
-        sector_y = []
-        for display_name in display_data.keys():
-            api_key = next(k for k, v in ratio_map.items() if v == display_name)
-            if api_key in sector_avg:
-                sector_x.append(display_name)
-                if display_name in ['ROE', 'ROA']:
-                    sector_y.append(sector_avg[api_key] * 1)
-                else:
-                    sector_y.append(sector_avg[api_key])
-        
-        fig.add_trace(go.Bar(
-            x=sector_x,
-            y=sector_y,
-            name='Sector Average',
-            text=[f"{y:.1f}{'%' if x in ['ROE', 'ROA'] else ''}" for x, y in zip(sector_x, sector_y)],
-            textposition='auto'
-        ))
-        
-        fig.update_layout(
-            barmode='group',
-            title=f"{ticker} vs Sector Averages",
-            yaxis_title="Value"
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Metric analysis
-        st.subheader("Metric Analysis")
-        
-        cols = st.columns(2)
-        with cols[0]:
-            if 'P/E Ratio' in display_data:
-                pe = float(display_data['P/E Ratio'])
-                st.metric("P/E Ratio", 
-                         display_data['P/E Ratio'],
-                         f"{'High' if pe > 20 else 'Normal' if pe > 10 else 'Low'} vs market")
-            
-            if 'Current Ratio' in display_data:
-                cr = float(display_data['Current Ratio'])
-                st.metric("Current Ratio", 
-                         display_data['Current Ratio'],
-                         "Strong" if cr > 2 else "Adequate" if cr > 1 else "Weak")
-        
-        with cols[1]:
-            if 'Debt/Equity' in display_data:
-                de = float(display_data['Debt/Equity'])
-                st.metric("Debt/Equity", 
-                         display_data['Debt/Equity'],
-                         "High" if de > 1 else "Moderate" if de > 0.5 else "Low")
-            
-            if 'ROE' in display_data:
-                roe = float(display_data['ROE'].strip('%'))
-                st.metric("Return on Equity", 
-                         display_data['ROE'],
-                         "Strong" if roe > 15 else "Average" if roe > 8 else "Weak")
+def peer_universe(ticker: str, sector: str, peers: List[str], limit: int = 15) -> List[str]:
+    """Listed peers, or same-sector names from the fundamentals snapshot when there are none"""
+    if not peers:
+        table = get_screener()
+        if table is not None:
+            same_sector = table.tickers[table.groups['sector'] == sector]
+            peers = [str(t) for t in same_sector if str(t).upper() != ticker]
+    return [p.upper() for p in peers if p.upper() != ticker][:limit]
 
-    except Exception as e:
-        st.error(f"Error displaying ratios: {str(e)}")
+
+def display_peer_correlation(ticker: str, period: str):
+    """Rolling peer correlation, clustered, from the incremental covariance engine"""
+    sector, _, peers = get_sector_peers(ticker)
+    default = ", ".join(peer_universe(ticker, sector, peers))
+    c1, c2, c3 = st.columns([3, 1, 1])
+    with c1:
+        chosen = st.text_input("Compare with", default, help="Comma-separated tickers")
+    with c2:
+        window = st.selectbox("Window (days)", [21, 63, 126, 252], index=1)
+    with c3:
+        shrink = st.checkbox("Ledoit-Wolf shrinkage",
+                             help="Shrink toward a constant-variance target; steadier with many tickers and short windows")
+    tickers = [ticker] + [t.strip().upper() for t in chosen.split(",") if t.strip() and t.strip().upper() != ticker]
+    if len(tickers) < 2:
+        st.info("Add peer tickers to compare against.")
+        return
+    
+    with st.spinner("Loading peer prices..."):
+        prices = get_price_matrix(tickers, period)
+    if prices.shape[1] < 2 or len(prices) <= 2:
+        st.warning("Not enough overlapping price history")
+        return
+    
+    corr, shrinkage = window_correlation(prices, window, shrink)
+    if shrink:
+        st.caption(f"Shrinkage intensity: {shrinkage:.2f}")
+    order, clusters = cluster_order(corr)
+    corr = corr.loc[order, order]
+    
+    fig = go.Figure(go.Heatmap(z=corr.to_numpy(), x=order, y=order, zmin=-1, zmax=1,
+                               colorscale='RdBu', reversescale=True,
+                               hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>"))
+    fig.update_layout(title=f"{window}-Day Return Correlation (clustered)", height=500,
+                      yaxis_autorange='reversed')
+    plotly_chart(fig, use_container_width=True)
+    
+    if ticker in corr.index:
+        with_ticker = corr[ticker].drop(ticker).sort_values(ascending=False)
+        table = pd.DataFrame({'Ticker': with_ticker.index,
+                              f'Correlation with {ticker}': with_ticker.round(2).values,
+                              'Cluster': [clusters.get(t) for t in with_ticker.index]})
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+
+def display_portfolio(ticker: str, period: str):
+    """Efficient frontier plus max-Sharpe, min-variance and risk-parity allocations"""
+    st.header("💼 Portfolio Optimizer")
+    sector, _, peers = get_sector_peers(ticker)
+    default = ", ".join([ticker] + peer_universe(ticker, sector, peers, limit=9))
+    chosen = st.text_input("Assets", default, help="Comma-separated tickers")
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        long_only = not st.checkbox("Allow shorts", help="Unconstrained weights, solved in closed form")
+    with c2:
+        shrink = st.checkbox("Ledoit-Wolf shrinkage", value=True)
+    with c3:
+        cap = st.slider("Max weight", 0.05, 1.0, 1.0, step=0.05, disabled=not long_only)
+    with c4:
+        risk_free_rate = st.number_input("Risk-free rate", 0.0, 0.2, 0.0, step=0.005, format="%.3f")
+    
+    tickers = list(dict.fromkeys(t.strip().upper() for t in chosen.split(",") if t.strip()))
+    if len(tickers) < 2:
+        st.info("Enter at least two tickers.")
+        return
+    with st.spinner("Loading prices..."):
+        prices = get_price_matrix(tickers, period)
+    if prices.shape[1] < 2:
+        st.warning("Need price history for at least two tickers")
+        return
+    if long_only and cap * prices.shape[1] < 1:
+        st.warning(f"A {cap:.0%} cap can't fully invest {prices.shape[1]} assets; raise the max weight.")
+        return
+    
+    moments = estimate_moments(prices, shrink)
+    cap = cap if long_only else 1.0
+    # Moments are memoized on the prices; these on the moments, so a widget rerun re-solves nothing
+    frontier = MEMO.call("portfolio.frontier", efficient_frontier, moments, 40, cap, long_only, risk_free_rate)
+    portfolios = {}
+    try:
+        portfolios['Max Sharpe'] = MEMO.call("portfolio.max_sharpe", max_sharpe, moments, cap, long_only,
+                                             risk_free_rate)
+    except ValueError as e:
+        st.warning(str(e))
+    portfolios['Min Variance'] = MEMO.call("portfolio.min_variance", min_variance, moments, cap, long_only,
+                                           risk_free_rate)
+    portfolios['Risk Parity'] = MEMO.call("portfolio.risk_parity", risk_parity, moments,
+                                          risk_free_rate=risk_free_rate)
+    colors = {'Max Sharpe': '#d62728', 'Min Variance': '#2ca02c', 'Risk Parity': '#ff7f0e'}
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=frontier['volatility'], y=frontier['return'], mode='lines',
+                             name='Efficient frontier', line=dict(color='#636EFA', width=2)))
+    asset_vol = np.sqrt(np.diag(moments.cov))
+    fig.add_trace(go.Scatter(x=asset_vol, y=moments.mu, mode='markers+text', text=moments.tickers,
+                             textposition='top center', name='Assets', marker=dict(color='#7f7f7f')))
+    for name, result in portfolios.items():
+        fig.add_trace(go.Scatter(x=[result.volatility], y=[result.expected_return], mode='markers',
+                                 name=name, marker=dict(color=colors[name], size=14, symbol='star')))
+    fig.update_layout(title=f"Efficient Frontier ({moments.observations} daily returns)",
+                      xaxis_title="Annual volatility", yaxis_title="Annual return",
+                      xaxis_tickformat=".0%", yaxis_tickformat=".0%")
+    plotly_chart(fig, use_container_width=True)
+    
+    cols = st.columns(len(portfolios))
+    for col, (name, result) in zip(cols, portfolios.items()):
+        with col:
+            st.metric(name, f"{result.expected_return:.2%}",
+                      f"vol {result.volatility:.2%} · Sharpe {result.sharpe:.2f}", delta_color="off")
+    
+    weights = pd.DataFrame({name: result.weights for name, result in portfolios.items()})
+    choice = st.radio("Weights of", list(portfolios), horizontal=True)
+    selected = weights[choice].sort_values(ascending=False)
+    contributions = risk_contributions(moments, portfolios[choice].weights).reindex(selected.index)
+    fig_w = go.Figure([
+        go.Bar(x=selected.index, y=selected.values, name='Weight', marker_color='#636EFA'),
+        go.Bar(x=contributions.index, y=contributions.values, name='Risk contribution', marker_color='#EF553B'),
+    ])
+    fig_w.update_layout(barmode='group', yaxis_tickformat=".0%", title=f"{choice} allocation")
+    plotly_chart(fig_w, use_container_width=True)
+    st.dataframe(weights.style.format("{:.2%}"), use_container_width=True)
 
 
+def display_intraday(ticker: str, interval: str):
+    """Live intraday view; each refresh ingests only the bars that closed since the last one"""
+    st.header(f"⏱️ {ticker} Intraday ({interval} bars)")
+    live = get_live(ticker, interval)
+    overlays = st.multiselect("Overlays", ["SMA", "Bollinger Bands", "VWAP"], default=["SMA"])
+    refresh_seconds = max(live.min_poll_seconds, 2)
+    
+    def render():
+        try:
+            with span("intraday.poll"):
+                live.update()
+        except Exception as e:
+            st.warning(f"Couldn't poll new bars: {str(e)}")
+        # One consistent view: another session may ingest bars while this one renders
+        snapshot = live.snapshot()
+        bars = snapshot.bars
+        if bars.empty:
+            st.info("No intraday bars available yet")
+            return
+        
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Last", f"{bars['Close'].iloc[-1]:.2f}",
+                  f"{bars['Close'].iloc[-1] / bars['Close'].iloc[0] - 1:.2%}")
+        m2.metric("Bars buffered", f"{len(bars)}", f"+{snapshot.last_added}" if snapshot.last_added else None)
+        m3.metric("Last bar", bars.index[-1].strftime("%Y-%m-%d %H:%M"))
+        
+        dates = bars.index
+        fig = go.Figure()
+        fig.add_trace(line_trace(dates, bars['Close'], name='Close'))
+        # SMA comes from the incremental kernels; the other overlays are cached per buffer state
+        if "SMA" in overlays:
+            fig.add_trace(line_trace(dates, snapshot.series['sma'], name=f'{live.stats.sma_window}-bar SMA'))
+        if "Bollinger Bands" in overlays:
+            bands = INDICATOR_ENGINE.compute(ticker, f"live-{interval}", bars, "Bollinger Bands")
+            fig.add_traces(band_traces(dates, bands["Upper"], bands["Lower"], name='Band'))
+        if "VWAP" in overlays:
+            fig.add_trace(line_trace(dates, INDICATOR_ENGINE.compute(
+                ticker, f"live-{interval}", bars, "VWAP")["VWAP"], name='VWAP', line=dict(dash='dash')))
+        fig.update_layout(title=f"{ticker} {interval} Close", xaxis_title="Time", yaxis_title="Price")
+        plotly_chart(fig, use_container_width=True)
+        
+        c1, c2, c3 = st.columns(3)
+        for column, name, title, fmt in ((c1, 'volatility', "Rolling Volatility (annualized)", ".0%"),
+                                         (c2, 'drawdown', "Drawdown", ".1%"),
+                                         (c3, 'rsi', "RSI", None)):
+            with column:
+                fig = go.Figure()
+                fig.add_trace(line_trace(dates, snapshot.series[name], name=name))
+                fig.update_layout(title=title, height=280, margin=dict(t=40),
+                                  yaxis_tickformat=fmt, yaxis_range=[0, 100] if name == 'rsi' else None)
+                plotly_chart(fig, use_container_width=True)
+    
+    # Fragments rerun only this panel on a timer; older Streamlit falls back to manual refresh
+    if hasattr(st, "fragment"):
+        st.fragment(run_every=refresh_seconds)(render)()
+    else:
+        render()
+        st.button("Refresh")
 
 
+@timed("render.predictions")
 def display_predictions(historical_data, predictions, model_name):
+    from sklearn.metrics import mean_absolute_error
+
     fig = go.Figure()
     
     # Historical Data
@@ -1074,7 +1595,7 @@ def display_predictions(historical_data, predictions, model_name):
     
     fig.add_trace(go.Scatter(
         x=future_dates,
-        y=predictions,
+        y=np.asarray(predictions),
         name=f'{model_name} Forecast',
         line=dict(color='green', dash='dot')
     ))
@@ -1096,7 +1617,7 @@ def display_predictions(historical_data, predictions, model_name):
             fill='tonexty',
             mode='lines',
             line=dict(width=0),
-            name='Confidence Interval'
+            name=f'{predictions.level:.0%} Interval' if isinstance(predictions, Forecast) else 'Confidence Interval'
         ))
     
     fig.update_layout(
@@ -1104,7 +1625,9 @@ def display_predictions(historical_data, predictions, model_name):
         xaxis_title="Date",
         yaxis_title="Price"
     )
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
+    if isinstance(predictions, Forecast):
+        st.caption(predictions.describe())
     
     # Prediction Metrics
     if len(historical_data) > 30:  # Only show if sufficient history
@@ -1112,14 +1635,54 @@ def display_predictions(historical_data, predictions, model_name):
         mae = mean_absolute_error(test, predictions[:30])
         st.metric("Mean Absolute Error (30-day backtest)", f"${mae:.2f}")
 
+def debug_enabled() -> bool:
+    """Debug panel is hidden unless ?debug=1 is in the URL or STOCK_DEBUG is set"""
+    try:
+        if st.query_params.get("debug") == "1":
+            return True
+    except Exception:
+        pass
+    return bool(os.environ.get("STOCK_DEBUG"))
+
+def display_debug_panel():
+    """Sidebar panel with timing spans, cache hit rates and memory high-water marks"""
+    snap = snapshot()
+    with st.sidebar.expander("🛠 Debug metrics", expanded=False):
+        memory = snap['memory']
+        st.caption(f"PID {snap['pid']} | RSS {memory['rss_mb']:.0f} MB | peak {memory['peak_rss_mb']:.0f} MB")
+        if snap['spans']:
+            spans = pd.DataFrame.from_dict(snap['spans'], orient='index')
+            spans = spans[['count', 'mean_ms', 'p95_ms', 'max_ms', 'errors', 'rss_high_water_mb']]
+            st.dataframe(spans.sort_values('mean_ms', ascending=False).round(2),
+                         use_container_width=True)
+        if snap['caches']:
+            caches = pd.DataFrame.from_dict(snap['caches'], orient='index')
+            st.dataframe(caches.round(3), use_container_width=True)
+        providers = {f"{pool.name}.{name}": stats for pool in (PRICE_PROVIDERS, SECTOR_PROVIDERS)
+                     for name, stats in pool.describe().items()}
+        if providers:
+            st.dataframe(pd.DataFrame.from_dict(providers, orient='index'), use_container_width=True)
+        if snap['counters']:
+            st.json(snap['counters'])
+
 # Updated main app structure
 def main():
     # All main() content indented 4 spaces
     st.sidebar.header("Navigation")
     analysis_type = st.sidebar.radio(
         "Select Analysis Type",
-        ["Stock Analysis", "Monte Carlo", "Financial Ratios", "Predictions"]
+        ["Stock Analysis", "Monte Carlo", "Financial Ratios", "Predictions", "Portfolio", "Screener"]
     )
+    if debug_enabled():
+        display_debug_panel()
+    
+    # The screener works on the universe snapshot, not on a single ticker
+    if analysis_type == "Screener":
+        try:
+            display_screener()
+        except Exception as e:
+            st.error(f"Screener failed: {str(e)}")
+        return
     
     # This line should have exactly 4 spaces of indentation
     ticker = st.sidebar.text_input("Enter Stock Ticker", "AAPL").strip().upper()
@@ -1134,6 +1697,15 @@ def main():
         ["1mo", "3mo", "6mo", "1y", "2y", "5y"],
         index=3
     )
+    interval = st.sidebar.selectbox("Bar Interval", ["1d"] + list(INTERVALS))
+    if interval != "1d":
+        if analysis_type == "Stock Analysis":
+            try:
+                display_intraday(ticker, interval)
+            except Exception as e:
+                st.error(f"Intraday view failed: {str(e)}")
+            return
+        st.sidebar.caption("Intraday bars are shown on Stock Analysis; this view uses daily history.")
     
     # Fetch Data
     
@@ -1151,28 +1723,44 @@ def main():
         st.error(f"Unexpected error during data fetch: {str(e)}")
         return
     
+    # Runs in the background once this script run finishes
+    schedule_prefetch(ticker, period)
+    
     # Analysis Sections
     try:
         if analysis_type == "Stock Analysis":
-            display_stock_analysis(data, ticker)
+            display_stock_analysis(data, ticker, period)
             
         elif analysis_type == "Monte Carlo":
             st.header("🎲 Monte Carlo Simulation")
             n_simulations = st.slider("Number of Simulations", 100, 5000, 1000)
             time_horizon = st.slider("Time Horizon (days)", 30, 365, 180)
             
-            if st.button("Run Simulation"):
+            run = st.button("Run Simulation")
+            if run:
+                # Every click is a fresh draw; other widgets' reruns keep showing the last one
+                st.session_state["mc_draw"] = uuid.uuid4().hex[:8]
+            draw = st.session_state.get("mc_draw", "")
+            sim_key = f"{ticker}:{series_digest(data['Close'])}:{n_simulations}:{time_horizon}:{draw}"
+            simulations = None
+            if run:
                 try:
-                    simulations = monte_carlo_simulation(data, n_simulations, time_horizon)
-                    display_monte_carlo(simulations)
+                    simulations = MEMO.call("sim.monte_carlo", run_simulation, sim_key,
+                                            data, n_simulations, time_horizon, shared=False)
                 except Exception as e:
                     st.error(f"Simulation failed: {str(e)}")
+            else:
+                simulations = MEMO.peek("sim.monte_carlo", sim_key, data, n_simulations, time_horizon,
+                                        shared=False)
+            if simulations is not None:
+                st.caption("Showing your last run. Click Run Simulation again for a new set of paths.")
+                display_monte_carlo(simulations, sim_key)
         
         elif analysis_type == "Financial Ratios":
             st.header("📈 Financial Ratios Analysis")
 
             # Create tabs for different ratio types
-            tab1, tab2  = st.tabs(["Fundamental Ratios", "Market Risk Metrics"])
+            tab1, tab2, tab3 = st.tabs(["Fundamental Ratios", "Market Risk Metrics", "Peer Correlation"])
     
             with tab1:
                 st.subheader("Fundamental Ratios")
@@ -1210,7 +1798,8 @@ def main():
                 st.subheader("🎯 Risk Metrics Analysis")
                 try:
                     with st.spinner("Calculating risk metrics..."):
-                        risk_metrics = calculate_risk_metrics(data)
+                        benchmark, _ = get_stock_data("SPY", period)
+                        risk_metrics = calculate_risk_metrics(data, benchmark)
             
                         if risk_metrics:
                             # Create a metrics dashboard
@@ -1221,52 +1810,89 @@ def main():
                 
                             # Column 1: Annual Volatility
                             with m1:
+                                volatility = risk_metrics.get('volatility')
                                 st.metric(
                                     "Annual Volatility", 
-                                     f"{risk_metrics.get('volatility', 0):.2%}",
+                                     f"{volatility:.2%}" if volatility is not None else "N/A",
                                      help="1-year standard deviation of returns"
                                 )
                                 st.progress(
-                                    min(risk_metrics.get('volatility', 0)/0.5,1.0) 
+                                    min((volatility or 0)/0.5,1.0) 
                                 )
                                 st.caption("🛈 <0.5 = Low, >1.0 = High")
                 
                             # Column 2: Maximum Drawdown
                             with m2:
+                                max_drawdown = risk_metrics.get('maximumDrawdown')
                                 st.metric(
                                     "Max Drawdown", 
-                                    f"{risk_metrics.get('maximumDrawdown', 0):.2%}",
+                                    f"{max_drawdown:.2%}" if max_drawdown is not None else "N/A",
                                     help="Worst historical peak-to-trough decline"
                                 )
                                 st.progress(
-                                    min(abs(risk_metrics.get('maximumDrawdown', 0))/0.5,1.0)                                    
+                                    min(abs(max_drawdown or 0)/0.5,1.0)                                    
                                 )
                                 st.caption("🛈 <10% = Low, >30% = High")
                 
                             # Column 3: Sharpe Ratio
                             with m3:
-                                sharpe = risk_metrics.get('sharpeRatio', 0)
-                                st.metric(
-                                    "Sharpe Ratio", 
-                                    f"{sharpe:.2f}",
-                                    delta="Good" if sharpe > 1 else "Fair" if sharpe > 0 else "Poor",
-                                    help="Risk-adjusted returns (0 risk-free rate)"
-                                )
-                                st.progress(
-                                    (sharpe+1)/3, 
-                                    text="<0 = Poor, >1 = Good"
-                                )
+                                sharpe = risk_metrics.get('sharpeRatio')
+                                if sharpe is None:
+                                    st.metric("Sharpe Ratio", "N/A",
+                                              help="Risk-adjusted returns (0 risk-free rate)")
+                                else:
+                                    st.metric(
+                                        "Sharpe Ratio", 
+                                        f"{sharpe:.2f}",
+                                        delta="Good" if sharpe > 1 else "Fair" if sharpe > 0 else "Poor",
+                                        help="Risk-adjusted returns (0 risk-free rate)"
+                                    )
+                                    st.progress(
+                                        min(max((sharpe+1)/3, 0.0), 1.0), 
+                                        text="<0 = Poor, >1 = Good"
+                                    )
+                
+                            # Second row: downside-focused metrics
+                            r1, r2, r3, r4 = st.columns(4)
+                            with r1:
+                                sortino = risk_metrics.get('sortinoRatio')
+                                st.metric("Sortino Ratio", f"{sortino:.2f}" if sortino is not None else "N/A",
+                                          help="Return per unit of downside deviation")
+                                calmar = risk_metrics.get('calmarRatio')
+                                st.metric("Calmar Ratio", f"{calmar:.2f}" if calmar is not None else "N/A",
+                                          help="Annualized return over max drawdown")
+                            with r2:
+                                beta = risk_metrics.get('beta')
+                                st.metric("Beta vs SPY", f"{beta:.2f}" if beta is not None else "N/A",
+                                          help="Sensitivity of daily returns to the S&P 500")
+                                st.metric("Longest Drawdown",
+                                          f"{risk_metrics.get('maxDrawdownDuration') or 0:.0f} days",
+                                          help="Most trading days spent below a previous peak")
+                            with r3:
+                                hist_var = risk_metrics.get('historicalVaR')
+                                st.metric("95% VaR (historical)", f"{hist_var:.2%}" if hist_var is not None else "N/A",
+                                          help="Daily return exceeded on the worst 5% of days")
+                                hist_cvar = risk_metrics.get('historicalCVaR')
+                                st.metric("95% CVaR (historical)", f"{hist_cvar:.2%}" if hist_cvar is not None else "N/A",
+                                          help="Average return on the worst 5% of days")
+                            with r4:
+                                param_var = risk_metrics.get('parametricVaR')
+                                st.metric("95% VaR (parametric)", f"{param_var:.2%}" if param_var is not None else "N/A",
+                                          help="Normal-distribution estimate of daily VaR")
+                                param_cvar = risk_metrics.get('parametricCVaR')
+                                st.metric("95% CVaR (parametric)", f"{param_cvar:.2%}" if param_cvar is not None else "N/A",
+                                          help="Normal-distribution estimate of daily CVaR")
                 
                             # Visualizations
                             st.markdown("### 📊 Risk Over Time")
                             if not data.empty and 'Close' in data.columns:
+                                rolling_stats = get_rolling_stats(ticker, data['Close'])
                                 # Volatility chart
                                 c1, c2 = st.columns(2)
                     
                                 with c1:
                                     st.markdown("#### 30-Day Rolling Volatility")
-                                    returns = np.log(data['Close']).diff()
-                                    rolling_vol = returns.rolling(window=30).std() * np.sqrt(252)
+                                    rolling_vol = rolling_stats.series('volatility')
                                     fig = go.Figure()
                                     fig.add_trace(go.Scatter(
                                         x=rolling_vol.index,
@@ -1281,12 +1907,11 @@ def main():
                                         height=300,
                                         margin=dict(t=30)
                                     )
-                                    st.plotly_chart(fig, use_container_width=True)
+                                    plotly_chart(fig, use_container_width=True)
                     
                                 with c2:
                                     st.markdown("#### Cumulative Drawdown")
-                                    rolling_max = data['Close'].cummax()
-                                    daily_drawdown = data['Close']/rolling_max - 1
+                                    daily_drawdown = rolling_stats.series('drawdown')
                                     fig = go.Figure()
                                     fig.add_trace(go.Scatter(
                                         x=daily_drawdown.index,
@@ -1302,15 +1927,28 @@ def main():
                                         height=300,
                                         margin=dict(t=30)
                                     )
-                                    st.plotly_chart(fig, use_container_width=True)
+                                    plotly_chart(fig, use_container_width=True)
                         else:
                             st.warning("Could not calculate risk metrics")
     
                 except Exception as e:
                     st.error(f"Risk analysis failed: {str(e)}")
+    
+            with tab3:
+                st.subheader("🔗 Peer Correlation")
+                try:
+                    display_peer_correlation(ticker, period)
+                except Exception as e:
+                    st.error(f"Peer correlation failed: {str(e)}")
 
            
         
+        elif analysis_type == "Portfolio":
+            try:
+                display_portfolio(ticker, period)
+            except Exception as e:
+                st.error(f"Portfolio analysis failed: {str(e)}")
+        
         elif analysis_type == "Predictions":
             st.header("🔮 Price Predictions")
     
@@ -1319,8 +1957,12 @@ def main():
             with col1:
                 model_type = st.    selectbox(
                     "Select Prediction Model",
-                    ["Holt-Winters", "Arima", "LSTM", "Random Forest", "XGBoost"]
+                    ["Holt-Winters", "Arima", "LSTM", "Random Forest", "XGBoost", "Prophet"]
                 )
+                interval_level = st.select_slider("Prediction interval", options=[0.8, 0.9, 0.95],
+                                                  value=0.9, format_func=lambda v: f"{v:.0%}")
+            # Start importing the selected backend while the user sets options
+            warm_up_backends([model_type])
             seasonal_periods = 5
             if model_type == "Holt-Winters":
                 with col2:
@@ -1330,26 +1972,64 @@ def main():
                         horizontal=True
                     )
                     seasonal_periods = int(seasonality_choice.split("(")[1].replace(")", ""))
+            tune_hyperparameters = False
+            if model_type in ("Random Forest", "XGBoost"):
+                with col2:
+                    tune_hyperparameters = st.checkbox(
+                        "Tune hyperparameters",
+                        help="Successive-halving search scored on time-series CV folds "
+                             f"using up to {TUNING_CORES} cores; the best settings are "
+                             "reused for this ticker afterwards"
+                    )
+            run_prophet_cv = False
+            if model_type == "Prophet":
+                with col2:
+                    run_prophet_cv = st.checkbox("Run cross-validation (30-day horizon)")
     
             if st.button("Generate Predictions"):
                 with st.spinner(f"Training {model_type} model..."):
                     try:
+                        params = None
+                        if tune_hyperparameters:
+                            with st.spinner("Searching hyperparameters..."):
+                                result = tune_model(model_type, ticker, data)
+                            params = result.params
+                            st.caption(f"Tuned over {result.trials} trials in {result.seconds:.1f}s "
+                                       f"(CV MAE ${result.score:.2f}): {params}")
+                        elif model_type in ("Random Forest", "XGBoost"):
+                            record = tuned_params(model_type, ticker)
+                            if record:
+                                params = record['params']
+                                st.caption(f"Using tuned parameters from "
+                                           f"{datetime.fromtimestamp(record['tuned_at']):%Y-%m-%d}: {params}")
+                        
                         if model_type == "Holt-Winters":
-                            model, error = train_holt_winters(data, seasonal_periods)
+                            model, error = train_cached(model_type, ticker, data, train_holt_winters, seasonal_periods)
                             if model is None:
                                 st.error(error)
                             else:
-                                predictions = predict_holt_winters(model, 30)
+                                predictions = with_intervals(
+                                    ticker, model_type, data, predict_holt_winters(model, 30),
+                                    lambda d, h: predict_holt_winters(
+                                        train_cached(model_type, ticker, d, train_holt_winters, seasonal_periods)[0], h),
+                                    interval_level)
                                 display_predictions(data, predictions, "Holt-Winters")
             
                         elif model_type == "Arima":
-                            model = train_arima_model(data)
-                            predictions = predict_arima(model, 30)
+                            model = train_cached(model_type, ticker, data, train_arima_model)
+                            predictions = with_intervals(
+                                ticker, model_type, data, predict_arima(model, 30),
+                                lambda d, h: predict_arima(train_cached(model_type, ticker, d, train_arima_model), h),
+                                interval_level)
                             display_predictions(data, predictions, "Arima")
             
                         elif model_type == "Random Forest":
-                            model = train_random_forest(data)
-                            predictions = predict_random_forest(model, data, 30)
+                            model = train_cached(model_type, ticker, data, train_random_forest, params)
+                            predictions = with_intervals(
+                                ticker, model_type, data, predict_random_forest(model, data, 30),
+                                lambda d, h: predict_random_forest(
+                                    train_cached(model_type, ticker, d, train_random_forest, params), d, h),
+                                interval_level)
                             display_predictions(data, predictions, "Random Forest")
 
                             # Show feature importance
@@ -1367,19 +2047,45 @@ def main():
                                     yaxis_title="Importance Score",
                                     hovermode="x"
                                 )    
-                                st.plotly_chart(fig)
+                                plotly_chart(fig)
                             except Exception as e:
                                 st.warning(f"Couldn't generate feature importance: {str(e)}")
             
                         elif model_type == "LSTM":
-                            model, scaler = train_lstm_model(data)
-                            predictions = predict_lstm(model, scaler, data, 30)
+                            model, scaler = train_cached(model_type, ticker, data, train_lstm_model)
+                            predictions = with_intervals(
+                                ticker, model_type, data, predict_lstm(model, scaler, data, 30),
+                                lambda d, h: predict_lstm(*train_cached(model_type, ticker, d, train_lstm_model), d, h),
+                                interval_level)
                             display_predictions(data, predictions, "LSTM")
             
                         elif model_type == "XGBoost":
-                            model = train_xgboost_model(data)
-                            predictions = predict_xgboost(model, data, 30)
+                            model = train_cached(model_type, ticker, data, train_xgboost_model, params)
+                            predictions = with_intervals(
+                                ticker, model_type, data, predict_xgboost(model, data, 30),
+                                lambda d, h: predict_xgboost(
+                                    train_cached(model_type, ticker, d, train_xgboost_model, params), d, h),
+                                interval_level)
                             display_predictions(data, predictions, "XGBoost")
+            
+                        elif model_type == "Prophet":
+                            model, source = train_prophet_model(data, ticker)
+                            predictions = predict_prophet(model, 30)
+                            display_predictions(data, predictions.values, "Prophet")
+                            st.caption({"memory": "Reused fitted model from this worker",
+                                        "disk": "Loaded fitted model from the model cache",
+                                        "fit": "Fitted a new model"}[source])
+                            if run_prophet_cv:
+                                initial_days = prophet_backend.cv_initial_days(model, 30)
+                                if initial_days is None:
+                                    st.info("Skipped cross-validation: a 30-day horizon needs at least "
+                                            "60 days of history. Pick a longer period.")
+                                else:
+                                    with st.spinner("Cross-validating..."):
+                                        metrics = prophet_backend.cross_validate(
+                                            model, horizon_days=30, initial_days=initial_days)
+                                    st.caption(f"Cutoffs start after {initial_days} days of training history")
+                                    st.dataframe(metrics, use_container_width=True, hide_index=True)
         
                     except Exception as e:
                         st.error(f"Prediction failed: {str(e)}")
@@ -1395,7 +2101,9 @@ def main():
         st.error(f"Application error: {str(e)}")
 if __name__ == "__main__":
     try:
-        main()
+        # Background prefetching holds off while the page is being built
+        with PREFETCH.foreground():
+            main()
     except Exception as e:
         st.error(f"Application crashed: {str(e)}")
         import traceback 
@@ -0,0 +1,14 @@
+"""Shared setup for the unit tests; run from the repo root with ``python -m pytest tests``"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the app's local caches out of the working tree
+_CACHE_DIR = tempfile.mkdtemp(prefix="test-cache-")
+os.environ.setdefault("SHARED_CACHE_DB", os.path.join(_CACHE_DIR, "shared.db"))
+os.environ.setdefault("RESIDUALS_DB", os.path.join(_CACHE_DIR, "residuals.db"))
+os.environ.setdefault("FUNDAMENTALS_DB", os.path.join(_CACHE_DIR, "fundamentals.db"))
+os.environ.pop("REDIS_URL", None)
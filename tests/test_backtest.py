@@ -0,0 +1,90 @@
+"""Vectorized backtests against a bar-by-bar loop over the same indicators"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import STRATEGIES, param_grid, run_backtest
+from indicators import bollinger, rsi, sma
+
+COST_BPS = 10.0
+
+
+def prices(n: int = 400, seed: int = 4) -> pd.DataFrame:
+    steps = np.random.default_rng(seed).normal(0.0003, 0.02, (n, 2))
+    return pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), columns=['A', 'B'],
+                        index=pd.bdate_range("2022-01-01", periods=n))
+
+
+def loop_positions(close: np.ndarray, strategy: str, params: dict, allow_short: bool) -> np.ndarray:
+    """One ticker, one parameter set, one bar at a time"""
+    if strategy == 'SMA Crossover':
+        fast, slow = sma(close, params['fast'])[0], sma(close, params['slow'])[0]
+    elif strategy == 'RSI':
+        level = rsi(close, params['period'])[0]
+    else:
+        middle, upper, lower = bollinger(close, params['window'], params['num_std'])
+    positions = np.zeros(len(close))
+    position, previous_side = 0.0, np.nan
+    for t in range(len(close)):
+        if strategy == 'SMA Crossover':
+            if fast[t] > slow[t]:
+                position = 1.0
+            elif fast[t] < slow[t] and allow_short:
+                position = -1.0
+            else:
+                position = 0.0
+        elif strategy == 'RSI':
+            if level[t] < params['lower']:
+                position = 1.0
+            elif level[t] > params['upper']:
+                position = -1.0 if allow_short else 0.0
+        else:
+            side = np.sign(close[t] - middle[t])
+            if close[t] < lower[t]:
+                position = 1.0
+            elif allow_short and close[t] > upper[t]:
+                position = -1.0
+            elif not np.isnan(previous_side) and side != previous_side and side != 0:
+                position = 0.0
+            previous_side = side
+        positions[t] = position
+    return positions
+
+
+def loop_equity(close: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    equity, held, value = np.ones(len(close)), 0.0, 1.0
+    for t in range(len(close)):
+        change = close[t] / close[t - 1] - 1 if t else 0.0
+        value *= 1 + held * change - abs(positions[t] - held) * COST_BPS / 10_000
+        equity[t], held = value, positions[t]
+    return equity
+
+
+@pytest.mark.parametrize("allow_short", [False, True])
+@pytest.mark.parametrize("strategy", list(STRATEGIES))
+def test_positions_and_metrics_match_a_bar_by_bar_loop(strategy, allow_short):
+    frame = prices()
+    close = frame.to_numpy()
+    combos = param_grid(strategy)
+    positions = STRATEGIES[strategy](close, combos, allow_short)
+    results = run_backtest(frame, strategy, cost_bps=COST_BPS, allow_short=allow_short)
+    for i, params in enumerate(combos):
+        for j, ticker in enumerate(frame.columns):
+            expected = loop_positions(close[:, j], strategy, params, allow_short)
+            np.testing.assert_array_equal(positions[:, i, j], expected)
+            row = results.loc[tuple(params.values()) + (ticker,)]
+            trades = np.count_nonzero(np.diff(expected, prepend=0.0))
+            assert row['trades'] == trades
+            np.testing.assert_allclose(row['totalReturn'], loop_equity(close[:, j], expected)[-1] - 1,
+                                       rtol=1e-10)
+
+
+def test_an_entry_on_the_first_bar_is_a_trade(monkeypatch):
+    frame = prices(60)
+    always_long = lambda close, combos, allow_short: np.ones((len(close), len(combos), close.shape[1]))
+    monkeypatch.setitem(STRATEGIES, 'SMA Crossover', always_long)
+    results = run_backtest(frame, 'SMA Crossover', grid={'fast': [5], 'slow': [50]}, cost_bps=COST_BPS)
+    # One trade, and it paid the cost once
+    assert results['trades'].tolist() == [1, 1]
+    expected = frame.iloc[-1] / frame.iloc[0] * (1 - COST_BPS / 10_000) - 1
+    np.testing.assert_allclose(results['totalReturn'], expected.to_numpy(), rtol=1e-10)
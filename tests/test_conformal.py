@@ -0,0 +1,43 @@
+"""Finite-sample coverage of the conformal bounds"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conformal import ResidualStore, conformal_bounds
+
+
+def test_bounds_are_the_corrected_order_statistics():
+    residuals = np.random.default_rng(0).permutation(np.arange(1.0, 21.0))
+    # n = 20 at 80%: floor(21 * 0.1) = 2nd and ceil(21 * 0.9) = 19th smallest
+    assert conformal_bounds(residuals, 0.8) == (2.0, 19.0)
+
+
+def test_too_few_residuals_for_the_level():
+    residuals = np.arange(20.0)
+    assert conformal_bounds(residuals, 0.95) is None  # needs ceil(21 * 0.975) = 21 > 20
+    assert conformal_bounds(np.arange(39.0), 0.95) == (0.0, 38.0)
+
+
+@pytest.mark.parametrize("n, level", [(20, 0.8), (20, 0.9), (50, 0.9), (100, 0.95)])
+def test_coverage_on_exchangeable_draws(n, level):
+    rng = np.random.default_rng(n)
+    trials = 20000
+    draws = rng.standard_t(3, size=(trials, n + 1))
+    covered = 0
+    for row in draws:
+        lo, hi = conformal_bounds(row[:n], level)
+        covered += lo <= row[n] <= hi
+    alpha = 1 - level
+    expected = 1 - (np.floor((n + 1) * alpha / 2) + (n + 1 - np.ceil((n + 1) * (1 - alpha / 2)))) / (n + 1)
+    assert expected >= level
+    assert abs(covered / trials - expected) < 4 * np.sqrt(expected * (1 - expected) / trials)
+
+
+def test_uncalibrated_horizons_fall_back_to_price_moves(tmp_path):
+    store = ResidualStore(str(tmp_path / "residuals.db"))
+    store.add("T", "m", pd.Timestamp("2024-01-02"), [0.01] * 3)
+    close = pd.Series(np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, 300))) * 100,
+                      index=pd.bdate_range("2023-01-02", periods=300))
+    forecast = store.forecast("T", "m", [100.0] * 3, close, level=0.95)
+    assert forecast.sources == ['naive'] * 3
+    assert np.all(forecast.lower < 100.0) and np.all(forecast.upper > 100.0)
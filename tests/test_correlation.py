@@ -0,0 +1,89 @@
+"""Incremental covariance, correlation and Ledoit-Wolf against pandas and scikit-learn"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import correlation
+from correlation import RollingCovariance, ledoit_wolf, returns_matrix, window_correlation
+
+TOL = dict(rtol=1e-9, atol=1e-12)
+WINDOW = 30
+
+
+def returns(n: int = 200, seed: int = 5, gaps: float = 0.05) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 0.01, (n, 1)) + rng.normal(0, 0.015, (n, 4))
+    values[rng.random(values.shape) < gaps] = np.nan  # gaps are handled pairwise
+    values[:40, 3] = np.nan  # a late listing
+    return pd.DataFrame(values, columns=list("ABCD"), index=pd.bdate_range("2022-01-03", periods=n))
+
+
+def prices(n: int = 200, seed: int = 6) -> pd.DataFrame:
+    steps = np.random.default_rng(seed).normal(0.0002, 0.012, (n, 4))
+    return pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), columns=list("ABCD"),
+                        index=pd.bdate_range("2022-01-03", periods=n))
+
+
+def assert_matches_pandas(engine: RollingCovariance, frame: pd.DataFrame, end: int):
+    window = frame.iloc[max(end - WINDOW, 0):end]
+    np.testing.assert_allclose(engine.covariance(), window.cov(), **TOL)
+    np.testing.assert_allclose(engine.correlation(), window.corr(), **TOL)
+
+
+def test_update_one_bar_at_a_time_matches_pandas():
+    frame = returns()
+    engine = RollingCovariance(frame.columns, WINDOW)
+    engine.seed(frame.iloc[:10])
+    values = frame.to_numpy()
+    for end in range(11, len(frame) + 1):
+        engine.update(values[end - 1])
+        assert_matches_pandas(engine, frame, end)
+
+
+@pytest.mark.parametrize("step", [3, 17, WINDOW + 5])
+def test_extend_in_batches_matches_pandas(step):
+    frame = returns()
+    engine = RollingCovariance(frame.columns, WINDOW)
+    engine.seed(frame.iloc[:5])
+    for end in range(5 + step, len(frame) + 1, step):
+        assert engine.can_extend(frame.iloc[:end])
+        engine.extend(frame.iloc[:end])
+        assert_matches_pandas(engine, frame, end)
+
+
+def test_ledoit_wolf_matches_sklearn():
+    covariance = pytest.importorskip("sklearn.covariance")
+    x = returns(gaps=0.0).dropna().to_numpy()
+    expected = covariance.LedoitWolf().fit(x)
+    cov, shrinkage = ledoit_wolf(x)
+    np.testing.assert_allclose(cov, expected.covariance_, **TOL)
+    assert shrinkage == pytest.approx(expected.shrinkage_, rel=1e-9)
+
+
+def test_shrunk_window_matches_sklearn_on_complete_tickers():
+    covariance = pytest.importorskip("sklearn.covariance")
+    frame = returns(gaps=0.0)
+    frame.iloc[-WINDOW + 3, 1] = np.nan  # B drops out of the shrunk matrix
+    engine = RollingCovariance(frame.columns, WINDOW)
+    engine.seed(frame.iloc[:60])
+    engine.extend(frame)
+    cov, shrinkage = engine.shrunk_covariance()
+    window = frame.iloc[-WINDOW:].dropna(axis=1)
+    assert list(cov.columns) == list(window.columns)
+    expected = covariance.LedoitWolf().fit(window.to_numpy())
+    np.testing.assert_allclose(cov, expected.covariance_, **TOL)
+    assert shrinkage == pytest.approx(expected.shrinkage_, rel=1e-9)
+
+
+def test_window_correlation_follows_new_and_revised_bars(monkeypatch):
+    monkeypatch.setattr(correlation, '_engines', type(correlation._engines)())
+    frame = prices()
+    for end in (120, 121, 130, 200):
+        corr, shrinkage = window_correlation(frame.iloc[:end], WINDOW)
+        assert shrinkage is None
+        np.testing.assert_allclose(corr, returns_matrix(frame.iloc[:end]).iloc[-WINDOW:].corr(), **TOL)
+    revised = frame.copy()
+    revised.iloc[-10:] *= 1.05 ** np.arange(10)[:, None]
+    corr, _ = window_correlation(revised, WINDOW)
+    np.testing.assert_allclose(corr, returns_matrix(revised).iloc[-WINDOW:].corr(), **TOL)
+    assert len(correlation._engines) == 1
@@ -0,0 +1,28 @@
+"""Span bookkeeping and per-worker exporter settings"""
+import instrumentation
+import serve
+
+
+def test_spans_sample_rss_instead_of_reading_it_every_time(monkeypatch):
+    reads = []
+    monkeypatch.setattr(instrumentation, "current_rss", lambda: reads.append(1) or 100 * len(reads))
+    monkeypatch.setattr(instrumentation, "_rss_sample", (float('-inf'), 0))
+    instrumentation.reset()
+    for _ in range(1000):
+        instrumentation.record_span("test.span", 0.001)
+    assert len(reads) == 1
+
+    monkeypatch.setattr(instrumentation, "RSS_SAMPLE_SECONDS", 0.0)
+    instrumentation.record_span("test.span", 0.001)
+    assert len(reads) == 2
+    spans = instrumentation.snapshot()['spans']
+    assert spans['test.span']['count'] == 1001
+    assert spans['test.span']['rss_high_water_mb'] == 200 / 2**20
+    instrumentation.reset()
+
+
+def test_each_worker_gets_its_own_metrics_port(monkeypatch):
+    monkeypatch.setenv("METRICS_PORT", "9100")
+    assert [serve.worker_env(i)["METRICS_PORT"] for i in range(3)] == ["9100", "9101", "9102"]
+    monkeypatch.delenv("METRICS_PORT")
+    assert "METRICS_PORT" not in serve.worker_env(1)
@@ -0,0 +1,51 @@
+"""LiveBars fed by a ReplaySource: ring-buffer wraparound and incremental stats"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import intraday
+from intraday import FIELDS, LiveBars, ReplaySource, get_live, periods_per_year
+from rolling import RollingStats
+
+CAPACITY = 100
+
+
+def minute_bars(n: int = 400, seed: int = 8) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    index = pd.date_range("2024-03-04 14:30", periods=n, freq="1min", tz="UTC", name="Date")
+    return pd.DataFrame({'Open': close, 'High': close * 1.001, 'Low': close * 0.999, 'Close': close,
+                         'Volume': rng.integers(100, 1000, n).astype(np.float64)}, index=index)[FIELDS]
+
+
+@pytest.mark.parametrize("batch", [1, 7, CAPACITY + 13])
+def test_ring_buffer_wraps_and_incremental_stats_match_a_fresh_seed(batch):
+    bars = minute_bars()
+    source = ReplaySource(bars, warmup=60, batch=batch)
+    live = LiveBars("TEST", "1m", source, capacity=CAPACITY, min_poll_seconds=0)
+    while not source.exhausted:
+        before = source.position
+        # Every released bar counts, even when a batch overflows the buffer
+        assert live.update() == source.position - before
+        seen = bars.iloc[:source.position]
+        snapshot = live.snapshot()
+        # The buffer holds the newest CAPACITY bars however often it has wrapped
+        pd.testing.assert_frame_equal(snapshot.bars, seen.iloc[-CAPACITY:], check_freq=False)
+        fresh = RollingStats(periods_per_year=periods_per_year("1m"))
+        fresh.seed(seen['Close'])
+        for name, series in snapshot.series.items():
+            expected = fresh.series(name).iloc[-CAPACITY:]
+            assert series.index.equals(expected.index)
+            np.testing.assert_allclose(series.to_numpy(), expected.to_numpy(), rtol=1e-10, atol=1e-12)
+    assert live.buffer.total == len(bars) > CAPACITY
+    assert live.update() == 0
+
+
+def test_live_feeds_are_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(intraday, "_live", type(intraday._live)())
+    monkeypatch.setattr(intraday, "MAX_FEEDS", 2)
+    first = get_live("AAA", "1m", replay_dir=str(tmp_path))
+    get_live("BBB", "1m", replay_dir=str(tmp_path))
+    assert get_live("aaa", "1m", replay_dir=str(tmp_path)) is first
+    get_live("CCC", "1m", replay_dir=str(tmp_path))
+    assert list(intraday._live) == [("AAA", "1m"), ("CCC", "1m")]
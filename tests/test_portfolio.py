@@ -0,0 +1,80 @@
+"""Portfolio solvers against scipy SLSQP and the closed-form optimality conditions"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio import estimate_moments, max_sharpe, min_variance, risk_contributions, risk_parity
+
+optimize = pytest.importorskip("scipy.optimize")
+
+
+@pytest.fixture(scope="module")
+def moments():
+    rng = np.random.default_rng(3)
+    factor = rng.normal(0, 0.01, (750, 1))
+    steps = factor @ rng.uniform(0.5, 1.5, (1, 5)) + rng.normal(0.0006, 0.012, (750, 5))
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), columns=list("ABCDE"),
+                          index=pd.bdate_range("2021-01-01", periods=750))
+    return estimate_moments(prices)
+
+
+def slsqp(objective, n: int, cap: float = 1.0) -> np.ndarray:
+    """Fully invested weights minimizing ``objective``; ``cap=None`` allows shorts"""
+    bounds = None if cap is None else [(0.0, cap)] * n
+    result = optimize.minimize(objective, np.full(n, 1.0 / n), method='SLSQP', bounds=bounds,
+                               constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1}],
+                               options={'ftol': 1e-15, 'maxiter': 1000})
+    assert result.success
+    return result.x
+
+
+def test_min_variance_matches_slsqp(moments):
+    expected = slsqp(lambda w: w @ moments.cov @ w, len(moments.mu))
+    np.testing.assert_allclose(min_variance(moments).weights, expected, atol=1e-7)
+
+
+@pytest.mark.parametrize("cap", [1.0, 0.3])
+def test_max_sharpe_matches_slsqp(moments, cap):
+    rf = 0.02
+    expected = slsqp(lambda w: -(w @ moments.mu - rf) / np.sqrt(w @ moments.cov @ w), len(moments.mu), cap)
+    portfolio = max_sharpe(moments, cap=cap, risk_free_rate=rf)
+    assert portfolio.weights.max() <= cap + 1e-12
+    np.testing.assert_allclose(portfolio.weights, expected, atol=1e-6)
+    best = (expected @ moments.mu - rf) / np.sqrt(expected @ moments.cov @ expected)
+    assert portfolio.sharpe >= best - 1e-10
+
+
+def test_risk_parity_equalizes_contributions(moments):
+    portfolio = risk_parity(moments)
+    assert portfolio.weights.sum() == pytest.approx(1.0)
+    np.testing.assert_allclose(risk_contributions(moments, portfolio.weights), 1 / len(moments.mu), atol=1e-10)
+
+    budgets = np.array([4.0, 1.0, 1.0, 1.0, 1.0])
+    budgeted = risk_parity(moments, budgets=budgets)
+    np.testing.assert_allclose(risk_contributions(moments, budgeted.weights), budgets / budgets.sum(), atol=1e-10)
+
+
+def test_closed_forms_with_shorts(moments):
+    ones = np.ones(len(moments.mu))
+    # Min variance: the gradient S w is the same for every asset
+    weights = min_variance(moments, long_only=False).weights.to_numpy()
+    gradient = moments.cov @ weights
+    np.testing.assert_allclose(gradient, gradient.mean() * ones, rtol=1e-10)
+    assert weights.sum() == pytest.approx(1.0)
+
+    # Tangency: S w is proportional to the excess returns, with a positive factor
+    rf = 0.01
+    weights = max_sharpe(moments, long_only=False, risk_free_rate=rf).weights.to_numpy()
+    excess = moments.mu - rf
+    scale = (moments.cov @ weights) @ excess / (excess @ excess)
+    assert scale > 0
+    np.testing.assert_allclose(moments.cov @ weights, scale * excess, rtol=1e-10, atol=1e-14)
+    unbounded = slsqp(lambda w: -(w @ excess) / np.sqrt(w @ moments.cov @ w), len(ones), cap=None)
+    assert (weights @ excess) / np.sqrt(weights @ moments.cov @ weights) >= \
+        (unbounded @ excess) / np.sqrt(unbounded @ moments.cov @ unbounded) - 1e-10
+
+
+def test_no_tangency_with_shorts_at_or_above_the_min_variance_return(moments):
+    floor = min_variance(moments, long_only=False).expected_return
+    with pytest.raises(ValueError, match="not below the minimum-variance return"):
+        max_sharpe(moments, long_only=False, risk_free_rate=floor + 0.01)
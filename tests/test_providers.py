@@ -0,0 +1,118 @@
+"""Routing and circuit-breaker bookkeeping of ProviderPool, on local stub providers"""
+import time
+
+import pytest
+
+from providers import BREAKER_FAILURES, MIN_SAMPLES, NoData, ProviderError, ProviderPool, StubProvider
+
+
+def nothing(*args, **kwargs):
+    raise NoData("nothing for this key")
+
+
+def test_rejected_answer_is_no_data_and_leaves_the_breaker_closed():
+    empty = StubProvider("empty", result=None)
+    pool = ProviderPool("test", [empty])
+    for _ in range(BREAKER_FAILURES * 2):
+        with pytest.raises(NoData):
+            pool.call("KEY")
+    assert empty.breaker.state == "closed"
+    assert empty.error_rate == 0.0
+    assert empty.requests == BREAKER_FAILURES * 2
+
+
+def test_no_data_moves_on_to_the_next_provider():
+    first = StubProvider("first", result=nothing)
+    second = StubProvider("second", result="answer")
+    pool = ProviderPool("test", [first, second], hedge_percentile=100)
+    for _ in range(BREAKER_FAILURES * 2):
+        assert pool.call("KEY") == "answer"
+    assert first.breaker.state == "closed"
+    assert first.error_rate == 0.0
+    assert second.requests == BREAKER_FAILURES * 2
+
+
+def test_failures_still_open_the_breaker():
+    broken = StubProvider("broken", failure_rate=1.0)
+    pool = ProviderPool("test", [broken])
+    for _ in range(BREAKER_FAILURES):
+        with pytest.raises(ProviderError) as raised:
+            pool.call("KEY")
+        assert not isinstance(raised.value, NoData)
+    assert broken.breaker.state == "open"
+    assert broken.error_rate > 0
+    assert pool.ranked() == []
+
+
+def test_failure_and_no_data_together_raise_provider_error():
+    pool = ProviderPool("test", [StubProvider("broken", failure_rate=1.0),
+                                 StubProvider("empty", result=nothing)])
+    with pytest.raises(ProviderError) as raised:
+        pool.call("KEY")
+    assert not isinstance(raised.value, NoData)
+
+
+def test_no_data_closes_a_half_open_breaker():
+    flaky = StubProvider("flaky", failure_rate=1.0)
+    flaky.breaker.cooldown = 0.0
+    pool = ProviderPool("test", [flaky])
+    for _ in range(BREAKER_FAILURES):
+        with pytest.raises(ProviderError):
+            pool.call("KEY")
+    assert flaky.breaker.state == "half-open"
+    flaky.failure_rate, flaky.result = 0.0, None
+    with pytest.raises(NoData):
+        pool.call("KEY")
+    assert flaky.breaker.state == "closed"
+
+
+def test_pinned_pool_keeps_declared_order_and_never_hedges():
+    slow = StubProvider("slow", result="slow", latency=0.02)
+    fast = StubProvider("fast", result="fast")
+    pool = ProviderPool("test", [slow, fast], pinned=True, max_hedges=1)
+    assert pool.max_hedges == 0
+    for _ in range(10):
+        assert pool.call("KEY") == "slow"
+    assert pool.ranked() == [slow, fast]
+    assert fast.requests == 0
+
+
+def measured(provider: StubProvider, seconds: float) -> StubProvider:
+    """Give a provider MIN_SAMPLES latencies of ``seconds`` so it ranks on them"""
+    provider.latencies.extend([seconds] * MIN_SAMPLES)
+    provider.calls = MIN_SAMPLES
+    return provider
+
+
+def test_untried_providers_go_first_then_the_fastest_wins():
+    slow = StubProvider("slow", result="slow", latency=0.02)
+    fast = StubProvider("fast", result="fast", latency=0.001)
+    pool = ProviderPool("test", [slow, fast], max_hedges=0)
+    assert [pool.call("KEY"), pool.call("KEY")] == ["slow", "fast"]
+    measured(slow, 0.02)
+    measured(fast, 0.001)
+    for _ in range(10):
+        assert pool.call("KEY") == "fast"
+    assert slow.requests == 1
+    assert pool.ranked() == [fast, slow]
+
+
+def test_hedges_once_the_latency_percentile_has_passed():
+    primary = measured(StubProvider("primary", result="primary", latency=0.5), 0.01)
+    backup = measured(StubProvider("backup", result="backup", latency=0.01), 0.02)
+    pool = ProviderPool("test", [primary, backup])
+    started = time.monotonic()
+    assert pool.call("KEY") == "backup"
+    assert time.monotonic() - started < 0.4
+    assert primary.requests == backup.requests == 1
+
+
+def test_no_hedge_before_the_percentile_of_the_provider_that_took_over():
+    failing = measured(StubProvider("failing", failure_rate=1.0), 0.01)
+    second = measured(StubProvider("second", result="second", latency=0.05), 0.5)
+    third = measured(StubProvider("third", result="third"), 1.0)
+    pool = ProviderPool("test", [failing, second, third])
+    # The first provider's 10ms percentile has long passed when "second" answers,
+    # but the hedge clock restarted with "second" at its own 500ms
+    assert pool.call("KEY") == "second"
+    assert third.requests == 0
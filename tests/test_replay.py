@@ -0,0 +1,92 @@
+"""Recording calls into a temporary archive and replaying them without the network"""
+import threading
+
+import pytest
+
+import replay
+from replay import Archive, Latency, ReplayMiss, configured, recorded
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    store = Archive(str(tmp_path / "archive.db"))
+    monkeypatch.setattr(replay, "_archive", store)
+    monkeypatch.setattr(replay, "LATENCY", Latency("0"))
+    monkeypatch.setattr(replay, "DATA_MODE", "record")
+    return store
+
+
+class LockedError(Exception):
+    """An exception carrying something pickle can't handle"""
+
+
+def wrapped(source: str):
+    """A recorded function and the list of calls that reached it"""
+    calls = []
+
+    @recorded(source)
+    def history(ticker, period="1y"):
+        calls.append((ticker, period))
+        if ticker == "BAD":
+            raise ValueError(f"no such ticker {ticker}")
+        if ticker == "LOCKED":
+            raise LockedError(threading.Lock())
+        return {"ticker": ticker, "period": period}
+
+    return history, calls
+
+
+def test_live_mode_returns_the_function_itself(monkeypatch):
+    monkeypatch.setattr(replay, "DATA_MODE", "live")
+
+    def history(ticker):
+        return ticker
+
+    assert recorded("test.history")(history) is history
+
+
+def test_replay_serves_what_was_recorded(archive, monkeypatch):
+    history, calls = wrapped("test.history")
+    assert history("AAPL") == {"ticker": "AAPL", "period": "1y"}
+    assert history("MSFT", period="5y") == {"ticker": "MSFT", "period": "5y"}
+    assert len(calls) == 2
+
+    monkeypatch.setattr(replay, "DATA_MODE", "replay")
+    # Defaults are applied before keying, so every spelling of a call finds one recording
+    assert history("AAPL", "1y") == history(ticker="AAPL") == history("AAPL", period="1y") \
+        == {"ticker": "AAPL", "period": "1y"}
+    assert history(period="5y", ticker="MSFT") == {"ticker": "MSFT", "period": "5y"}
+    assert len(calls) == 2
+    with pytest.raises(ReplayMiss):
+        history("AAPL", "5y")
+    with pytest.raises(KeyError):  # callers that catch KeyError see misses too
+        history("GOOG")
+
+
+def test_replay_raises_recorded_exceptions(archive, monkeypatch):
+    history, calls = wrapped("test.history")
+    with pytest.raises(ValueError):
+        history("BAD")
+    with pytest.raises(LockedError):
+        history("LOCKED")
+
+    monkeypatch.setattr(replay, "DATA_MODE", "replay")
+    with pytest.raises(ValueError, match="no such ticker BAD"):
+        history("BAD")
+    # Unpicklable exceptions come back as RuntimeError with their type and message
+    with pytest.raises(RuntimeError, match="LockedError"):
+        history("LOCKED")
+    assert len(calls) == 2
+
+
+def test_configured_follows_the_archive_when_replaying(archive, monkeypatch):
+    assert configured("key", "test.keyed")
+    assert not configured(None, "test.keyed")
+    assert not configured("", "test.keyed")
+
+    history, _ = wrapped("test.keyed")
+    history("AAPL")
+    monkeypatch.setattr(replay, "DATA_MODE", "replay")
+    assert configured(None, "test.keyed")
+    assert not configured("key", "test.other")
+    assert [source for source, *_ in archive.stats()] == ["test.keyed"]
@@ -0,0 +1,59 @@
+"""compute_risk_metrics and drawdown durations against direct per-series computations"""
+import numpy as np
+import pandas as pd
+
+from risk import RISK_METRICS, compute_risk_metrics, drawdown_durations, drawdown_matrix
+
+TOL = dict(rtol=1e-10, atol=1e-12)
+
+
+def prices(n: int = 500, seed: int = 0) -> pd.DataFrame:
+    steps = np.random.default_rng(seed).normal(0.0004, 0.015, (n, 3))
+    return pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), columns=list("ABC"),
+                        index=pd.bdate_range("2021-01-01", periods=n))
+
+
+def test_metrics_match_per_series_formulas():
+    frame = prices()
+    bench = pd.Series(100 * np.exp(np.cumsum(np.random.default_rng(9).normal(0, 0.01, len(frame)))),
+                      index=frame.index)
+    metrics = compute_risk_metrics(frame, benchmark=bench)
+    assert list(metrics.columns) == RISK_METRICS
+    bench_returns = np.log(bench).diff().dropna()
+    for ticker in frame:
+        close = frame[ticker]
+        returns = np.log(close).diff().dropna()
+        row = metrics.loc[ticker]
+        np.testing.assert_allclose(row['volatility'], returns.std() * np.sqrt(252), **TOL)
+        np.testing.assert_allclose(row['sharpeRatio'], returns.mean() / returns.std() * np.sqrt(252), **TOL)
+        downside = np.sqrt((np.minimum(returns, 0) ** 2).mean())
+        np.testing.assert_allclose(row['sortinoRatio'], returns.mean() / downside * np.sqrt(252), **TOL)
+        drawdown = close / close.cummax() - 1
+        np.testing.assert_allclose(row['maximumDrawdown'], drawdown.min(), **TOL)
+        annual = np.expm1(returns.mean() * 252)
+        np.testing.assert_allclose(row['calmarRatio'], annual / abs(drawdown.min()), **TOL)
+        np.testing.assert_allclose(row['historicalVaR'], np.percentile(returns, 5), **TOL)
+        np.testing.assert_allclose(row['historicalCVaR'], returns[returns <= np.percentile(returns, 5)].mean(),
+                                   **TOL)
+        beta = np.cov(returns, bench_returns)[0, 1] / bench_returns.var()
+        np.testing.assert_allclose(row['beta'], beta, **TOL)
+
+
+def test_drawdown_durations_count_bars_below_the_peak():
+    close = np.array([10, 11, 10, 9, 11, 12, 12, 11, 10, 13], dtype=np.float64)[:, None]
+    durations = drawdown_durations(drawdown_matrix(close))[:, 0]
+    assert durations.tolist() == [0, 0, 1, 2, 0, 0, 0, 1, 2, 0]
+
+
+def test_gaps_reset_the_duration_count():
+    close = np.array([10, 9, np.nan, 8, 8.5], dtype=np.float64)[:, None]
+    assert drawdown_durations(drawdown_matrix(close))[:, 0].tolist() == [0, 1, 0, 1, 2]
+
+
+def test_short_and_constant_series_give_nan_not_errors():
+    constant = pd.DataFrame({'flat': np.full(50, 100.0)})
+    row = compute_risk_metrics(constant).iloc[0]
+    assert np.isnan(row['sharpeRatio']) and np.isnan(row['sortinoRatio']) and np.isnan(row['calmarRatio'])
+    assert row['volatility'] == 0 and row['maximumDrawdown'] == 0
+    single = compute_risk_metrics(pd.DataFrame({'one': [100.0, 101.0]})).iloc[0]
+    assert np.isnan(single['volatility']) and np.isnan(single['sharpeRatio'])
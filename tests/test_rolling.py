@@ -0,0 +1,104 @@
+"""Rolling kernels, batch functions and RollingStats against the pandas expressions they replace"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import (RSI, RollingMean, RollingStats, RollingStd, RollingVolatility, RunningDrawdown,
+                     rolling_mean, rolling_std, rolling_volatility, rsi, running_drawdown,
+                     update_rolling_stats)
+
+TOL = dict(rtol=1e-10, atol=1e-10, equal_nan=True)
+
+
+def closes(n: int = 400, seed: int = 0) -> pd.Series:
+    steps = np.random.default_rng(seed).normal(0.0003, 0.02, n)
+    return pd.Series(100 * np.exp(np.cumsum(steps)), index=pd.bdate_range("2020-01-01", periods=n))
+
+
+def pandas_volatility(close: pd.Series, window: int = 30) -> pd.Series:
+    return np.log(close).diff().rolling(window).std() * np.sqrt(252)
+
+
+def pandas_drawdown(close: pd.Series) -> pd.Series:
+    return close / close.cummax() - 1
+
+
+def pandas_sma(close: pd.Series, window: int = 20) -> pd.Series:
+    return close.rolling(window).mean()
+
+
+def pandas_rsi(close: pd.Series, period: int = 14) -> pd.Series:
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    return 100 - 100 / (1 + gain / loss)
+
+
+def run(kernel, values) -> np.ndarray:
+    return np.array([kernel.update(v) for v in values])
+
+
+def test_batch_functions_match_pandas():
+    close = closes()
+    values = close.to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, 20), pandas_sma(close), **TOL)
+    np.testing.assert_allclose(rolling_std(values, 20), close.rolling(20).std(), **TOL)
+    np.testing.assert_allclose(rolling_volatility(values, 30), pandas_volatility(close), **TOL)
+    np.testing.assert_allclose(running_drawdown(values), pandas_drawdown(close), **TOL)
+    np.testing.assert_allclose(rsi(values, 14), pandas_rsi(close), **TOL)
+
+
+def test_batch_functions_work_column_wise():
+    frame = pd.DataFrame({name: closes(300, seed) for seed, name in enumerate("ABC")})
+    values = frame.to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, 20), frame.rolling(20).mean(), **TOL)
+    np.testing.assert_allclose(running_drawdown(values), frame / frame.cummax() - 1, **TOL)
+    np.testing.assert_allclose(rsi(values, 14), frame.apply(pandas_rsi), **TOL)
+
+
+def test_kernels_match_pandas_bar_by_bar():
+    close = closes()
+    values = close.to_numpy()
+    np.testing.assert_allclose(run(RollingMean(20), values), pandas_sma(close), **TOL)
+    np.testing.assert_allclose(run(RollingStd(20), values), close.rolling(20).std(), **TOL)
+    np.testing.assert_allclose(run(RollingVolatility(30), values), pandas_volatility(close), **TOL)
+    np.testing.assert_allclose(run(RunningDrawdown(), values), pandas_drawdown(close), **TOL)
+    np.testing.assert_allclose(run(RSI(14), values), pandas_rsi(close), **TOL)
+
+
+def expected_columns(close: pd.Series) -> dict:
+    return {'volatility': pandas_volatility(close), 'drawdown': pandas_drawdown(close),
+            'sma': pandas_sma(close), 'rsi': pandas_rsi(close)}
+
+
+@pytest.mark.parametrize("seeded", [50, 250, 399])
+def test_extend_matches_a_fresh_seed(seeded):
+    close = closes()
+    stats = RollingStats()
+    stats.seed(close.iloc[:seeded])
+    assert stats.can_extend(close)
+    assert stats.extend(close) == len(close) - seeded
+    for name, expected in expected_columns(close).items():
+        np.testing.assert_allclose(stats.series(name), expected, **TOL)
+
+
+def test_append_one_bar_at_a_time():
+    close = closes()
+    stats = RollingStats()
+    stats.seed(close.iloc[:100])
+    for i in range(100, len(close)):
+        stats.append(close.iloc[i:i + 1])
+    assert stats.index.equals(close.index)
+    for name, expected in expected_columns(close).items():
+        np.testing.assert_allclose(stats.series(name), expected, **TOL)
+
+
+def test_revised_tail_close_reseeds():
+    close = closes()
+    stats = update_rolling_stats(None, close.iloc[:300])
+    revised = close.copy()
+    revised.iloc[299] *= 1.01  # the last seen bar changed (e.g. intraday -> final close)
+    assert not stats.can_extend(revised)
+    refreshed = update_rolling_stats(stats, revised)
+    assert refreshed is not stats
+    np.testing.assert_allclose(refreshed.series('sma'), pandas_sma(revised), **TOL)
@@ -0,0 +1,81 @@
+"""Core budget, halving schedule and fold hygiene of the hyperparameter search"""
+import numpy as np
+import pytest
+
+import tuning
+
+
+@pytest.mark.parametrize("cores", [1, 2, 3, 4, 8, 16, 64])
+@pytest.mark.parametrize("n_trials", [1, 2, 3, 5, 9, 27, 100])
+def test_split_cores_stays_within_budget(n_trials, cores):
+    workers, threads = tuning.split_cores(n_trials, cores)
+    assert 1 <= workers <= n_trials
+    assert threads >= 1
+    assert workers * threads <= cores
+
+
+def test_split_cores_uses_spare_cores_as_threads():
+    assert tuning.split_cores(2, 8) == (2, 4)
+    assert tuning.split_cores(27, 8) == (8, 1)
+
+
+def test_halving_schedule():
+    assert tuning.halving_schedule(27, 3, 25, 200) == [(27, 25), (9, 75), (3, 200)]
+    assert tuning.halving_schedule(27, 3, 100, 1000) == [(27, 100), (9, 300), (3, 900), (1, 1000)]
+    assert tuning.halving_schedule(1, 3, 25, 200) == [(1, 25)]
+
+
+@pytest.mark.parametrize("n_candidates", [1, 2, 5, 27, 50])
+@pytest.mark.parametrize("eta", [2, 3, 4])
+def test_halving_schedule_shrinks_candidates_and_grows_trees(n_candidates, eta):
+    rounds = tuning.halving_schedule(n_candidates, eta, 25, 200)
+    candidates = [c for c, _ in rounds]
+    trees = [t for _, t in rounds]
+    assert candidates[0] == n_candidates
+    assert all(c >= 1 for c in candidates)
+    assert candidates == sorted(candidates, reverse=True)
+    assert trees == sorted(trees) and trees[-1] <= 200
+    last_candidates, last_trees = rounds[-1]
+    assert last_candidates == 1 or last_trees == 200
+
+
+def test_early_stopping_slice_precedes_validation():
+    for train_idx, val_idx in tuning.time_series_folds(400, n_splits=4, gap=5):
+        fit_idx, stop_idx = tuning.early_stopping_split(train_idx, gap=5)
+        assert not set(stop_idx) & set(val_idx)
+        assert not set(fit_idx) & set(stop_idx)
+        assert fit_idx.max() + 5 < stop_idx.min()
+        assert stop_idx.max() < val_idx.min()
+
+
+class RecordingBooster:
+    """Stands in for XGBRegressor and remembers what it was fitted and stopped on"""
+
+    fits = []
+
+    def __init__(self, n_estimators):
+        self.n_estimators = n_estimators
+
+    def fit(self, X, y, eval_set, verbose):
+        RecordingBooster.fits.append((set(X[:, 0]), set(eval_set[0][0][:, 0])))
+        self.best_iteration = self.n_estimators // 2 - 1
+        return self
+
+    def predict(self, X):
+        return np.zeros(len(X))
+
+
+def test_evaluate_never_stops_on_the_validation_fold(monkeypatch):
+    RecordingBooster.fits = []
+    monkeypatch.setattr(tuning, "make_estimator",
+                        lambda model_type, params, n_estimators, n_jobs, early_stopping: RecordingBooster(n_estimators))
+    X = np.arange(300, dtype=np.float64).reshape(-1, 1)
+    y = np.ones(300)
+    folds = tuning.time_series_folds(300, n_splits=3)
+    mae, rounds = tuning.evaluate('XGBoost', {}, X, y, folds, n_estimators=100)
+    assert mae == 1.0 and rounds == 50
+    for (fitted, stopped), (_, val_idx) in zip(RecordingBooster.fits, folds):
+        validation = set(X[val_idx, 0])
+        assert not fitted & validation
+        assert not stopped & validation
+        assert stopped and not fitted & stopped
@@ -0,0 +1,183 @@
+"""Hyperparameter search for the tree models.
+
+Candidates are scored on walk-forward folds (TimeSeriesSplit), so no fold
+trains on data newer than its validation window, and pruned by successive
+halving: each round refits the survivors with ``eta`` times more trees and
+keeps the best 1/eta. XGBoost fits stop early on a slice cut from the end
+of each training fold, never on the validation fold that scores them, and
+the number of rounds they kept becomes the tuned ``n_estimators``.
+
+Trials run in a thread pool sized against a core budget (TUNING_CORES,
+default: every core). Each estimator gets an equal share of that budget as
+its ``n_jobs``, so trials x threads never exceeds the budget the way
+nested ``n_jobs=-1`` calls would. The winning parameters are cached per
+ticker in the shared cache tier and picked up by later trainings.
+"""
+import itertools
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared_cache import SHARED
+
+TUNING_CORES = int(os.environ.get("TUNING_CORES", "0")) or os.cpu_count() or 1
+TUNED_PARAMS_TTL = 7 * 24 * 3600
+EARLY_STOPPING_ROUNDS = 30
+EARLY_STOPPING_FRACTION = 0.2  # tail of each training fold held out to stop boosting
+
+PARAM_SPACES = {
+    'Random Forest': {
+        'max_depth': [4, 6, 8, 10, 14, None],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    },
+    'XGBoost': {
+        'max_depth': [2, 3, 4, 6, 8],
+        'learning_rate': [0.01, 0.03, 0.1, 0.3],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.5, 0.8, 1.0],
+        'min_child_weight': [1, 3, 10],
+    },
+}
+
+# Trees per fit in the first halving round, and the most any round may use
+RESOURCES = {
+    'Random Forest': (25, 200),
+    'XGBoost': (100, 1000),
+}
+
+TuningResult = namedtuple('TuningResult', ['params', 'score', 'trials', 'seconds', 'history'])
+
+
+def split_cores(n_trials: int, cores: int = TUNING_CORES) -> Tuple[int, int]:
+    """(parallel trials, threads per trial) whose product stays within ``cores``"""
+    workers = max(1, min(n_trials, cores))
+    return workers, max(1, cores // workers)
+
+
+def sample_candidates(space: Dict[str, list], n: int, seed: int = 0) -> List[dict]:
+    """``n`` distinct parameter sets drawn from the grid"""
+    names = list(space)
+    grid = list(itertools.product(*(space[name] for name in names)))
+    picks = random.Random(seed).sample(grid, min(n, len(grid)))
+    return [dict(zip(names, values)) for values in picks]
+
+
+def time_series_folds(n_samples: int, n_splits: int = 4, gap: int = 0) -> list:
+    from sklearn.model_selection import TimeSeriesSplit
+
+    return list(TimeSeriesSplit(n_splits=n_splits, gap=gap).split(np.arange(n_samples)))
+
+
+def early_stopping_split(train_idx: np.ndarray, fraction: float = EARLY_STOPPING_FRACTION,
+                         gap: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(fit, stop) indices: the newest ``fraction`` of a training fold, ``gap`` bars after the rest"""
+    n_stop = max(1, int(len(train_idx) * fraction))
+    n_fit = len(train_idx) - n_stop - gap
+    if n_fit < 1:
+        raise ValueError(f"A training fold of {len(train_idx)} rows is too short to hold out "
+                         f"{n_stop} early-stopping rows")
+    return train_idx[:n_fit], train_idx[-n_stop:]
+
+
+def make_estimator(model_type: str, params: dict, n_estimators: int, n_jobs: int,
+                   early_stopping: bool = False):
+    if model_type == 'Random Forest':
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs, **params)
+    if model_type == 'XGBoost':
+        from xgboost import XGBRegressor
+
+        extra = {'early_stopping_rounds': EARLY_STOPPING_ROUNDS} if early_stopping else {}
+        return XGBRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs, **extra, **params)
+    raise ValueError(f"No search space for model: {model_type}")
+
+
+def evaluate(model_type: str, params: dict, X: np.ndarray, y: np.ndarray, folds: list,
+             n_estimators: int, n_jobs: int = 1, gap: int = 0) -> Tuple[float, int]:
+    """Mean validation MAE over the folds, and the trees worth keeping"""
+    errors, rounds = [], []
+    for train_idx, val_idx in folds:
+        boosted = model_type == 'XGBoost'
+        model = make_estimator(model_type, params, n_estimators, n_jobs, early_stopping=boosted)
+        if boosted:
+            # The validation fold only scores; stopping on it would tune to the score itself
+            fit_idx, stop_idx = early_stopping_split(train_idx, gap=gap)
+            model.fit(X[fit_idx], y[fit_idx], eval_set=[(X[stop_idx], y[stop_idx])], verbose=False)
+            rounds.append(model.best_iteration + 1)
+        else:
+            model.fit(X[train_idx], y[train_idx])
+            rounds.append(n_estimators)
+        errors.append(float(np.mean(np.abs(model.predict(X[val_idx]) - y[val_idx]))))
+    return float(np.mean(errors)), int(np.median(rounds))
+
+
+def halving_schedule(n_candidates: int, eta: int, min_trees: int, max_trees: int) -> List[Tuple[int, int]]:
+    """(candidates, trees per fit) for each round of successive halving"""
+    rounds = []
+    survivors = n_candidates
+    for level in range(int(math.ceil(math.log(max(n_candidates, 2), eta))) + 1):
+        budget = min(max_trees, int(min_trees * eta ** level))
+        rounds.append((survivors, budget))
+        if survivors <= 1 or budget >= max_trees:
+            break
+        survivors = max(1, survivors // eta)
+    return rounds
+
+
+def successive_halving(model_type: str, X, y, n_candidates: int = 27, eta: int = 3,
+                       n_splits: int = 4, cores: int = TUNING_CORES, seed: int = 0,
+                       gap: int = 0) -> TuningResult:
+    """Best parameters for ``model_type`` on (X, y), searched by successive halving.
+
+    ``gap`` rows are left out between training and validation (and between
+    the fitted rows and the early-stopping slice), for targets that look
+    ``gap`` bars ahead.
+    """
+    start = time.perf_counter()
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = time_series_folds(len(y), n_splits, gap)
+    survivors = sample_candidates(PARAM_SPACES[model_type], n_candidates, seed)
+    history = []
+    trials = 0
+
+    for level, (keep, budget) in enumerate(halving_schedule(len(survivors), eta, *RESOURCES[model_type])):
+        survivors = [params for _, params in ranked[:keep]] if level else survivors
+        workers, threads = split_cores(len(survivors), cores)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tuning") as pool:
+            scores = list(pool.map(
+                lambda params: evaluate(model_type, params, X, y, folds, budget, threads, gap), survivors))
+        trials += len(survivors)
+        ranked = sorted(zip(scores, survivors), key=lambda item: item[0][0])
+        history.extend({'round': level, 'trees': budget, 'mae': score[0], **params}
+                       for score, params in ranked)
+
+    (best_mae, best_trees), best = ranked[0]
+    return TuningResult({**best, 'n_estimators': best_trees}, best_mae, trials,
+                        time.perf_counter() - start, history)
+
+
+def _cache_key(model_type: str, ticker: str) -> str:
+    return f"{model_type}:{ticker.upper()}"
+
+
+def tuned_params(model_type: str, ticker: str) -> Optional[dict]:
+    """Cached tuning record ({'params', 'score', 'tuned_at'}) for a ticker, if any"""
+    return SHARED.get("tuning", _cache_key(model_type, ticker))
+
+
+def tune(model_type: str, ticker: str, X, y, **kwargs) -> TuningResult:
+    """Search parameters for a ticker and cache the winner for later trainings"""
+    result = successive_halving(model_type, X, y, **kwargs)
+    SHARED.set("tuning", _cache_key(model_type, ticker),
+               {'params': result.params, 'score': result.score, 'tuned_at': time.time()},
+               ttl=TUNED_PARAMS_TTL)
+    return result